@@ -68,6 +68,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -101,8 +102,18 @@ def run_migrations_offline() -> None:
 # else:
 #     run_migrations_online()
 
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    # Индексы естественных ключей создаются приложением для отдельных таблиц
+    if type_ == "index" and reflected and name.startswith("ix_table_rows_key_"):
+        return False
+    # Партиции table_rows создаются миграцией и приложением (repository/partition.py)
+    if type_ == "table" and reflected and name.startswith("table_rows_"):
+        return False
+    return True
+
+
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
 
     with context.begin_transaction():
         context.run_migrations()
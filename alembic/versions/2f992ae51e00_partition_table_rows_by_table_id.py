@@ -0,0 +1,116 @@
+"""partition table_rows by table_id
+
+Revision ID: 2f992ae51e00
+Revises: 7394d003a024
+Create Date: 2026-10-19 19:12:08.688276
+
+"""
+from typing import Sequence, Union
+
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f992ae51e00'
+down_revision: Union[str, Sequence[str], None] = '7394d003a024'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+HASH_PARTITIONS = 16
+COLUMNS = "id, table_id, row_data, position, created_at, updated_at"
+INDEXES = (
+    ('ix_table_rows_id', ['id']),
+    ('ix_table_rows_table_id_created', ['table_id', 'created_at']),
+    ('ix_table_rows_table_id_updated', ['table_id', 'updated_at']),
+    ('ix_table_rows_table_id_position', ['table_id', 'position', 'id']),
+)
+
+
+def _key_indexes(bind) -> list:
+    """Индексы естественных ключей таблиц (создаются приложением)"""
+    return bind.execute(sa.text(
+        "SELECT indexname, tablename, indexdef FROM pg_indexes WHERE indexname LIKE 'ix\\_table\\_rows\\_key\\_%'"
+    )).all()
+
+
+def _create_rows_table(name: str, *constraints, **kwargs) -> None:
+    op.create_table(
+        name,
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('table_rows_id_seq'::regclass)"), nullable=False),
+        sa.Column('table_id', sa.Integer(), nullable=False),
+        sa.Column('row_data', sa.JSON(), nullable=False),
+        sa.Column('position', sa.String(collation='C'), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['table_id'], ['data_tables.id'], name='table_rows_table_id_fkey'),
+        *constraints,
+        **kwargs,
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    key_indexes = _key_indexes(bind)
+
+    op.rename_table('table_rows', 'table_rows_old')
+    for name, _, _ in key_indexes:
+        op.execute(f"DROP INDEX {name}")
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='table_rows_old')
+    op.execute("ALTER TABLE table_rows_old DROP CONSTRAINT table_rows_pkey")
+    op.execute("ALTER TABLE table_rows_old DROP CONSTRAINT table_rows_table_id_fkey")
+    op.execute("ALTER SEQUENCE table_rows_id_seq OWNED BY NONE")
+
+    # Список по table_id: крупные таблицы получают собственные партиции (repository/partition.py),
+    # остальные попадают в партицию по умолчанию, разбитую хешем
+    _create_rows_table(
+        'table_rows',
+        sa.PrimaryKeyConstraint('id', 'table_id', name='table_rows_pkey'),
+        postgresql_partition_by='LIST (table_id)',
+    )
+    op.execute("CREATE TABLE table_rows_default PARTITION OF table_rows DEFAULT PARTITION BY HASH (table_id)")
+    for remainder in range(HASH_PARTITIONS):
+        op.execute(
+            f"CREATE TABLE table_rows_h{remainder} PARTITION OF table_rows_default "
+            f"FOR VALUES WITH (MODULUS {HASH_PARTITIONS}, REMAINDER {remainder})"
+        )
+    op.execute(f"INSERT INTO table_rows ({COLUMNS}) SELECT {COLUMNS} FROM table_rows_old")
+    op.execute("ALTER SEQUENCE table_rows_id_seq OWNED BY table_rows.id")
+    op.drop_table('table_rows_old')
+    for name, columns in INDEXES:
+        op.create_index(name, 'table_rows', columns, unique=False)
+
+    # Уникальные индексы отдельной таблицы строятся на партиции, где лежат её строки
+    for name, _, definition in key_indexes:
+        table_id = int(re.match(r"ix_table_rows_key_(\d+)_", name).group(1))
+        remainder = bind.execute(sa.text(
+            f"SELECT r FROM generate_series(0, {HASH_PARTITIONS - 1}) AS r "
+            f"WHERE satisfies_hash_partition('table_rows_default'::regclass, {HASH_PARTITIONS}, r, {table_id})"
+        )).scalar()
+        op.execute(re.sub(r" ON (\S+\.)?table_rows ", f" ON table_rows_h{remainder} ", definition))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    key_indexes = _key_indexes(bind)
+
+    op.rename_table('table_rows', 'table_rows_partitioned')
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='table_rows_partitioned')
+    op.execute("ALTER TABLE table_rows_partitioned DROP CONSTRAINT table_rows_pkey")
+    op.execute("ALTER SEQUENCE table_rows_id_seq OWNED BY NONE")
+
+    _create_rows_table('table_rows', sa.PrimaryKeyConstraint('id', name='table_rows_pkey'))
+    op.execute(f"INSERT INTO table_rows ({COLUMNS}) SELECT {COLUMNS} FROM table_rows_partitioned")
+    op.execute("ALTER SEQUENCE table_rows_id_seq OWNED BY table_rows.id")
+    op.execute("DROP TABLE table_rows_partitioned CASCADE")
+    for name, columns in INDEXES:
+        op.create_index(name, 'table_rows', columns, unique=False)
+    for _, tablename, definition in key_indexes:
+        op.execute(re.sub(rf" ON (\S+\.)?{tablename} ", " ON table_rows ", definition))
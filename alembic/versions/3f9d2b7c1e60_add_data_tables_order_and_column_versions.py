@@ -0,0 +1,34 @@
+"""add data_tables order and column versions
+
+Revision ID: 3f9d2b7c1e60
+Revises: 8c41f6a2d7e3
+Create Date: 2026-10-19 23:02:18.114027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9d2b7c1e60'
+down_revision: Union[str, Sequence[str], None] = '8c41f6a2d7e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('data_tables', sa.Column('order_version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column(
+        'data_tables',
+        sa.Column('column_versions', postgresql.JSONB(astext_type=sa.Text()), server_default='{}', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('data_tables', 'column_versions')
+    op.drop_column('data_tables', 'order_version')
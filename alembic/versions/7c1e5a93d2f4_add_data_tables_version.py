@@ -0,0 +1,28 @@
+"""add data_tables version
+
+Revision ID: 7c1e5a93d2f4
+Revises: 490af42ae3ba
+Create Date: 2026-10-19 10:12:31.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e5a93d2f4'
+down_revision: Union[str, Sequence[str], None] = '490af42ae3ba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('data_tables', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('data_tables', 'version')
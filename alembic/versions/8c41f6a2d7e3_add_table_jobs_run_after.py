@@ -0,0 +1,40 @@
+"""add table_jobs run_after
+
+Revision ID: 8c41f6a2d7e3
+Revises: d28e81c4db13
+Create Date: 2026-10-19 21:14:37.522904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41f6a2d7e3'
+down_revision: Union[str, Sequence[str], None] = 'd28e81c4db13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'table_jobs',
+        sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    )
+    op.drop_index('ix_table_jobs_pending', table_name='table_jobs', postgresql_where=sa.text("status = 'pending'"))
+    op.create_index(
+        'ix_table_jobs_pending', 'table_jobs', ['id'], unique=False,
+        postgresql_where=sa.text("status IN ('pending', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        'ix_table_jobs_pending', table_name='table_jobs', postgresql_where=sa.text("status IN ('pending', 'running')")
+    )
+    op.create_index('ix_table_jobs_pending', 'table_jobs', ['id'], unique=False, postgresql_where=sa.text("status = 'pending'"))
+    op.drop_column('table_jobs', 'run_after')
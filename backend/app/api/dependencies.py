@@ -0,0 +1,93 @@
+from typing import Annotated, Callable, Optional
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.auth.models import User
+from backend.app.core import app_settings, get_db_session
+from backend.app.core.rate_limit import limiter
+from backend.app.custom_exceptions import TooManyRequestsException
+from backend.app.dependencies.auth_dep import get_current_user
+from backend.app.services.data import DataService
+from backend.app.services.history import HistoryService
+from backend.app.services.table import TableService
+
+
+def get_data_service(db: AsyncSession = Depends(get_db_session)) -> DataService:
+    return DataService(db)
+
+
+def get_history_service(db: AsyncSession = Depends(get_db_session)) -> HistoryService:
+    return HistoryService(db)
+
+
+def get_table_service(db: AsyncSession = Depends(get_db_session)) -> TableService:
+    return TableService(db)
+
+
+def query_cost(name: str, unit: int) -> Callable[[Request], float]:
+    """Стоимость запроса по числовому параметру: 1 плюс 1 за каждые ``unit`` единиц"""
+
+    def cost(request: Request) -> float:
+        try:
+            value = int(request.query_params.get(name, 0))
+        except ValueError:
+            value = 0
+        return 1 + max(value, 0) // unit
+
+    return cost
+
+
+def body_cost(unit_bytes: int) -> Callable[[Request], float]:
+    """Стоимость запроса по размеру тела: 1 плюс 1 за каждые ``unit_bytes`` байт"""
+
+    def cost(request: Request) -> float:
+        try:
+            size = int(request.headers.get("content-length", 0))
+        except ValueError:
+            size = 0
+        return 1 + max(size, 0) // unit_bytes
+
+    return cost
+
+
+def sorted_cost(cost: Optional[Callable[[Request], float]] = None, factor: int = 5) -> Callable[[Request], float]:
+    """Стоимость запроса (по умолчанию 1), умноженная на ``factor`` при сортировке по колонке (``sort_by``)"""
+
+    def sorted_request_cost(request: Request) -> float:
+        return (cost(request) if cost else 1) * (factor if request.query_params.get("sort_by") else 1)
+
+    return sorted_request_cost
+
+
+class RateLimit:
+    """Зависимость эндпоинта: ограничение частоты и параллельности запросов пользователя.
+
+    Args:
+        route_class: Класс эндпоинта из настроек ``rate_limits.classes``
+        cost: Стоимость запроса в токенах; по умолчанию 1. Стоимость больше
+            ёмкости корзины уменьшается до неё - такой запрос забирает корзину целиком
+    """
+
+    def __init__(self, route_class: str, cost: Optional[Callable[[Request], float]] = None):
+        self.route_class = route_class
+        self.cost = cost
+
+    async def __call__(self, request: Request, user: Annotated[User, Depends(get_current_user)]):
+        config = app_settings.rate_limits
+        if not config.enabled:
+            yield
+            return
+
+        limit = config.classes[self.route_class]
+        key = f"{self.route_class}:{user.id}"
+        if limit.max_concurrent and not await limiter.acquire(key, limit.max_concurrent):
+            raise TooManyRequestsException("Too many concurrent requests")
+        try:
+            cost = min(self.cost(request) if self.cost else 1, limit.burst)
+            retry_after = await limiter.take(key, cost, limit)
+            if retry_after > 0:
+                raise TooManyRequestsException("Too many requests", retry_after)
+            yield
+        finally:
+            if limit.max_concurrent:
+                await limiter.release(key)
@@ -1,63 +1,164 @@
-from typing import List, Optional, Literal
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Path
+from typing import Annotated, List, Optional, Literal
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Path, Request, Response
 
-from backend.app.schemas import TableRowResponse, TableRowCreate, TableRowUpdate
+from backend.app.api.dependencies import RateLimit, body_cost, get_data_service, query_cost, sorted_cost
+from backend.app.api.formats import ROW_FORMAT_RESPONSES, render_rows
+from backend.app.auth.models import User
+from backend.app.dependencies.auth_dep import get_current_user
+from backend.app.schemas import (
+    TableRowResponse,
+    TableRowCreate,
+    TableRowUpdate,
+    RowMoveRequest,
+    PivotRequest,
+    PivotResponse,
+    ViewportResponse,
+    RowIndexResponse,
+)
+from backend.app.services.data import DataService
 
 
 router = APIRouter(prefix="/data", tags=["data"])
 
 
-@router.get("{table_id}/rows", response_model=List[TableRowResponse])
+@router.get(
+    "/{table_id}/rows",
+    response_model=List[TableRowResponse],
+    responses=ROW_FORMAT_RESPONSES,
+    dependencies=[Depends(RateLimit("read", sorted_cost(query_cost("limit", 100))))],
+)
 async def list_table_rows(
+    request: Request,
+    response: Response,
+    data_service: Annotated[DataService, Depends(get_data_service)],
+    user: Annotated[User, Depends(get_current_user)],
     skip: int = Query(0, description="Количество пропускаемых строк", ge=0),
     limit: int = Query(100, description="Максимальное количество строк", ge=1, le=1000),
     sort_by: Optional[str] = Query(None),
     sort_order: Literal["asc", "desc"] = Query(default="asc"),
     table_id: int = Path(..., description="ID таблицы", ge=1),
-    # data_service: Annotated[TaskService, Depends(get_task_service)],
-    # user: Annotated[UserSchema, Depends(get_current_active_auth_user)],
+    snapshot_id: Optional[int] = Query(None, description="Снимок таблицы; по умолчанию текущие строки", ge=1),
 ):
-    pass
+    """Страница строк таблицы или её снимка; формат ответа (JSON, колоночный JSON, MessagePack) выбирается по Accept"""
+    rows = await data_service.get_table_rows(table_id, user.id, skip, limit, sort_by, sort_order, snapshot_id)
+    return render_rows(request, response, rows) or rows
 
 
-@router.get("/{table_id}/rows/{row_id}", response_model=TableRowResponse)
+@router.get(
+    "/{table_id}/viewport",
+    response_model=ViewportResponse,
+    responses=ROW_FORMAT_RESPONSES,
+    dependencies=[Depends(RateLimit("read", sorted_cost(query_cost("count", 100))))],
+)
+async def get_viewport(
+    request: Request,
+    response: Response,
+    data_service: Annotated[DataService, Depends(get_data_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    start: int = Query(0, description="Индекс первой строки окна", ge=0),
+    count: int = Query(100, description="Количество строк в окне", ge=1, le=1000),
+    sort_by: Optional[str] = Query(None, description="Колонка сортировки; по умолчанию ручной порядок строк"),
+    sort_order: Literal["asc", "desc"] = Query(default="asc"),
+):
+    """Окно строк для виртуальной прокрутки: переход к любой позиции без OFFSET по всей таблице"""
+    viewport = await data_service.get_viewport(table_id, user.id, start, count, sort_by, sort_order)
+    return render_rows(request, response, viewport.rows, start=viewport.start, total=viewport.total) or viewport
+
+
+@router.get(
+    "/{table_id}/rows/{row_id}/index",
+    response_model=RowIndexResponse,
+    dependencies=[Depends(RateLimit("read", sorted_cost()))],
+)
+async def get_row_index(
+    data_service: Annotated[DataService, Depends(get_data_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    row_id: int = Path(..., description="ID строки", ge=1),
+    sort_by: Optional[str] = Query(None, description="Колонка сортировки; по умолчанию ручной порядок строк"),
+    sort_order: Literal["asc", "desc"] = Query(default="asc"),
+):
+    """Индекс строки в текущем порядке, чтобы прокрутить к ней"""
+    return await data_service.get_row_index(table_id, row_id, user.id, sort_by, sort_order)
+
+
+@router.get("/{table_id}/rows/{row_id}", response_model=TableRowResponse, dependencies=[Depends(RateLimit("read"))])
 async def get_row(
+    data_service: Annotated[DataService, Depends(get_data_service)],
+    user: Annotated[User, Depends(get_current_user)],
     table_id: int = Path(..., description="ID таблицы", ge=1),
     row_id: int = Path(..., description="ID строки", ge=1),
-    # user: Annotated[UserSchema, Depends(get_current_user)],
-    # data_service: Annotated[TaskService, Depends(get_task_service)],
+    snapshot_id: Optional[int] = Query(None, description="Снимок таблицы; по умолчанию текущая строка", ge=1),
 ):
     """Получить строку по ID"""
-    pass
+    return await data_service.get_table_row(table_id, row_id, user.id, snapshot_id)
 
 
-@router.post("/{table_id}/rows", response_model=TableRowResponse)
+@router.post("/{table_id}/rows", response_model=TableRowResponse, dependencies=[Depends(RateLimit("write"))])
 async def create_table_row(
     row_data: TableRowCreate,
-    # user: Annotated[UserSchema, Depends(get_current_user)],
-    # data_service: Annotated[TaskService, Depends(get_task_service)],
+    data_service: Annotated[DataService, Depends(get_data_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    after_row_id: Optional[int] = Query(None, description="Вставить сразу после этой строки", ge=1),
+    before_row_id: Optional[int] = Query(None, description="Вставить сразу перед этой строкой", ge=1),
+):
+    """Создать строку; по умолчанию она добавляется в конец таблицы"""
+    return await data_service.create_table_row(
+        table_id, user.id, row_data.row_data, after_row_id, before_row_id
+    )
+
+
+@router.post(
+    "/{table_id}/rows/move",
+    response_model=List[TableRowResponse],
+    dependencies=[Depends(RateLimit("write", body_cost(10_000)))],
+)
+async def move_rows(
+    move: RowMoveRequest,
+    data_service: Annotated[DataService, Depends(get_data_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
 ):
-    pass
+    """Переместить строки в ручном порядке таблицы"""
+    return await data_service.move_table_rows(table_id, user.id, move)
 
 
-@router.put("/{table_id}/rows/{row_id}", response_model=TableRowResponse)
+@router.put("/{table_id}/rows/{row_id}", response_model=TableRowResponse, dependencies=[Depends(RateLimit("write"))])
 async def update_row(
     row_data: TableRowUpdate,
+    data_service: Annotated[DataService, Depends(get_data_service)],
+    user: Annotated[User, Depends(get_current_user)],
     table_id: int = Path(..., description="ID таблицы", ge=1),
     row_id: int = Path(..., description="ID строки", ge=1),
-    # user: Annotated[UserSchema, Depends(get_current_user)],
-    # data_service: Annotated[TaskService, Depends(get_task_service)],
 ):
     """Обновить строку таблицы"""
-    pass
+    return await data_service.update_table_row(table_id, row_id, user.id, row_data.row_data)
 
 
-@router.delete("/{table_id}/rows/{row_id}")
+@router.delete("/{table_id}/rows/{row_id}", dependencies=[Depends(RateLimit("write"))])
 async def delete_row(
+    data_service: Annotated[DataService, Depends(get_data_service)],
+    user: Annotated[User, Depends(get_current_user)],
     table_id: int = Path(..., description="ID таблицы", ge=1),
     row_id: int = Path(..., description="ID строки", ge=1),
-    # user: Annotated[UserSchema, Depends(get_current_user)],
-    # data_service: Annotated[TaskService, Depends(get_task_service)],
 ):
     """Удалить строку таблицы"""
-    pass
+    await data_service.delete_table_row(table_id, row_id, user.id)
+    return {"message": "Строка удалена"}
+
+
+@router.post("/{table_id}/pivot", response_model=PivotResponse, dependencies=[Depends(RateLimit("heavy"))])
+async def pivot_table(
+    pivot: PivotRequest,
+    data_service: Annotated[DataService, Depends(get_data_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+):
+    """Группировка и сводная таблица по колонкам таблицы.
+
+    Группировка выполняется одним SQL-запросом GROUP BY по типизированным
+    значениям row_data, результат кэшируется до следующего изменения таблицы.
+    """
+    return await data_service.get_pivot(table_id, user.id, pivot)
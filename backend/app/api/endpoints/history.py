@@ -0,0 +1,87 @@
+from datetime import datetime
+from typing import Annotated, List
+from fastapi import APIRouter, Depends, Query, Path
+
+from backend.app.api.dependencies import RateLimit, get_history_service, query_cost
+from backend.app.auth.models import User
+from backend.app.dependencies.auth_dep import get_current_user
+from backend.app.schemas import ChangeBatchResponse, RowChangeResponse, UndoResult, HistoricalRowResponse
+from backend.app.services.history import HistoryService
+
+
+router = APIRouter(prefix="/data", tags=["history"])
+
+
+@router.post(
+    "/{table_id}/undo",
+    response_model=List[UndoResult],
+    dependencies=[Depends(RateLimit("write", query_cost("count", 10)))],
+)
+async def undo(
+    history_service: Annotated[HistoryService, Depends(get_history_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    count: int = Query(1, description="Количество отменяемых операций", ge=1),
+):
+    """Отменить последние операции текущего пользователя"""
+    return await history_service.undo(table_id, user.id, count)
+
+
+@router.post(
+    "/{table_id}/redo",
+    response_model=List[UndoResult],
+    dependencies=[Depends(RateLimit("write", query_cost("count", 10)))],
+)
+async def redo(
+    history_service: Annotated[HistoryService, Depends(get_history_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    count: int = Query(1, description="Количество повторяемых операций", ge=1),
+):
+    """Повторить последние отменённые операции текущего пользователя"""
+    return await history_service.redo(table_id, user.id, count)
+
+
+@router.get("/{table_id}/history", response_model=List[ChangeBatchResponse], dependencies=[Depends(RateLimit("read"))])
+async def list_history(
+    history_service: Annotated[HistoryService, Depends(get_history_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    skip: int = Query(0, description="Количество пропускаемых операций", ge=0),
+    limit: int = Query(50, description="Максимальное количество операций", ge=1, le=500),
+):
+    """История операций таблицы, новые первыми"""
+    return await history_service.get_history(table_id, user.id, skip, limit)
+
+
+@router.get(
+    "/{table_id}/history/rows",
+    response_model=List[HistoricalRowResponse],
+    dependencies=[Depends(RateLimit("heavy"))],
+)
+async def list_rows_at(
+    history_service: Annotated[HistoryService, Depends(get_history_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    at: datetime = Query(..., description="Момент времени, на который восстанавливается таблица"),
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    skip: int = Query(0, description="Количество пропускаемых строк", ge=0),
+    limit: int = Query(100, description="Максимальное количество строк", ge=1, le=1000),
+):
+    """Строки таблицы в состоянии на момент ``at``"""
+    return await history_service.get_rows_at(table_id, user.id, at, skip, limit)
+
+
+@router.get(
+    "/{table_id}/rows/{row_id}/history",
+    response_model=List[RowChangeResponse],
+    dependencies=[Depends(RateLimit("read"))],
+)
+async def row_history(
+    history_service: Annotated[HistoryService, Depends(get_history_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    row_id: int = Path(..., description="ID строки", ge=1),
+    limit: int = Query(100, description="Максимальное количество изменений", ge=1, le=1000),
+):
+    """Кто и когда менял ячейки строки"""
+    return await history_service.get_row_history(table_id, row_id, user.id, limit)
@@ -0,0 +1,234 @@
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Body, Depends, File, Path, Query, UploadFile, status
+
+from backend.app.api.dependencies import RateLimit, body_cost, get_table_service
+from backend.app.auth.models import User
+from backend.app.dependencies.auth_dep import get_current_user
+from backend.app.schemas import (
+    WorkbookImportResponse,
+    SchemaProposalResponse,
+    TableResponse,
+    AccessibleTableResponse,
+    NaturalKeyUpdate,
+    ColumnReferenceUpdate,
+    UpsertImportResponse,
+    TableCopyRequest,
+    TableSnapshotCreate,
+    TableSnapshotResponse,
+    TableScanRequest,
+    TableJobResponse,
+)
+from backend.app.services.table import TableService
+
+
+router = APIRouter(prefix="/tables", tags=["tables"])
+
+
+@router.get("", response_model=List[AccessibleTableResponse], dependencies=[Depends(RateLimit("read"))])
+async def list_tables(
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+):
+    """Все доступные пользователю таблицы (свои, общие и публичные) с правами и количеством строк"""
+    return await table_service.list_tables(user.id)
+
+
+@router.post(
+    "/import",
+    response_model=WorkbookImportResponse,
+    dependencies=[Depends(RateLimit("bulk", body_cost(10 * 1024 * 1024)))],
+)
+async def import_workbook(
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    file: UploadFile = File(..., description="Excel-файл (.xlsx, .xlsm)"),
+):
+    """Импорт Excel-книги: по таблице на каждый непустой лист"""
+    return await table_service.import_workbook(user.id, file)
+
+
+@router.post(
+    "/infer-schema",
+    response_model=SchemaProposalResponse,
+    dependencies=[Depends(RateLimit("bulk", body_cost(10 * 1024 * 1024)))],
+)
+async def infer_schema(
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    file: UploadFile = File(..., description="CSV или Excel-файл (.csv, .xlsx, .xlsm)"),
+    sheet: Optional[str] = Query(None, description="Лист книги Excel; по умолчанию первый"),
+):
+    """Предложить схему таблицы по содержимому файла: типы, обязательность, уникальность и перечисления"""
+    return await table_service.infer_schema(file, sheet)
+
+
+@router.get("/jobs/{job_id}", response_model=TableJobResponse, dependencies=[Depends(RateLimit("read"))])
+async def get_job(
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    job_id: int = Path(..., description="ID операции", ge=1),
+):
+    """Состояние фоновой операции над таблицей"""
+    return await table_service.get_job(job_id, user.id)
+
+
+@router.delete(
+    "/{table_id}",
+    response_model=TableJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(RateLimit("bulk"))],
+)
+async def delete_table(
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+):
+    """Удалить таблицу; она сразу становится недоступна, данные удаляются в фоне"""
+    return await table_service.delete_table(table_id, user.id)
+
+
+@router.post(
+    "/{table_id}/clear",
+    response_model=TableJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(RateLimit("bulk"))],
+)
+async def clear_table(
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+):
+    """Удалить все строки таблицы в фоне; отменить очистку нельзя"""
+    return await table_service.clear_table(table_id, user.id)
+
+
+@router.post(
+    "/{table_id}/copy",
+    response_model=TableJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(RateLimit("bulk"))],
+)
+async def copy_table(
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    copy: Optional[TableCopyRequest] = Body(None),
+):
+    """Скопировать таблицу со всеми строками в фоне; ID копии - в result_table_id операции"""
+    return await table_service.copy_table(table_id, user.id, copy.name if copy else None)
+
+
+@router.post(
+    "/{table_id}/snapshots",
+    response_model=TableSnapshotResponse,
+    dependencies=[Depends(RateLimit("write"))],
+)
+async def create_snapshot(
+    snapshot: TableSnapshotCreate,
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+):
+    """Зафиксировать текущее состояние таблицы; место занимают только последующие изменения"""
+    return await table_service.create_snapshot(table_id, user.id, snapshot.name)
+
+
+@router.get(
+    "/{table_id}/snapshots",
+    response_model=List[TableSnapshotResponse],
+    dependencies=[Depends(RateLimit("read"))],
+)
+async def list_snapshots(
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+):
+    """Снимки таблицы, новые первыми"""
+    return await table_service.list_snapshots(table_id, user.id)
+
+
+@router.delete("/{table_id}/snapshots/{snapshot_id}", dependencies=[Depends(RateLimit("write"))])
+async def delete_snapshot(
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    snapshot_id: int = Path(..., description="ID снимка", ge=1),
+):
+    """Удалить снимок"""
+    await table_service.delete_snapshot(table_id, snapshot_id, user.id)
+    return {"message": "Снимок удалён"}
+
+
+@router.post(
+    "/{table_id}/scan",
+    response_model=TableJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(RateLimit("bulk"))],
+)
+async def scan_table(
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    scan: Optional[TableScanRequest] = Body(None),
+):
+    """Проверить строки таблицы по схеме и найти дубликаты в фоне; отчёт - в report операции"""
+    return await table_service.scan_table(table_id, user.id, scan or TableScanRequest())
+
+
+@router.put("/{table_id}/key", response_model=TableResponse, dependencies=[Depends(RateLimit("bulk"))])
+async def set_natural_key(
+    key: NaturalKeyUpdate,
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+):
+    """Объявить естественный ключ таблицы; значения ключа должны быть уникальны"""
+    return await table_service.set_natural_key(table_id, user.id, key.columns)
+
+
+@router.put(
+    "/{table_id}/columns/{column}/reference",
+    response_model=TableResponse,
+    dependencies=[Depends(RateLimit("bulk"))],
+)
+async def set_column_reference(
+    reference: ColumnReferenceUpdate,
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    column: str = Path(..., description="Колонка таблицы"),
+):
+    """Сделать колонку ссылкой на ключ другой таблицы: строки возвращаются с найденными значениями (как ВПР)"""
+    return await table_service.set_column_reference(table_id, user.id, column, reference)
+
+
+@router.delete(
+    "/{table_id}/columns/{column}/reference",
+    response_model=TableResponse,
+    dependencies=[Depends(RateLimit("write"))],
+)
+async def delete_column_reference(
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    column: str = Path(..., description="Колонка таблицы"),
+):
+    """Убрать ссылку колонки; значения ячеек не меняются"""
+    return await table_service.set_column_reference(table_id, user.id, column, None)
+
+
+@router.post(
+    "/{table_id}/import",
+    response_model=UpsertImportResponse,
+    dependencies=[Depends(RateLimit("bulk", body_cost(10 * 1024 * 1024)))],
+)
+async def upsert_import(
+    table_service: Annotated[TableService, Depends(get_table_service)],
+    user: Annotated[User, Depends(get_current_user)],
+    table_id: int = Path(..., description="ID таблицы", ge=1),
+    file: UploadFile = File(..., description="CSV или Excel-файл (.csv, .xlsx, .xlsm)"),
+    key: Optional[List[str]] = Query(None, description="Колонки естественного ключа, если он ещё не задан"),
+    sheet: Optional[str] = Query(None, description="Лист книги Excel; по умолчанию первый"),
+):
+    """Загрузить файл в таблицу: строки с существующим ключом обновляются, новые добавляются"""
+    return await table_service.upsert_import(table_id, user.id, file, key, sheet)
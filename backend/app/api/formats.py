@@ -0,0 +1,113 @@
+"""Форматы ответа со строками таблицы.
+
+Формат выбирается по заголовку Accept:
+
+- ``application/json`` - список объектов строк (по умолчанию);
+- ``application/vnd.online-excel.columnar+json`` - колоночный формат: имена
+  колонок передаются один раз, значения каждой строки - массивом;
+- ``application/msgpack`` - колоночный формат в MessagePack (если установлен msgpack).
+
+Колоночный формат в несколько раз компактнее: в JSON по умолчанию имя каждой
+колонки повторяется в каждой строке.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from backend.app.core.compression import parse_quality_values
+from backend.app.schemas import TableRowResponse
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.online-excel.columnar+json"
+MSGPACK = "application/msgpack"
+
+# Описание альтернативных форматов для OpenAPI
+ROW_FORMAT_RESPONSES = {
+    200: {
+        "description": "Строки в формате, выбранном по заголовку Accept",
+        "content": {COLUMNAR_JSON: {}, MSGPACK: {}},
+    },
+}
+
+
+def available_row_formats() -> List[str]:
+    formats = [JSON, COLUMNAR_JSON]
+    if msgpack is not None:
+        formats.append(MSGPACK)
+    return formats
+
+
+def negotiate_row_format(accept: str) -> str:
+    """Выбрать формат строк по заголовку Accept.
+
+    Точное совпадение типа важнее шаблонов ``application/*`` и ``*/*``, при
+    равных весах побеждает тип, указанный в заголовке раньше.
+    """
+    weights = parse_quality_values(accept)
+    order = {media_type: index for index, media_type in enumerate(weights)}
+    best, best_rank = JSON, None
+    for media_type in available_row_formats():
+        for candidate, specificity in ((media_type, 2), (media_type.split("/")[0] + "/*", 1), ("*/*", 0)):
+            if candidate in weights:
+                rank = (weights[candidate], specificity, -order[candidate])
+                if weights[candidate] > 0 and (best_rank is None or rank > best_rank):
+                    best, best_rank = media_type, rank
+                break
+    return best
+
+
+def columnar_rows(rows: Sequence[TableRowResponse]) -> Dict[str, Any]:
+    """Колоночное представление строк: колонки в порядке первого появления.
+
+    Найденные строки колонок-ссылок (``lookups``) передаются отдельным
+    массивом, если они есть хотя бы у одной строки.
+    """
+    columns: Dict[str, int] = {}
+    for row in rows:
+        for name in row.row_data:
+            columns.setdefault(name, len(columns))
+    payload = {
+        "columns": list(columns),
+        "ids": [row.id for row in rows],
+        "positions": [row.position for row in rows],
+        "created_at": [row.created_at.isoformat() for row in rows],
+        "updated_at": [row.updated_at.isoformat() if row.updated_at else None for row in rows],
+        "rows": [[row.row_data.get(name) for name in columns] for row in rows],
+    }
+    if any(row.lookups for row in rows):
+        payload["lookups"] = [row.lookups for row in rows]
+    return payload
+
+
+def render_rows(
+        request: Request,
+        response: Response,
+        rows: Sequence[TableRowResponse],
+        **fields: Any,
+) -> Optional[Response]:
+    """Ответ со строками в формате, запрошенном клиентом.
+
+    Args:
+        request: Запрос с заголовком Accept
+        response: Ответ эндпоинта, в него добавляется ``Vary: Accept``
+        rows: Строки таблицы
+        **fields: Дополнительные поля колоночного ответа
+
+    Returns:
+        Optional[Response]: Готовый ответ, None - отдать обычный JSON через response_model
+    """
+    response.headers["Vary"] = "Accept"
+    media_type = negotiate_row_format(request.headers.get("accept", ""))
+    if media_type == JSON:
+        return None
+    payload = {**fields, **columnar_rows(rows)}
+    headers = {"Vary": "Accept"}
+    if media_type == MSGPACK:
+        return Response(msgpack.packb(payload), media_type=MSGPACK, headers=headers)
+    return JSONResponse(payload, media_type=COLUMNAR_JSON, headers=headers)
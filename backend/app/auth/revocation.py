@@ -0,0 +1,82 @@
+"""Отзыв токенов пользователя при выходе.
+
+Для каждого пользователя хранится момент выхода: токены, выпущенные не позже
+него (по ``iat``), считаются отозванными. Проверка токена - чтение одного
+значения из памяти или Redis, без запроса к базе. Запись хранится, пока не
+истечёт последний refresh-токен, выпущенный до выхода.
+
+В памяти процесса отзыв действует только в этом процессе; при нескольких
+воркерах нужен Redis (``AUTH__REVOCATION_BACKEND=redis``). При недоступности
+Redis токены проверяются только по подписи и сроку.
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from backend.app.core import app_settings
+
+KEY_PREFIX = "auth:revoked"
+
+
+class MemoryRevocations:
+    """Отзывы в памяти процесса"""
+
+    def __init__(self):
+        self._revoked: Dict[int, Tuple[float, float]] = {}
+
+    async def revoke(self, user_id: int, issued_before: float, ttl_seconds: int) -> None:
+        now = time.time()
+        self._revoked = {key: value for key, value in self._revoked.items() if value[1] > now}
+        self._revoked[user_id] = (issued_before, now + ttl_seconds)
+
+    async def revoked_before(self, user_id: int) -> Optional[float]:
+        revoked = self._revoked.get(user_id)
+        if revoked is None or revoked[1] <= time.time():
+            return None
+        return revoked[0]
+
+
+class RedisRevocations:
+    """Отзывы в Redis, общие для всех процессов приложения"""
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def revoke(self, user_id: int, issued_before: float, ttl_seconds: int) -> None:
+        try:
+            await self.redis.set(f"{KEY_PREFIX}:{user_id}", issued_before, ex=ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Cannot revoke tokens of user {user_id}: {e}")
+
+    async def revoked_before(self, user_id: int) -> Optional[float]:
+        try:
+            value = await self.redis.get(f"{KEY_PREFIX}:{user_id}")
+        except Exception as e:
+            logger.warning(f"Token revocation check failed, token allowed: {e}")
+            return None
+        return float(value) if value is not None else None
+
+
+def create_revocations():
+    if app_settings.auth.revocation_backend == "redis":
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError:
+            logger.warning("Package redis is not installed, token revocations are kept in process memory")
+        else:
+            return RedisRevocations(redis_asyncio.from_url(app_settings.cache_url))
+    return MemoryRevocations()
+
+
+revocations = create_revocations()
+
+
+async def revoke_user_tokens(user_id: int) -> None:
+    """Отозвать все выпущенные к этому моменту токены пользователя"""
+    await revocations.revoke(user_id, time.time(), app_settings.auth.refresh_token_days * 86400)
+
+
+async def is_token_revoked(user_id: int, payload: dict) -> bool:
+    revoked_before = await revocations.revoked_before(user_id)
+    return revoked_before is not None and float(payload.get("iat", 0)) <= revoked_before
@@ -1,10 +1,13 @@
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Response, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .models import User
+from .revocation import revoke_user_tokens
 from .utils import authenticate_user, set_tokens
-from backend.app.dependencies.auth_dep import get_current_user, get_current_admin_user, check_refresh_token
+from backend.app.dependencies.auth_dep import (
+    get_current_user, get_current_admin_user, check_refresh_token, get_refresh_token_user_id
+)
 from backend.app.dependencies.dao_dep import get_session_with_commit, get_session_without_commit
 from backend.app.exceptions import UserAlreadyExistsException, IncorrectEmailOrPasswordException
 from backend.app.auth.dao import UsersDAO
@@ -54,7 +57,10 @@ async def auth_user(
 
 
 @router.post("/logout")
-async def logout(response: Response):
+async def logout(response: Response, user_id: Optional[int] = Depends(get_refresh_token_user_id)):
+    # Выход отзывает все выданные пользователю токены, в том числе на других устройствах
+    if user_id is not None:
+        await revoke_user_tokens(user_id)
     response.delete_cookie("user_access_token")
     response.delete_cookie("user_refresh_token")
     return {'message': 'Пользователь успешно вышел из системы'}
@@ -75,7 +81,7 @@ async def get_all_users(session: AsyncSession = Depends(get_session_with_commit)
 @router.post("/refresh")
 async def process_refresh_token(
         response: Response,
-        user: User = Depends(check_refresh_token)
+        user_id: int = Depends(check_refresh_token)
 ):
-    set_tokens(response, user.id)
+    set_tokens(response, user_id)
     return {"message": "Токены успешно обновлены"}
@@ -1,28 +1,31 @@
-from passlib.context import CryptContext
-from jose import jwt
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from jose import jwt
 from fastapi.responses import Response
-from backend.app.config import settings
+from backend.app.config import get_settings
+from backend.app.core import app_settings
 
 
 def create_tokens(data: dict) -> dict:
-    # Текущее время в UTC
+    settings = get_settings()
+    # Текущее время в UTC; iat с долями секунды - по нему проверяется отзыв токенов при выходе
     now = datetime.now(timezone.utc)
+    issued_at = now.timestamp()
 
-    # AccessToken - 30 минут
-    access_expire = now + timedelta(seconds=10)
+    # AccessToken
+    access_expire = now + timedelta(seconds=app_settings.auth.access_token_seconds)
     access_payload = data.copy()
-    access_payload.update({"exp": int(access_expire.timestamp()), "type": "access"})
+    access_payload.update({"exp": int(access_expire.timestamp()), "iat": issued_at, "type": "access"})
     access_token = jwt.encode(
         access_payload,
         settings.SECRET_KEY,
         algorithm=settings.ALGORITHM
     )
 
-    # RefreshToken - 7 дней
-    refresh_expire = now + timedelta(days=7)
+    # RefreshToken; при каждом обновлении выдаётся новый с полным сроком
+    refresh_expire = now + timedelta(days=app_settings.auth.refresh_token_days)
     refresh_payload = data.copy()
-    refresh_payload.update({"exp": int(refresh_expire.timestamp()), "type": "refresh"})
+    refresh_payload.update({"exp": int(refresh_expire.timestamp()), "iat": issued_at, "type": "refresh"})
     refresh_token = jwt.encode(
         refresh_payload,
         settings.SECRET_KEY,
@@ -59,12 +62,16 @@ def set_tokens(response: Response, user_id: int):
     )
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache
+def get_pwd_context():
+    """Контекст хеширования паролей; passlib импортируется при первом обращении"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
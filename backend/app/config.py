@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -11,6 +12,7 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=f"{BASE_DIR}/.env.example")
 
 
-# Получаем параметры для загрузки переменных среды
-settings = Settings()
-database_url = settings.DB_URL
+@lru_cache
+def get_settings() -> Settings:
+    """Параметры из переменных среды; читаются при первом обращении, а не при импорте"""
+    return Settings()
@@ -0,0 +1,192 @@
+"""Сжатие HTTP-ответов (zstd, brotli, gzip).
+
+Кодировка выбирается по заголовку Accept-Encoding с учётом весов ``q``;
+при равных весах предпочтение отдаётся zstd и brotli - они сжимают JSON
+сильнее gzip при меньших затратах CPU. brotli и zstandard - необязательные
+зависимости: без них остаётся только gzip. Маленькие ответы не сжимаются,
+потоковые ответы сжимаются по частям.
+"""
+import asyncio
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/msgpack",
+    "application/vnd.",
+)
+# Потоковые события должны доходить до клиента сразу, без буферизации в компрессоре
+EXCLUDED_TYPES = ("text/event-stream",)
+# Ответы крупнее сжимаются в отдельном потоке, чтобы не блокировать цикл событий
+THREAD_THRESHOLD = 1024 * 1024
+
+
+class _Encoder:
+    """Потоковый компрессор с единым интерфейсом для всех кодировок"""
+
+    def __init__(self, compress: Callable[[bytes], bytes], finish: Callable[[], bytes]):
+        self.compress = compress
+        self.finish = finish
+
+
+def _gzip_encoder(level: int) -> _Encoder:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return _Encoder(compressor.compress, compressor.flush)
+
+
+def _brotli_encoder(level: int) -> _Encoder:
+    compressor = brotli.Compressor(quality=level)
+    return _Encoder(compressor.process, compressor.finish)
+
+
+def _zstd_encoder(level: int) -> _Encoder:
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return _Encoder(compressor.compress, compressor.flush)
+
+
+def available_encodings() -> List[str]:
+    """Поддерживаемые кодировки в порядке предпочтения сервера"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def parse_quality_values(header: str) -> Dict[str, float]:
+    """Разобрать заголовок вида ``a;q=0.5, b`` в словарь {значение: вес} в порядке следования"""
+    weights: Dict[str, float] = {}
+    for item in header.split(","):
+        name, *params = item.split(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+    return weights
+
+
+def choose_encoding(accept_encoding: str, encodings: List[str]) -> Optional[str]:
+    """Выбрать кодировку по заголовку Accept-Encoding, None - отдавать без сжатия"""
+    weights = parse_quality_values(accept_encoding)
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def _is_compressible(headers: List[Tuple[bytes, bytes]]) -> bool:
+    content_type = ""
+    for name, value in headers:
+        if name == b"content-encoding":
+            return False
+        if name == b"content-type":
+            content_type = value.decode("latin-1").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(EXCLUDED_TYPES)
+
+
+def _with_encoding(headers: List[Tuple[bytes, bytes]], encoding: str, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+    vary = [value for name, value in headers if name == b"vary"]
+    result = [(name, value) for name, value in headers if name not in (b"content-length", b"vary")]
+    result.append((b"content-encoding", encoding.encode("latin-1")))
+    result.append((b"vary", b", ".join([*vary, b"Accept-Encoding"])))
+    if length is not None:
+        result.append((b"content-length", str(length).encode("latin-1")))
+    return result
+
+
+class CompressionMiddleware:
+    """ASGI middleware: сжатие ответов крупнее ``minimum_size`` байт."""
+
+    def __init__(self, app, minimum_size: int = 1024, levels: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings()
+        self.levels = {"gzip": 6, "br": 4, "zstd": 3, **(levels or {})}
+        self.factories = {"gzip": _gzip_encoder, "br": _brotli_encoder, "zstd": _zstd_encoder}
+
+    def _encoder(self, encoding: str) -> _Encoder:
+        return self.factories[encoding](self.levels[encoding])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept_encoding, self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = list(start_message.get("headers", []))
+                if not _is_compressible(headers) or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                encoder = self._encoder(encoding)
+                if not more_body:
+                    # Весь ответ получен одним сообщением - сжимаем целиком
+                    if len(body) >= THREAD_THRESHOLD:
+                        compressed = await asyncio.to_thread(lambda: encoder.compress(body) + encoder.finish())
+                    else:
+                        compressed = encoder.compress(body) + encoder.finish()
+                    await send({**start_message, "headers": _with_encoding(headers, encoding, len(compressed))})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start_message, "headers": _with_encoding(headers, encoding, None)})
+
+            chunk = encoder.compress(body)
+            if not more_body:
+                chunk += encoder.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
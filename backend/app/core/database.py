@@ -1,23 +1,60 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from typing import Optional
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 
 from .settings import app_settings
 
-async_engine = create_async_engine(
-    url=app_settings.db_url,
-    echo=True,
-    pool_pre_ping=True,
-)
+# Движок и фабрика сессий создаются при первом обращении (обычно в lifespan
+# приложения), поэтому импорт моделей и сервисов не требует драйвера и базы
+_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[async_sessionmaker] = None
 
-AsyncSessionFactory = async_sessionmaker(
-    bind=async_engine,
-    expire_on_commit=False,
-    autocommit=False,
-)
+
+def engine_options() -> dict:
+    """Размеры кэшей запросов, общие для всех движков приложения.
+
+    Постоянные запросы репозиториев собираются один раз с параметрами (см.
+    ``repository.table``), поэтому их SQL не меняется от вызова к вызову и
+    остаётся в обоих кэшах.
+    """
+    return {
+        "query_cache_size": app_settings.DB_QUERY_CACHE_SIZE,
+        "connect_args": {"prepared_statement_cache_size": app_settings.DB_PREPARED_STATEMENT_CACHE_SIZE},
+    }
+
+
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(
+            url=app_settings.db_url,
+            echo=app_settings.DB_ECHO,
+            pool_pre_ping=True,
+            **engine_options(),
+        )
+    return _engine
+
+
+def get_session_factory() -> async_sessionmaker:
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = async_sessionmaker(
+            bind=get_engine(),
+            expire_on_commit=False,
+            autocommit=False,
+        )
+    return _session_factory
+
+
+async def dispose_engine() -> None:
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+        _engine, _session_factory = None, None
 
 
 async def get_db_session() -> AsyncSession:
-    async with AsyncSessionFactory() as async_session:
+    async with get_session_factory()() as async_session:
         yield async_session
 
 
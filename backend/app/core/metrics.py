@@ -0,0 +1,202 @@
+"""Метрики производительности в формате Prometheus.
+
+Метрики хранятся в памяти процесса: при запуске нескольких воркеров каждый
+отдаёт свои значения, агрегация выполняется на стороне Prometheus.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Tuple[str, ...] = (),
+            buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [счётчики бакетов..., +Inf, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        data = self._values.get(labels)
+        if data is None:
+            data = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        data[bisect_left(self.buckets, value)] += 1
+        data[-1] += value
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, data in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), data[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            label_str = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_str} {data[-1]}"
+            yield f"{self.name}_count{label_str} {cumulative}"
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Количество HTTP-запросов", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route")
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Количество SQL-запросов на HTTP-запрос", ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Суммарное время SQL-запросов на HTTP-запрос", ("method", "route")
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запроса", ("engine",)
+)
+
+_METRICS = (HTTP_REQUESTS, HTTP_LATENCY, REQUEST_DB_QUERIES, REQUEST_DB_TIME, DB_QUERY_LATENCY)
+_engines: Dict[str, AsyncEngine] = {}
+
+
+@dataclass
+class RequestStats:
+    """Статистика SQL-запросов в рамках одного HTTP-запроса"""
+
+    queries: int = 0
+    db_time: float = 0.0
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """Подписывается на события выполнения запросов движка SQLAlchemy."""
+    if _engines.get(name) is engine:
+        return
+    _engines[name] = engine
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        DB_QUERY_LATENCY.observe(elapsed, name)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+
+
+def _collect_pool_stats() -> Iterable[str]:
+    gauges = (
+        ("db_pool_size", "Размер пула соединений", "size"),
+        ("db_pool_checked_out", "Соединения, выданные из пула", "checkedout"),
+        ("db_pool_checked_in", "Свободные соединения в пуле", "checkedin"),
+        ("db_pool_overflow", "Соединения сверх размера пула", "overflow"),
+    )
+    for metric, documentation, method in gauges:
+        yield f"# HELP {metric} {documentation}"
+        yield f"# TYPE {metric} gauge"
+        for name, engine in _engines.items():
+            pool_method = getattr(engine.pool, method, None)
+            if pool_method is not None:
+                yield f'{metric}{{engine="{name}"}} {pool_method()}'
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.collect())
+    lines.extend(_collect_pool_stats())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: время ответа и SQL-статистика по шаблону маршрута."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_stats.reset(token)
+            route = scope.get("route")
+            # Немаршрутизированные запросы объединяются, чтобы не раздувать число меток
+            route_path = getattr(route, "path", "<unmatched>")
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method, route_path, str(status_code))
+            HTTP_LATENCY.observe(elapsed, method, route_path)
+            REQUEST_DB_QUERIES.observe(stats.queries, method, route_path)
+            REQUEST_DB_TIME.observe(stats.db_time, method, route_path)
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,195 @@
+"""Профилирование SQL-запросов в рамках HTTP-запроса.
+
+Режим включается настройкой ``profiling.enabled`` и предназначен для разработки
+и тестов: считает выполненные запросы, находит повторяющиеся (признак N+1),
+для медленных запросов сохраняет план выполнения и добавляет отчёт в заголовки
+ответа и в лог.
+
+Пример использования в тестах::
+
+    with profile_queries() as profile:
+        await service.get_table_rows(table_id=1, user_id=1)
+    profile.assert_budget(max_queries=2)
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .settings import app_settings
+
+_EXPLAIN_FLAG = "profiling_explain"
+
+
+@dataclass
+class SlowQuery:
+    statement: str
+    duration: float
+    plan: List[str] = field(default_factory=list)
+
+
+@dataclass
+class QueryProfile:
+    """Отчёт о запросах, выполненных в текущем контексте"""
+
+    slow_query_threshold: float = 0.1
+    repeated_threshold: int = 3
+    explain: bool = True
+    queries: int = 0
+    db_time: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    slow_queries: List[SlowQuery] = field(default_factory=list)
+
+    @property
+    def repeated(self) -> Dict[str, int]:
+        """Запросы, выполненные не меньше ``repeated_threshold`` раз - вероятные N+1"""
+        return {
+            statement: count
+            for statement, count in self.statements.items()
+            if count >= self.repeated_threshold
+        }
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "X-DB-Query-Count": str(self.queries),
+            "X-DB-Query-Time-Ms": f"{self.db_time * 1000:.1f}",
+            "X-DB-Repeated-Queries": str(len(self.repeated)),
+            "X-DB-Slow-Queries": str(len(self.slow_queries)),
+        }
+
+    def assert_budget(self, max_queries: int, allow_repeated: bool = False) -> None:
+        """Проверка бюджета запросов для тестов"""
+        problems = []
+        if self.queries > max_queries:
+            problems.append(f"executed {self.queries} queries, budget is {max_queries}")
+        if not allow_repeated and self.repeated:
+            problems.append(f"repeated statements: {self.repeated}")
+        if problems:
+            statements = "\n".join(f"{count}x {statement}" for statement, count in self.statements.items())
+            raise AssertionError("; ".join(problems) + "\n" + statements)
+
+
+query_profile: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+
+
+def _new_profile() -> QueryProfile:
+    config = app_settings.profiling
+    return QueryProfile(
+        slow_query_threshold=config.slow_query_ms / 1000,
+        repeated_threshold=config.repeated_threshold,
+        explain=config.explain_slow_queries,
+    )
+
+
+@contextmanager
+def profile_queries(profile: Optional[QueryProfile] = None) -> Iterator[QueryProfile]:
+    """Собирает статистику запросов, выполненных внутри блока"""
+    profile = profile or _new_profile()
+    token = query_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        query_profile.reset(token)
+
+
+def _explain(conn, statement: str, parameters: Any) -> List[str]:
+    # EXPLAIN ANALYZE повторно выполняет запрос, поэтому план с выполнением
+    # строится только для SELECT: WITH может содержать INSERT/UPDATE/DELETE.
+    # План строится в том же соединении внутри точки сохранения, откат к
+    # которой отменяет возможные изменения и не оставляет транзакцию
+    # прерванной, если EXPLAIN завершился ошибкой
+    is_select = statement.lstrip().upper().startswith("SELECT")
+    prefix = "EXPLAIN ANALYZE " if is_select else "EXPLAIN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    conn.info[_EXPLAIN_FLAG] = True
+    try:
+        cursor.execute(f"SAVEPOINT {_EXPLAIN_FLAG}")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+        finally:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {_EXPLAIN_FLAG}")
+            cursor.execute(f"RELEASE SAVEPOINT {_EXPLAIN_FLAG}")
+    finally:
+        conn.info[_EXPLAIN_FLAG] = False
+        cursor.close()
+
+
+def install_profiler(engine: AsyncEngine) -> None:
+    """Подписывает профилировщик на события выполнения запросов движка."""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "after_cursor_execute", _after_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if query_profile.get() is not None:
+        conn.info["profiling_start_time"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = query_profile.get()
+    if profile is None or conn.info.get(_EXPLAIN_FLAG):
+        return
+    elapsed = time.perf_counter() - conn.info.pop("profiling_start_time", time.perf_counter())
+    profile.queries += 1
+    profile.db_time += elapsed
+    profile.statements[statement] += 1
+    if elapsed >= profile.slow_query_threshold:
+        plan = _explain(conn, statement, parameters) if profile.explain and not executemany else []
+        profile.slow_queries.append(SlowQuery(statement=statement, duration=elapsed, plan=plan))
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware: отчёт о SQL-запросах в заголовках ответа и в логе."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = _new_profile()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.extend(
+                    (name.lower().encode(), value.encode()) for name, value in profile.headers().items()
+                )
+                message["headers"] = headers
+            await send(message)
+
+        with profile_queries(profile):
+            await self.app(scope, receive, send_wrapper)
+
+        if profile.repeated or profile.slow_queries:
+            logger.warning(
+                "{} {}: {} queries ({:.1f} ms), repeated: {}, slow: {}",
+                scope["method"],
+                scope["path"],
+                profile.queries,
+                profile.db_time * 1000,
+                profile.repeated,
+                [(query.statement, round(query.duration * 1000, 1), query.plan) for query in profile.slow_queries],
+            )
+        else:
+            logger.debug(
+                "{} {}: {} queries ({:.1f} ms)",
+                scope["method"],
+                scope["path"],
+                profile.queries,
+                profile.db_time * 1000,
+            )
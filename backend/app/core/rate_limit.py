@@ -0,0 +1,141 @@
+"""Ограничение частоты и параллельности запросов пользователей.
+
+Эндпоинты разбиты на классы (чтение, запись, тяжёлые запросы, массовые
+операции). Для каждого пользователя и класса ведётся корзина токенов:
+корзина вмещает ``burst`` токенов и пополняется со скоростью ``rate`` в
+секунду, запрос забирает из неё свою стоимость. Кроме того, число
+одновременно выполняемых запросов класса может быть ограничено
+``max_concurrent``.
+
+Состояние хранится в памяти процесса либо в Redis (настройки ``CACHE_*``),
+тогда ограничения общие для всех процессов. Redis - необязательная
+зависимость; при его недоступности запросы не ограничиваются.
+"""
+import time
+from typing import Dict
+
+from loguru import logger
+
+from backend.app.utils.cache import LRUCache
+from .settings import RouteClassLimit, app_settings
+
+KEY_PREFIX = "rate"
+
+# Корзина токенов: пополняет, списывает стоимость и возвращает время ожидания (0 - запрос разрешён)
+_TAKE_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(retry_after)
+"""
+
+# Занять место среди одновременно выполняемых запросов; счётчик истекает, если процесс упал, не освободив его
+_ACQUIRE_SCRIPT = """
+local running = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+if running > tonumber(ARGV[1]) then
+    redis.call('DECR', KEYS[1])
+    return 0
+end
+return 1
+"""
+
+# Освободить место; счётчик не уходит в минус, если место было выдано без Redis
+_RELEASE_SCRIPT = """
+if redis.call('DECR', KEYS[1]) <= 0 then
+    redis.call('DEL', KEYS[1])
+end
+"""
+
+
+class MemoryLimiter:
+    """Ограничения в памяти процесса: при нескольких процессах у каждого свои корзины"""
+
+    def __init__(self, maxsize: int = 100_000):
+        self._buckets = LRUCache(maxsize=maxsize)
+        self._running: Dict[str, int] = {}
+
+    async def take(self, key: str, cost: float, limit: RouteClassLimit) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (float(limit.burst), now))
+        tokens = min(float(limit.burst), tokens + (now - updated) * limit.rate)
+        if tokens >= cost:
+            self._buckets.set(key, (tokens - cost, now))
+            return 0.0
+        self._buckets.set(key, (tokens, now))
+        return (cost - tokens) / limit.rate
+
+    async def acquire(self, key: str, max_concurrent: int) -> bool:
+        running = self._running.get(key, 0)
+        if running >= max_concurrent:
+            return False
+        self._running[key] = running + 1
+        return True
+
+    async def release(self, key: str) -> None:
+        running = self._running.get(key, 0) - 1
+        if running > 0:
+            self._running[key] = running
+        else:
+            self._running.pop(key, None)
+
+
+class RedisLimiter:
+    """Ограничения в Redis, общие для всех процессов приложения"""
+
+    def __init__(self, redis, slot_ttl_seconds: int):
+        self.redis = redis
+        self.slot_ttl_seconds = slot_ttl_seconds
+        self._take = self.redis.register_script(_TAKE_SCRIPT)
+        self._acquire = self.redis.register_script(_ACQUIRE_SCRIPT)
+        self._release = self.redis.register_script(_RELEASE_SCRIPT)
+
+    async def take(self, key: str, cost: float, limit: RouteClassLimit) -> float:
+        try:
+            return float(await self._take(keys=[f"{KEY_PREFIX}:{key}"], args=[limit.rate, limit.burst, cost]))
+        except Exception as e:
+            logger.warning(f"Rate limit check failed, request allowed: {e}")
+            return 0.0
+
+    async def acquire(self, key: str, max_concurrent: int) -> bool:
+        try:
+            return bool(await self._acquire(
+                keys=[f"{KEY_PREFIX}:{key}:running"], args=[max_concurrent, self.slot_ttl_seconds]
+            ))
+        except Exception as e:
+            logger.warning(f"Concurrency check failed, request allowed: {e}")
+            return True
+
+    async def release(self, key: str) -> None:
+        try:
+            await self._release(keys=[f"{KEY_PREFIX}:{key}:running"])
+        except Exception as e:
+            logger.warning(f"Cannot release concurrency slot {key}: {e}")
+
+
+def create_limiter():
+    config = app_settings.rate_limits
+    if config.backend == "redis":
+        # redis импортируется только когда он выбран: пакет тяжёлый и необязательный
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError:
+            logger.warning("Package redis is not installed, rate limits are kept in process memory")
+        else:
+            return RedisLimiter(redis_asyncio.from_url(app_settings.cache_url), config.slot_ttl_seconds)
+    return MemoryLimiter()
+
+
+limiter = create_limiter()
@@ -0,0 +1,190 @@
+"""Маршрутизация чтения на реплики базы данных.
+
+Запросы GET/HEAD/OPTIONS и POST из ``READ_ONLY_ROUTES`` (запросы, параметры
+которых не помещаются в URL) читают с реплики: за запросом закрепляется одна
+реплика, выбранная по кругу среди здоровых, отставание которых не превышает
+``max_lag_seconds``. Если подходящей реплики нет, чтение идёт с основной базы.
+Изменяющие запросы целиком работают с основной базой, а после успешного
+изменения клиент получает cookie, по которой его чтения ещё ``sticky_seconds``
+направляются на основную базу - пользователь сразу видит свои изменения.
+Вне HTTP-запросов (фоновые задачи, скрипты) всегда используется основная база.
+"""
+import asyncio
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from http.cookies import SimpleCookie
+from typing import Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from .database import engine_options
+from .settings import app_settings
+
+STICKY_COOKIE = "read_primary_until"
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+# POST-запросы, которые ничего не изменяют: сводные таблицы и определение схемы файла
+READ_ONLY_ROUTES = (
+    re.compile(r"/data/\d+/pivot$"),
+    re.compile(r"/tables/infer-schema$"),
+)
+HEALTH_CHECK_TIMEOUT = 2.0
+
+# Отставание реплики в секундах; 0 - реплика применила всё полученное
+_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+@dataclass
+class Replica:
+    name: str
+    engine: AsyncEngine
+    session_factory: async_sessionmaker
+    healthy: bool = False
+    lag: Optional[float] = None
+
+
+class ReplicaSet:
+    """Реплики только для чтения с проверкой состояния и выбором по кругу"""
+
+    def __init__(self, urls: List[str], max_lag_seconds: float):
+        self.urls = urls
+        self.max_lag_seconds = max_lag_seconds
+        self._replicas: Optional[List[Replica]] = None
+        self._next = 0
+
+    @property
+    def replicas(self) -> List[Replica]:
+        """Реплики; движки создаются при первом обращении"""
+        if self._replicas is None:
+            self._replicas = []
+            for index, url in enumerate(self.urls):
+                engine = create_async_engine(url=url, echo=app_settings.DB_ECHO, pool_pre_ping=True, **engine_options())
+                self._replicas.append(Replica(
+                    name=f"replica{index}",
+                    engine=engine,
+                    session_factory=async_sessionmaker(bind=engine, expire_on_commit=False, autocommit=False),
+                ))
+        return self._replicas
+
+    def __bool__(self) -> bool:
+        return bool(self.urls)
+
+    def choose(self) -> Optional[Replica]:
+        """Следующая по кругу здоровая реплика с допустимым отставанием"""
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            if replica.healthy and replica.lag is not None and replica.lag <= self.max_lag_seconds:
+                return replica
+        return None
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            async with replica.engine.connect() as connection:
+                lag = await asyncio.wait_for(connection.scalar(_LAG_QUERY), HEALTH_CHECK_TIMEOUT)
+        except Exception as e:
+            if replica.healthy:
+                logger.warning(f"Read replica {replica.name} is unavailable: {e}")
+            replica.healthy, replica.lag = False, None
+            return
+        if not replica.healthy:
+            logger.info(f"Read replica {replica.name} is available")
+        replica.healthy, replica.lag = True, float(lag) if lag is not None else None
+
+    async def check(self) -> None:
+        """Проверить доступность и отставание всех реплик"""
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def dispose(self) -> None:
+        for replica in self._replicas or []:
+            await replica.engine.dispose()
+        self._replicas = None
+
+
+replicas = ReplicaSet(app_settings.replicas.urls, app_settings.replicas.max_lag_seconds)
+
+# Маршрутизация чтения текущего запроса: None - запрос не маршрутизируется (основная база)
+_read_routing: ContextVar[Optional[Dict[str, Optional[Replica]]]] = ContextVar("read_routing", default=None)
+
+
+def read_session_factory(default: async_sessionmaker) -> async_sessionmaker:
+    """Фабрика сессий для чтения: реплика, закреплённая за текущим запросом, или ``default``"""
+    routing = _read_routing.get()
+    if routing is None:
+        return default
+    if "replica" not in routing:
+        routing["replica"] = replicas.choose()
+    replica = routing["replica"]
+    return replica.session_factory if replica is not None else default
+
+
+async def run_replica_health_checks() -> None:
+    """Фоновая задача периодической проверки реплик"""
+    while True:
+        try:
+            await replicas.check()
+        except Exception as e:
+            logger.error(f"Read replica health check failed: {e}")
+        await asyncio.sleep(app_settings.replicas.health_check_interval_seconds)
+
+
+def _is_read(scope) -> bool:
+    if scope["method"] in READ_METHODS:
+        return True
+    return scope["method"] == "POST" and any(route.search(scope["path"]) for route in READ_ONLY_ROUTES)
+
+
+def _sticky_until(scope) -> float:
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            morsel = SimpleCookie(value.decode("latin-1")).get(STICKY_COOKIE)
+            if morsel is not None:
+                try:
+                    return float(morsel.value)
+                except ValueError:
+                    return 0.0
+    return 0.0
+
+
+class ReplicaRoutingMiddleware:
+    """ASGI middleware: направляет чтение запросов на реплики."""
+
+    def __init__(self, app, sticky_seconds: float = 10.0):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if _is_read(scope):
+            if _sticky_until(scope) > time.time():
+                await self.app(scope, receive, send)
+                return
+            token = _read_routing.set({})
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _read_routing.reset(token)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                max_age = int(self.sticky_seconds) + 1
+                cookie = (
+                    f"{STICKY_COOKIE}={time.time() + self.sticky_seconds:.3f}; "
+                    f"Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,53 @@
+import math
+from typing import Dict, Optional
+
+from fastapi import status
+
+
+class AppException(Exception):
+    """Базовое исключение бизнес-логики, преобразуемое в HTTP-ответ"""
+
+    status_code: int = status.HTTP_400_BAD_REQUEST
+    headers: Optional[Dict[str, str]] = None
+
+    def __init__(self, message: str = ""):
+        super().__init__(message)
+        self.message = message
+
+
+class AccessDeniedException(AppException):
+    """Нет доступа к таблице"""
+
+    status_code = status.HTTP_403_FORBIDDEN
+
+
+class NotFoundException(AppException):
+    """Объект не найден"""
+
+    status_code = status.HTTP_404_NOT_FOUND
+
+
+class ValidationException(AppException):
+    """Данные не соответствуют схеме таблицы"""
+
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+
+class TooManyRequestsException(AppException):
+    """Превышено ограничение частоты или параллельности запросов"""
+
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+
+    def __init__(self, message: str = "", retry_after: float = 1.0):
+        super().__init__(message)
+        self.headers = {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+
+__all__ = [
+    "AppException",
+    "AccessDeniedException",
+    "NotFoundException",
+    "ValidationException",
+    "TooManyRequestsException",
+]
@@ -1,14 +1,17 @@
-from typing import List, TypeVar, Generic, Type
+from typing import Dict, List, TypeVar, Generic, Type
 from pydantic import BaseModel
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.future import select
-from sqlalchemy import update as sqlalchemy_update, delete as sqlalchemy_delete, func
+from sqlalchemy import Select, bindparam, update as sqlalchemy_update, delete as sqlalchemy_delete, func
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 from .database import Base
 
 T = TypeVar("T", bound=Base)
 
+# Запросы по ID для каждой модели; собираются один раз, поиск по ID выполняется при каждой проверке токена
+_by_id_queries: Dict[type, Select] = {}
+
 
 class BaseDAO(Generic[T]):
     model: Type[T] = None
@@ -18,76 +21,83 @@ class BaseDAO(Generic[T]):
         if self.model is None:
             raise ValueError("Модель должна быть указана в дочернем классе")
 
+    @classmethod
+    def _by_id_query(cls) -> Select:
+        query = _by_id_queries.get(cls.model)
+        if query is None:
+            query = _by_id_queries[cls.model] = select(cls.model).where(cls.model.id == bindparam("data_id"))
+        return query
+
     async def find_one_or_none_by_id(self, data_id: int):
         try:
-            query = select(self.model).filter_by(id=data_id)
-            result = await self._session.execute(query)
+            result = await self._session.execute(self._by_id_query(), {"data_id": data_id})
             record = result.scalar_one_or_none()
-            log_message = f"Запись {self.model.__name__} с ID {data_id} {'найдена' if record else 'не найдена'}."
-            logger.info(log_message)
+            logger.debug(
+                "Запись {} с ID {} {}.", self.model.__name__, data_id, "найдена" if record else "не найдена"
+            )
             return record
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при поиске записи с ID {data_id}: {e}")
+            logger.error("Ошибка при поиске записи с ID {}: {}", data_id, e)
             raise
 
     async def find_one_or_none(self, filters: BaseModel):
         filter_dict = filters.model_dump(exclude_unset=True)
-        logger.info(f"Поиск одной записи {self.model.__name__} по фильтрам: {filter_dict}")
+        logger.debug("Поиск одной записи {} по фильтрам: {}", self.model.__name__, filter_dict)
         try:
             query = select(self.model).filter_by(**filter_dict)
             result = await self._session.execute(query)
             record = result.scalar_one_or_none()
-            log_message = f"Запись {'найдена' if record else 'не найдена'} по фильтрам: {filter_dict}"
-            logger.info(log_message)
+            logger.debug("Запись {} по фильтрам: {}", "найдена" if record else "не найдена", filter_dict)
             return record
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при поиске записи по фильтрам {filter_dict}: {e}")
+            logger.error("Ошибка при поиске записи по фильтрам {}: {}", filter_dict, e)
             raise
 
     async def find_all(self, filters: BaseModel | None = None):
         filter_dict = filters.model_dump(exclude_unset=True) if filters else {}
-        logger.info(f"Поиск всех записей {self.model.__name__} по фильтрам: {filter_dict}")
+        logger.debug("Поиск всех записей {} по фильтрам: {}", self.model.__name__, filter_dict)
         try:
             query = select(self.model).filter_by(**filter_dict)
             result = await self._session.execute(query)
             records = result.scalars().all()
-            logger.info(f"Найдено {len(records)} записей.")
+            logger.debug("Найдено {} записей.", len(records))
             return records
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при поиске всех записей по фильтрам {filter_dict}: {e}")
+            logger.error("Ошибка при поиске всех записей по фильтрам {}: {}", filter_dict, e)
             raise
 
     async def add(self, values: BaseModel):
         values_dict = values.model_dump(exclude_unset=True)
-        logger.info(f"Добавление записи {self.model.__name__} с параметрами: {values_dict}")
+        logger.debug("Добавление записи {} с параметрами: {}", self.model.__name__, values_dict)
         try:
             new_instance = self.model(**values_dict)
             self._session.add(new_instance)
-            logger.info(f"Запись {self.model.__name__} успешно добавлена.")
+            logger.debug("Запись {} успешно добавлена.", self.model.__name__)
             await self._session.flush()
             return new_instance
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при добавлении записи: {e}")
+            logger.error("Ошибка при добавлении записи: {}", e)
             raise
 
     async def add_many(self, instances: List[BaseModel]):
         values_list = [item.model_dump(exclude_unset=True) for item in instances]
-        logger.info(f"Добавление нескольких записей {self.model.__name__}. Количество: {len(values_list)}")
+        logger.debug("Добавление нескольких записей {}. Количество: {}", self.model.__name__, len(values_list))
         try:
             new_instances = [self.model(**values) for values in values_list]
             self._session.add_all(new_instances)
-            logger.info(f"Успешно добавлено {len(new_instances)} записей.")
+            logger.debug("Успешно добавлено {} записей.", len(new_instances))
             await self._session.flush()
             return new_instances
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при добавлении нескольких записей: {e}")
+            logger.error("Ошибка при добавлении нескольких записей: {}", e)
             raise
 
     async def update(self, filters: BaseModel, values: BaseModel):
         filter_dict = filters.model_dump(exclude_unset=True)
         values_dict = values.model_dump(exclude_unset=True)
-        logger.info(
-            f"Обновление записей {self.model.__name__} по фильтру: {filter_dict} с параметрами: {values_dict}")
+        logger.debug(
+            "Обновление записей {} по фильтру: {} с параметрами: {}", self.model.__name__, filter_dict, values_dict
+        )
         try:
             query = (
                 sqlalchemy_update(self.model)
@@ -96,44 +106,44 @@ class BaseDAO(Generic[T]):
                 .execution_options(synchronize_session="fetch")
             )
             result = await self._session.execute(query)
-            logger.info(f"Обновлено {result.rowcount} записей.")
+            logger.debug("Обновлено {} записей.", result.rowcount)
             await self._session.flush()
             return result.rowcount
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при обновлении записей: {e}")
+            logger.error("Ошибка при обновлении записей: {}", e)
             raise
 
     async def delete(self, filters: BaseModel):
         filter_dict = filters.model_dump(exclude_unset=True)
-        logger.info(f"Удаление записей {self.model.__name__} по фильтру: {filter_dict}")
+        logger.debug("Удаление записей {} по фильтру: {}", self.model.__name__, filter_dict)
         if not filter_dict:
             logger.error("Нужен хотя бы один фильтр для удаления.")
             raise ValueError("Нужен хотя бы один фильтр для удаления.")
         try:
             query = sqlalchemy_delete(self.model).filter_by(**filter_dict)
             result = await self._session.execute(query)
-            logger.info(f"Удалено {result.rowcount} записей.")
+            logger.debug("Удалено {} записей.", result.rowcount)
             await self._session.flush()
             return result.rowcount
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при удалении записей: {e}")
+            logger.error("Ошибка при удалении записей: {}", e)
             raise
 
     async def count(self, filters: BaseModel | None = None):
         filter_dict = filters.model_dump(exclude_unset=True) if filters else {}
-        logger.info(f"Подсчет количества записей {self.model.__name__} по фильтру: {filter_dict}")
+        logger.debug("Подсчет количества записей {} по фильтру: {}", self.model.__name__, filter_dict)
         try:
             query = select(func.count(self.model.id)).filter_by(**filter_dict)
             result = await self._session.execute(query)
             count = result.scalar()
-            logger.info(f"Найдено {count} записей.")
+            logger.debug("Найдено {} записей.", count)
             return count
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при подсчете записей: {e}")
+            logger.error("Ошибка при подсчете записей: {}", e)
             raise
 
     async def bulk_update(self, records: List[BaseModel]):
-        logger.info(f"Массовое обновление записей {self.model.__name__}")
+        logger.debug("Массовое обновление записей {}", self.model.__name__)
         try:
             updated_count = 0
             for record in records:
@@ -150,9 +160,9 @@ class BaseDAO(Generic[T]):
                 result = await self._session.execute(stmt)
                 updated_count += result.rowcount
 
-            logger.info(f"Обновлено {updated_count} записей")
+            logger.debug("Обновлено {} записей", updated_count)
             await self._session.flush()
             return updated_count
         except SQLAlchemyError as e:
-            logger.error(f"Ошибка при массовом обновлении: {e}")
+            logger.error("Ошибка при массовом обновлении: {}", e)
             raise
@@ -1,15 +1,39 @@
 import uuid
 from datetime import datetime
 from decimal import Decimal
-from typing import Annotated
+from typing import Annotated, Optional
 from sqlalchemy import func, TIMESTAMP, Integer, inspect
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase, declared_attr
-from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine, AsyncSession
-from backend.app.config import database_url
+from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncEngine, async_sessionmaker, create_async_engine, AsyncSession
+from backend.app.config import get_settings
+from backend.app.core.database import engine_options
+
+_engine: Optional[AsyncEngine] = None
+_session_maker: Optional[async_sessionmaker] = None
+
+
+def get_engine() -> AsyncEngine:
+    """Движок базы данных авторизации, создаётся при первом обращении"""
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(url=get_settings().DB_URL, **engine_options())
+    return _engine
+
+
+def get_session_maker() -> async_sessionmaker:
+    global _session_maker
+    if _session_maker is None:
+        _session_maker = async_sessionmaker(get_engine(), class_=AsyncSession, expire_on_commit=False)
+    return _session_maker
+
+
+async def dispose_engine() -> None:
+    global _engine, _session_maker
+    if _engine is not None:
+        await _engine.dispose()
+        _engine, _session_maker = None, None
 
 
-engine = create_async_engine(url=database_url)
-async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 str_uniq = Annotated[str, mapped_column(unique=True, nullable=False)]
 
 
@@ -1,11 +1,13 @@
 from datetime import datetime, timezone
-from fastapi import Request, Depends
+from typing import Optional
+from fastapi import Request, Depends, HTTPException
 from jose import jwt, JWTError, ExpiredSignatureError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.app.auth.dao import UsersDAO
 from backend.app.auth.models import User
-from backend.app.config import settings
+from backend.app.auth.revocation import is_token_revoked
+from backend.app.config import get_settings
 from backend.app.dependencies.dao_dep import get_session_without_commit
 from backend.app.exceptions import (
     TokenNoFound, NoJwtException, TokenExpiredException, NoUserIdException, ForbiddenException, UserNotFoundException
@@ -28,28 +30,44 @@ def get_refresh_token(request: Request) -> str:
     return token
 
 
-async def check_refresh_token(
-        token: str = Depends(get_refresh_token),
-        session: AsyncSession = Depends(get_session_without_commit)
-) -> User:
-    """ Проверяем refresh_token и возвращаем пользователя."""
+def decode_refresh_token(token: str) -> dict:
+    """Проверяем подпись и срок refresh_token и возвращаем его содержимое."""
+    settings = get_settings()
     try:
         payload = jwt.decode(
             token,
             settings.SECRET_KEY,
             algorithms=[settings.ALGORITHM]
         )
-        user_id = payload.get("sub")
-        if not user_id:
-            raise NoJwtException
+    except JWTError:
+        raise NoJwtException
+    if not payload.get("sub") or payload.get("type") != "refresh":
+        raise NoJwtException
+    return payload
 
-        user = await UsersDAO(session).find_one_or_none_by_id(data_id=int(user_id))
-        if not user:
-            raise NoJwtException
 
-        return user
-    except JWTError:
+async def check_refresh_token(token: str = Depends(get_refresh_token)) -> int:
+    """Проверяем refresh_token и возвращаем ID пользователя.
+
+    База не запрашивается: достаточно подписи, срока и отсутствия отзыва
+    при выходе. Удалённый пользователь не пройдёт проверку access-токена.
+    """
+    payload = decode_refresh_token(token)
+    user_id = int(payload["sub"])
+    if await is_token_revoked(user_id, payload):
         raise NoJwtException
+    return user_id
+
+
+def get_refresh_token_user_id(request: Request) -> Optional[int]:
+    """ID пользователя из refresh_token в куках; None, если токена нет или он невалиден."""
+    token = request.cookies.get('user_refresh_token')
+    if not token:
+        return None
+    try:
+        return int(decode_refresh_token(token)["sub"])
+    except HTTPException:
+        return None
 
 
 async def get_current_user(
@@ -57,6 +75,7 @@ async def get_current_user(
         session: AsyncSession = Depends(get_session_without_commit)
 ) -> User:
     """Проверяем access_token и возвращаем пользователя."""
+    settings = get_settings()
     try:
         # Декодируем токен
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -74,6 +93,8 @@ async def get_current_user(
     user_id: str = payload.get('sub')
     if not user_id:
         raise NoUserIdException
+    if await is_token_revoked(int(user_id), payload):
+        raise NoJwtException
 
     user = await UsersDAO(session).find_one_or_none_by_id(data_id=int(user_id))
     if not user:
@@ -1,11 +1,12 @@
 from typing import AsyncGenerator
 from sqlalchemy.ext.asyncio import AsyncSession
-from backend.app.dao.database import async_session_maker
+from backend.app.core.replicas import read_session_factory
+from backend.app.dao.database import get_session_maker
 
 
 async def get_session_with_commit() -> AsyncGenerator[AsyncSession, None]:
     """Асинхронная сессия с автоматическим коммитом."""
-    async with async_session_maker() as session:
+    async with get_session_maker()() as session:
         try:
             yield session
             await session.commit()
@@ -17,8 +18,8 @@ async def get_session_with_commit() -> AsyncGenerator[AsyncSession, None]:
 
 
 async def get_session_without_commit() -> AsyncGenerator[AsyncSession, None]:
-    """Асинхронная сессия без автоматического коммита."""
-    async with async_session_maker() as session:
+    """Асинхронная сессия без автоматического коммита; в запросах на чтение - с реплики."""
+    async with read_session_factory(get_session_maker())() as session:
         try:
             yield session
         except Exception:
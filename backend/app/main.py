@@ -1,19 +1,78 @@
+import asyncio
+import sys
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
 
 from backend.app.auth.router import router as router_auth
+from backend.app.auth.utils import get_pwd_context
+from backend.app.api.endpoints.data import router as router_data
+from backend.app.api.endpoints.history import router as router_history
+from backend.app.api.endpoints.tables import router as router_tables
+from backend.app.custom_exceptions import AppException
+from backend.app.core import app_settings
+from backend.app.core.compression import CompressionMiddleware
+from backend.app.core.database import dispose_engine, get_engine
+from backend.app.core.metrics import MetricsMiddleware, instrument_engine, router as router_metrics
+from backend.app.core.profiling import QueryProfilerMiddleware, install_profiler
+from backend.app.core.replicas import ReplicaRoutingMiddleware, replicas, run_replica_health_checks
+from backend.app.dao import database as dao_database
+from backend.app.services.excel_processor import shutdown_process_pool
+from backend.app.services.data import run_row_order_rebalancing
+from backend.app.services.history import run_history_compaction
+from backend.app.services.table import run_table_jobs, run_table_promotion
+
+
+def setup_engines() -> None:
+    """Создание движков БД и подключение к ним метрик и профилировщика."""
+    engine, dao_engine = get_engine(), dao_database.get_engine()
+    if app_settings.metrics.enabled:
+        instrument_engine(engine, "core")
+        instrument_engine(dao_engine, "dao")
+        for replica in replicas.replicas:
+            instrument_engine(replica.engine, replica.name)
+    if app_settings.profiling.enabled:
+        install_profiler(engine)
+        install_profiler(dao_engine)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[dict, None]:
     """Управление жизненным циклом приложения."""
     logger.info("Инициализация приложения...")
+    # Движки БД и контекст хеширования паролей создаются здесь, а не при импорте:
+    # импорт приложения (воркеры, тесты, скрипты) не требует базы и не тратит на них время
+    setup_engines()
+    get_pwd_context()
+    tasks = [
+        asyncio.create_task(run_history_compaction()),
+        asyncio.create_task(run_row_order_rebalancing()),
+        asyncio.create_task(run_table_promotion()),
+        asyncio.create_task(run_table_jobs()),
+    ]
+    if replicas:
+        tasks.append(asyncio.create_task(run_replica_health_checks()))
     yield
     logger.info("Завершение работы приложения...")
+    # Фоновые задачи откатывают незавершённые транзакции и возвращают соединения
+    # в пул до его закрытия; задача, прерванная посреди операции, повторится позже
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await replicas.dispose()
+    await dispose_engine()
+    await dao_database.dispose_engine()
+    shutdown_process_pool()
+
+
+def setup_logging() -> None:
+    """Настройка loguru: сообщения ниже заданного уровня отбрасываются без форматирования."""
+    logger.remove()
+    logger.add(sys.stderr, level=app_settings.logging.log_level.upper())
 
 
 def create_app() -> FastAPI:
@@ -23,6 +82,8 @@ def create_app() -> FastAPI:
    Returns:
        Сконфигурированное приложение FastAPI
    """
+    setup_logging()
+
     app = FastAPI(
         title="Стартовая сборка FastAPI",
         description=(
@@ -44,6 +105,27 @@ def create_app() -> FastAPI:
         allow_headers=["*"]
     )
 
+    # Сжатие ответов; внутри middleware метрик, чтобы они учитывали и время сжатия
+    if app_settings.compression.enabled:
+        config = app_settings.compression
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=config.minimum_size,
+            levels={"gzip": config.gzip_level, "br": config.brotli_quality, "zstd": config.zstd_level},
+        )
+
+    # Чтение с реплик
+    if replicas:
+        app.add_middleware(ReplicaRoutingMiddleware, sticky_seconds=app_settings.replicas.sticky_seconds)
+
+    # Метрики производительности; движки БД инструментируются в lifespan
+    if app_settings.metrics.enabled:
+        app.add_middleware(MetricsMiddleware)
+
+    # Профилирование SQL-запросов (только для разработки и тестов)
+    if app_settings.profiling.enabled:
+        app.add_middleware(QueryProfilerMiddleware)
+
     # Монтирование статических файлов
     # app.mount(
     #     '/static',
@@ -51,6 +133,11 @@ def create_app() -> FastAPI:
     #     name='static'
     # )
 
+    # Обработка исключений бизнес-логики
+    @app.exception_handler(AppException)
+    async def app_exception_handler(request: Request, exc: AppException) -> JSONResponse:
+        return JSONResponse(status_code=exc.status_code, content={"detail": exc.message}, headers=exc.headers)
+
     # Регистрация роутеров
     register_routers(app)
 
@@ -73,6 +160,11 @@ def register_routers(app: FastAPI) -> None:
     # Подключение роутеров
     app.include_router(root_router, tags=["root"])
     app.include_router(router_auth, prefix='/auth', tags=['Auth'])
+    app.include_router(router_data)
+    app.include_router(router_history)
+    app.include_router(router_tables)
+    if app_settings.metrics.enabled:
+        app.include_router(router_metrics, tags=["metrics"])
 
 
 # Создание экземпляра приложения
@@ -1,6 +1,9 @@
 from .data import TableRow
 from .table import TablePermission, DataTable
 from .user import User, UserRole
+from .history import ChangeBatch, RowChange
+from .job import TableJob
+from .snapshot import TableSnapshot
 
 
 __all__ = [
@@ -9,4 +12,8 @@ __all__ = [
     "UserRole",
     "DataTable",
     "TablePermission",
+    "ChangeBatch",
+    "RowChange",
+    "TableJob",
+    "TableSnapshot",
 ]
@@ -9,11 +9,14 @@ from backend.app.core.database import Base
 class TableRow(Base):
     __tablename__ = "table_rows"
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    table_id: Mapped[int] = mapped_column(ForeignKey("data_tables.id"), nullable=False)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True)
+    # Ключ партиционирования (см. repository/partition), поэтому входит в первичный ключ
+    table_id: Mapped[int] = mapped_column(ForeignKey("data_tables.id"), primary_key=True)
 
     # Динамические данные
     row_data: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False)
+    # Ключ ручного порядка строк (см. utils/ordering), сравнивается побайтно
+    position: Mapped[str] = mapped_column(String(collation="C"), nullable=False)
 
     # Мета-информация
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -26,6 +29,8 @@ class TableRow(Base):
     __table_args__ = (
         Index('ix_table_rows_table_id_created', 'table_id', 'created_at'),
         Index('ix_table_rows_table_id_updated', 'table_id', 'updated_at'),
+        Index('ix_table_rows_table_id_position', 'table_id', 'position', 'id'),
+        {"postgresql_partition_by": "LIST (table_id)"},
     )
 
     def __repr__(self):
@@ -0,0 +1,72 @@
+from sqlalchemy import String, Integer, Boolean, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql import func
+from typing import Optional, Dict, Any, List
+
+from backend.app.core.database import Base
+
+
+class ChangeBatch(Base):
+    """Одна операция изменения таблицы (пачка изменений строк)"""
+
+    __tablename__ = "table_change_batches"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    table_id: Mapped[int] = mapped_column(ForeignKey("data_tables.id", ondelete="CASCADE"), nullable=False)
+    # NULL для сжатых записей, объединяющих изменения разных пользователей
+    user_id: Mapped[Optional[int]] = mapped_column(Integer)
+
+    # insert / update / delete / undo / redo / compacted
+    operation: Mapped[str] = mapped_column(String(16), nullable=False)
+    # Для обычных операций - отменена ли операция; для undo - использована ли отмена (redo или новая правка)
+    undone: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false", nullable=False)
+    # Для undo - ID отменённой пачки, для redo - ID повторённой undo-пачки
+    undo_of_id: Mapped[Optional[int]] = mapped_column(Integer)
+
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    changes: Mapped[List["RowChange"]] = relationship(
+        "RowChange",
+        back_populates="batch",
+        passive_deletes=True,
+    )
+
+    __table_args__ = (
+        Index("ix_table_change_batches_table_user", "table_id", "user_id", "id"),
+        Index("ix_table_change_batches_table_created", "table_id", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<ChangeBatch(id={self.id}, table_id={self.table_id}, operation={self.operation})>"
+
+
+class RowChange(Base):
+    """Изменение одной строки в пределах пачки.
+
+    Хранятся только изменённые ячейки: ``before`` и ``after`` содержат значения
+    затронутых колонок до и после операции. ``before`` равен NULL для вставки
+    строки, ``after`` - для удаления (тогда ``before`` хранит строку целиком).
+    """
+
+    __tablename__ = "table_row_changes"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    batch_id: Mapped[int] = mapped_column(
+        ForeignKey("table_change_batches.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    table_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    row_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    before: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON(none_as_null=True))
+    after: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON(none_as_null=True))
+    # Позиция удалённой строки, чтобы отмена удаления вернула её на прежнее место
+    position: Mapped[Optional[str]] = mapped_column(String(collation="C"))
+
+    batch: Mapped["ChangeBatch"] = relationship("ChangeBatch", back_populates="changes")
+
+    __table_args__ = (
+        Index("ix_table_row_changes_table_row", "table_id", "row_id"),
+    )
+
+    def __repr__(self):
+        return f"<RowChange(id={self.id}, batch_id={self.batch_id}, row_id={self.row_id})>"
@@ -0,0 +1,46 @@
+from sqlalchemy import String, Integer, DateTime, Text, Index, JSON, text
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from typing import Any, Dict, Optional
+
+from backend.app.core.database import Base
+
+
+class TableJob(Base):
+    """Фоновая операция над таблицей целиком (удаление, очистка, копирование, проверка качества)"""
+
+    __tablename__ = "table_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Без внешнего ключа: задача удаления переживает удаляемую таблицу
+    table_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # delete / clear / copy / scan
+    operation: Mapped[str] = mapped_column(String(16), nullable=False)
+    # pending / running / done / failed
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="pending", server_default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # Имя копии для copy
+    name: Mapped[Optional[str]] = mapped_column(String)
+    # Созданная копия для copy
+    result_table_id: Mapped[Optional[int]] = mapped_column(Integer)
+    # Параметры операции (для scan - см. TableScanRequest)
+    options: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON)
+    # Количество удалённых, скопированных или проверенных строк
+    row_count: Mapped[Optional[int]] = mapped_column(Integer)
+    # Отчёт проверки качества данных для scan
+    report: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    # Не запускать раньше: отложенный повтор после ошибки или срок выполнения запущенной задачи
+    run_after: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    finished_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_table_jobs_pending", "id", postgresql_where=text("status IN ('pending', 'running')")),
+    )
+
+    def __repr__(self):
+        return f"<TableJob(id={self.id}, table_id={self.table_id}, operation={self.operation})>"
@@ -0,0 +1,30 @@
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from backend.app.core.database import Base
+
+
+class TableSnapshot(Base):
+    """Именованный снимок таблицы на момент создания.
+
+    Строки снимком не копируются: его состояние - текущие строки таблицы с
+    отменёнными изменениями из журнала, сделанными после ``created_at``, поэтому
+    снимок занимает место только под последующие изменения. Пока снимок
+    существует, эти изменения не удаляются и не сжимаются (см. HistoryRepository.compact).
+    """
+
+    __tablename__ = "table_snapshots"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    table_id: Mapped[int] = mapped_column(ForeignKey("data_tables.id", ondelete="CASCADE"), nullable=False)
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    created_by_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_table_snapshots_table_name", "table_id", "name", unique=True),
+    )
+
+    def __repr__(self):
+        return f"<TableSnapshot(id={self.id}, table_id={self.table_id}, name={self.name})>"
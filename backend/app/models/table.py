@@ -1,4 +1,5 @@
-from sqlalchemy import String, Integer, Boolean, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import String, Integer, Boolean, DateTime, Text, ForeignKey, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from typing import Optional, List, Dict, Any
@@ -17,20 +18,35 @@ class DataTable(Base):
 
     created_by_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     is_public: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Увеличивается при каждом изменении строк, используется как ключ кэшей
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+    # Увеличивается, когда строки добавляются, удаляются или меняют ручной порядок
+    order_version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+    # Колонка -> версия таблицы при последнем изменении её значений в существующих строках
+    column_versions: Mapped[Dict[str, int]] = mapped_column(
+        JSONB, nullable=False, default=dict, server_default="{}"
+    )
+    # Ключи ручного порядка строк стали слишком длинными, таблицу нужно перебалансировать
+    needs_rebalance: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default="false")
+    # Таблица удаляется фоновой задачей и уже недоступна пользователям
+    is_deleted: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default="false")
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
+    # Строки и права удаляются запросами SQL (TableRepository.delete_table), а не по одной через ORM
     created_by: Mapped["User"] = relationship("User", back_populates="created_tables")
     permissions: Mapped[List["TablePermission"]] = relationship(
         "TablePermission",
         back_populates="table",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     rows: Mapped[List["TableRow"]] = relationship(
         "TableRow",
         back_populates="table",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
 
@@ -50,3 +66,9 @@ class TablePermission(Base):
 
     user: Mapped["User"] = relationship("User", back_populates="table_permissions")
     table: Mapped["DataTable"] = relationship("DataTable", back_populates="permissions")
+
+    __table_args__ = (
+        # Не больше одной записи прав на пару (пользователь, таблица): проверка прав - поиск по индексу.
+        # Владелец таблицы тоже получает запись с полными правами (см. TableRepository.create_table)
+        Index("ix_table_permissions_user_table", "user_id", "table_id", unique=True),
+    )
@@ -1,10 +1,20 @@
 from .table import TableRepository
 from .user import UserRepository
 from .data import DataRepository
+from .history import HistoryRepository
+from .partition import PartitionRepository
+from .job import JobRepository
+from .quality import QualityRepository
+from .snapshot import SnapshotRepository
 
 
 __all__ = [
     "TableRepository",
     "UserRepository",
     "DataRepository",
+    "HistoryRepository",
+    "PartitionRepository",
+    "JobRepository",
+    "QualityRepository",
+    "SnapshotRepository",
 ]
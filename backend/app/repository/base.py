@@ -0,0 +1,37 @@
+from contextlib import asynccontextmanager
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.database import get_session_factory
+from backend.app.core.replicas import read_session_factory
+
+
+class BaseRepository:
+
+    def __init__(self):
+        self.session_factory = get_session_factory()
+
+    @asynccontextmanager
+    async def _session_scope(self) -> AsyncSession:
+        """Context manager for handling database sessions.
+
+        Provides automatic transaction management with commit/rollback
+        and proper session cleanup.
+        """
+        async with self.session_factory() as session:
+            try:
+                session.expire_on_commit = False
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    @asynccontextmanager
+    async def _read_session_scope(self) -> AsyncSession:
+        """Context manager for read-only sessions.
+
+        Inside read-only requests the session is bound to a read replica
+        (see ``core.replicas``), otherwise to the primary. Nothing is committed.
+        """
+        async with read_session_factory(self.session_factory)() as session:
+            yield session
@@ -1,32 +1,242 @@
-from contextlib import asynccontextmanager
-from sqlalchemy import select, update, delete, insert
-from typing import Any, Optional, List
+import hashlib
+from dataclasses import dataclass
+from sqlalchemy import (
+    Select, select, delete, insert, update, func, cast, case, text, column, literal, bindparam, and_, or_,
+    BigInteger, Numeric, Boolean, Date, Integer, JSON,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import AsyncSessionFactory
+from sqlalchemy.sql.elements import ColumnElement
+from typing import Any, Dict, Iterable, Optional, List, Sequence, Set, Tuple
 
-from backend.app.models import TableRow, DataTable
+from backend.app.models import DataTable, RowChange, TableRow
+from backend.app.utils.cache import LRUCache
+from backend.app.utils.ordering import DIGITS, INITIAL_KEY, key_between, key_spacing, keys_between
+from .base import BaseRepository
+from .partition import row_partition
+from .history import (
+    Delta,
+    append_changes,
+    bump_table_version,
+    changed_columns,
+    check_positions,
+    diff_cells,
+    last_position,
+    lock_row_order,
+    log_changes,
+    replace_cells,
+)
 
+# Запросы страницы строк по порядку сортировки (колонка, направление, тип),
+# собранные с параметрами :table_id, :skip и :limit
+_page_statements = LRUCache(maxsize=256)
 
-class DataRepository:
+# Типы колонок и типы SQL, к которым приводятся их значения
+_SQL_TYPES = {
+    "integer": (BigInteger, "bigint"),
+    "number": (Numeric, "numeric"),
+    "boolean": (Boolean, "boolean"),
+    "date": (Date, "date"),
+}
 
-    def __init__(self):
-        self.session_factory = AsyncSessionFactory
+_AGGREGATE_FUNCTIONS = {
+    "sum": func.sum,
+    "avg": func.avg,
+    "min": func.min,
+    "max": func.max,
+    "count": func.count,
+}
 
-    @asynccontextmanager
-    async def _session_scope(self) -> AsyncSession:
-        """Context manager for handling database sessions.
 
-        Provides automatic transaction management with commit/rollback
-        and proper session cleanup.
-        """
-        async with self.session_factory() as session:
-            try:
-                session.expire_on_commit = False
-                yield session
-                await session.commit()
-            except Exception:
-                await session.rollback()
-                raise
+def typed_value(column: str, column_type: str = "string", rows=TableRow) -> ColumnElement:
+    """Build an expression extracting ``row_data[column]`` cast to the column type.
+
+    Empty strings and values that are not valid input for the SQL type are
+    treated as NULL, so that casts never fail: the sort type comes from the
+    request and stored cells need not match it.
+    ``rows`` is ``TableRow`` or an alias of it, e.g. the rows of a snapshot.
+    """
+    value = func.nullif(rows.row_data[column].as_string(), "")
+    if column_type not in _SQL_TYPES:
+        return value
+    sql_type, type_name = _SQL_TYPES[column_type]
+    return case((func.pg_input_is_valid(value, type_name), cast(value, sql_type)))
+
+
+@dataclass
+class RowOrder:
+    """Sort order of table rows as a list of keyset columns.
+
+    The last column is always the row id, so every row has a unique sort key
+    and pages can continue from a known key instead of using OFFSET.
+    """
+
+    columns: List[ColumnElement]
+    descending: List[bool]
+
+    @classmethod
+    def create(
+            cls,
+            sort_by: Optional[str] = None,
+            sort_order: Optional[str] = "asc",
+            sort_type: str = "string",
+            rows=TableRow,
+    ) -> "RowOrder":
+        """Order by a ``row_data`` column (empty cells last) or by the manual row order."""
+        descending = bool(sort_order) and sort_order.lower() == "desc"
+        if not sort_by:
+            return cls([rows.position, rows.id], [descending, descending])
+        value = typed_value(sort_by, sort_type, rows)
+        return cls([value.is_(None), value, rows.id], [False, descending, descending])
+
+    @property
+    def clauses(self) -> List[ColumnElement]:
+        return [
+            expression.desc() if descending else expression.asc()
+            for expression, descending in zip(self.columns, self.descending)
+        ]
+
+    def _compare(self, key: Sequence[Any], after: bool) -> ColumnElement:
+        conditions = []
+        for index, (expression, descending) in enumerate(zip(self.columns, self.descending)):
+            equal = [self.columns[prefix].is_not_distinct_from(key[prefix]) for prefix in range(index)]
+            value = literal(key[index], expression.type)
+            following = expression > value if after != descending else expression < value
+            conditions.append(and_(*equal, following))
+        return or_(*conditions)
+
+    def after(self, key: Sequence[Any]) -> ColumnElement:
+        """Condition selecting rows that come after the sort key."""
+        return self._compare(key, after=True)
+
+    def before(self, key: Sequence[Any]) -> ColumnElement:
+        """Condition selecting rows that come before the sort key."""
+        return self._compare(key, after=False)
+
+
+def page_statement(sort_by: Optional[str], sort_order: Optional[str], sort_type: str) -> Select:
+    """Select a page of rows of ``:table_id`` (``:skip``, ``:limit``) in the given order.
+
+    Pages are the most frequent read, so the statement is built once per sort
+    order and reused: SQLAlchemy neither rebuilds it nor recomputes its cache key.
+    """
+    cache_key = (sort_by, sort_order, sort_type)
+    stmt = _page_statements.get(cache_key)
+    if stmt is None:
+        order = RowOrder.create(sort_by, sort_order, sort_type)
+        stmt = (
+            select(TableRow)
+            .where(TableRow.table_id == bindparam("table_id"))
+            .order_by(*order.clauses)
+            .offset(bindparam("skip"))
+            .limit(bindparam("limit"))
+        )
+        _page_statements.set(cache_key, stmt)
+    return stmt
+
+
+async def copy_rows(session: AsyncSession, table_id: int, batches: Iterable[List[str]]) -> int:
+    """Bulk load rows with COPY inside the session's transaction.
+
+    Rows are appended after the current last row of the table.
+
+    Args:
+        session: Session whose transaction the rows are loaded in
+        table_id: ID of the table
+        batches: Batches of ``row_data`` values already serialized to JSON
+
+    Returns:
+        int: Number of loaded rows
+    """
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    position = await last_position(session, table_id)
+    total = 0
+    for batch in batches:
+        positions = keys_between(position, None, len(batch))
+        await driver_connection.copy_records_to_table(
+            TableRow.__tablename__,
+            records=[(table_id, row_data, key) for row_data, key in zip(batch, positions)],
+            columns=["table_id", "row_data", "position"],
+        )
+        position = positions[-1] if positions else position
+        total += len(batch)
+    return total
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def natural_key_expressions(key_columns: Sequence[str], source: str = "row_data") -> str:
+    """SQL expressions of the natural key cells, as used by the unique index."""
+    return ", ".join(f"({source} ->> {_sql_literal(name)})" for name in key_columns)
+
+
+def natural_key_index_name(table_id: int, key_columns: Sequence[str]) -> str:
+    """Name of the unique index backing a table's natural key.
+
+    The name depends on the key columns, so a new index can be built before
+    the old one is dropped when the key changes.
+    """
+    digest = hashlib.sha1("\x00".join(key_columns).encode()).hexdigest()[:8]
+    return f"ix_table_rows_key_{table_id}_{digest}"
+
+
+async def _neighbour_positions(
+        session: AsyncSession,
+        table_id: int,
+        after_row_id: Optional[int] = None,
+        before_row_id: Optional[int] = None,
+        exclude: Sequence[int] = (),
+) -> Tuple[Optional[str], Optional[str]]:
+    """Positions that new positions must lie between to place rows right after
+    ``after_row_id``, right before ``before_row_id`` or at the end of the table.
+
+    Rows in ``exclude`` (the rows being moved) are not treated as neighbours.
+
+    Raises:
+        ValueError: The anchor row does not exist in the table
+    """
+    others = [TableRow.table_id == table_id]
+    if exclude:
+        others.append(TableRow.id.not_in(exclude))
+
+    anchor_id = after_row_id if after_row_id is not None else before_row_id
+    if anchor_id is None:
+        lower = await session.scalar(
+            select(TableRow.position).where(*others).order_by(TableRow.position.desc()).limit(1)
+        )
+        return lower, None
+
+    anchor = await session.scalar(
+        select(TableRow.position).where(TableRow.table_id == table_id, TableRow.id == anchor_id)
+    )
+    if anchor is None:
+        raise ValueError(f"Row {anchor_id} not found")
+    if after_row_id is not None:
+        upper = await session.scalar(
+            select(TableRow.position)
+            .where(*others, TableRow.position > anchor)
+            .order_by(TableRow.position)
+            .limit(1)
+        )
+        return anchor, upper
+    lower = await session.scalar(
+        select(TableRow.position)
+        .where(*others, TableRow.position < anchor)
+        .order_by(TableRow.position.desc())
+        .limit(1)
+    )
+    return lower, anchor
+
+
+def row_delta(row_id: int, before: Dict[str, Any], after: Dict[str, Any]) -> Delta:
+    """Delta of a replaced row: cells that differ, including removed ones."""
+    return (row_id, *replace_cells(before, after))
+
+
+class DataRepository(BaseRepository):
 
     async def get_rows_by_table_id(
             self,
@@ -35,115 +245,485 @@ class DataRepository:
             limit: int = 100,
             sort_by: Optional[str] = None,
             sort_order: Optional[str] = "asc",
+            sort_type: str = "string",
     ) -> List[TableRow]:
+        """Retrieve a page of table rows.
+
+        Args:
+            table_id: ID of the table
+            skip: Number of rows to skip
+            limit: Maximum number of rows to return
+            sort_by: Column of ``row_data`` to sort by, rows keep their manual order if omitted
+            sort_order: "asc" or "desc"
+            sort_type: Type of the sort column from ``columns_schema``
+
+        Returns:
+            list[TableRow]: Rows of the requested page
+        """
+        stmt = page_statement(sort_by, sort_order, sort_type)
+        async with self._read_session_scope() as session:
+            result = await session.scalars(stmt, {"table_id": table_id, "skip": skip, "limit": limit})
+            return list(result.all())
+
+    async def get_rows_after(
+            self,
+            table_id: int,
+            order: RowOrder,
+            key: Optional[Sequence[Any]] = None,
+            skip: int = 0,
+            limit: int = 100,
+    ) -> List[TableRow]:
+        """Retrieve rows following a sort key (from the start if ``key`` is None)."""
+        async with self._read_session_scope() as session:
+            stmt = select(TableRow).where(TableRow.table_id == table_id)
+            if key is not None:
+                stmt = stmt.where(order.after(key))
+            stmt = stmt.order_by(*order.clauses).offset(skip).limit(limit)
+            return list((await session.scalars(stmt)).all())
+
+    async def get_sort_checkpoints(self, table_id: int, order: RowOrder, interval: int) -> List[Tuple[Any, ...]]:
+        """Return sort keys of every ``interval``-th row in the given order.
+
+        The key of checkpoint ``j`` belongs to the row at 0-based index
+        ``(j + 1) * interval - 1``; the last key element is the row id.
+        """
+        async with self._read_session_scope() as session:
+            numbered = (
+                select(
+                    *(expression.label(f"k{index}") for index, expression in enumerate(order.columns)),
+                    func.row_number().over(order_by=order.clauses).label("rn"),
+                )
+                .where(TableRow.table_id == table_id)
+                .subquery()
+            )
+            stmt = (
+                select(*(numbered.c[f"k{index}"] for index in range(len(order.columns))))
+                .where(numbered.c.rn % interval == 0)
+                .order_by(numbered.c.rn)
+            )
+            return [tuple(row) for row in (await session.execute(stmt)).all()]
+
+    async def count_rows(self, table_id: int) -> int:
+        async with self._read_session_scope() as session:
+            return await session.scalar(select(func.count()).where(TableRow.table_id == table_id))
+
+    async def count_rows_by_table(self, table_ids: Sequence[int]) -> Dict[int, int]:
+        """Count rows of several tables with one grouped query; empty tables are omitted."""
+        if not table_ids:
+            return {}
+        async with self._read_session_scope() as session:
+            stmt = (
+                select(TableRow.table_id, func.count())
+                .where(TableRow.table_id.in_(table_ids))
+                .group_by(TableRow.table_id)
+            )
+            return {table_id: count for table_id, count in (await session.execute(stmt)).all()}
+
+    async def get_sort_key(self, table_id: int, row_id: int, order: RowOrder) -> Optional[Tuple[Any, ...]]:
+        """Return the sort key of a row, None if the row does not exist."""
+        async with self._read_session_scope() as session:
+            stmt = select(*order.columns).where(TableRow.table_id == table_id, TableRow.id == row_id)
+            row = (await session.execute(stmt)).one_or_none()
+            return tuple(row) if row is not None else None
+
+    async def count_rows_before(
+            self,
+            table_id: int,
+            order: RowOrder,
+            key: Sequence[Any],
+            after: Optional[Sequence[Any]] = None,
+            row_ids: Optional[Sequence[int]] = None,
+    ) -> int:
+        """Count rows that come before ``key`` (and after ``after`` if given).
+
+        Args:
+            table_id: ID of the table
+            order: Sort order
+            key: Sort key the rows must precede
+            after: Sort key the rows must follow
+            row_ids: Count only among these rows
+        """
+        async with self._read_session_scope() as session:
+            stmt = select(func.count()).where(TableRow.table_id == table_id, order.before(key))
+            if after is not None:
+                stmt = stmt.where(order.after(after))
+            if row_ids is not None:
+                stmt = stmt.where(TableRow.id.in_(row_ids))
+            return await session.scalar(stmt)
+
+    async def get_row(self, table_id: int, row_id: int) -> Optional[TableRow]:
+        """Retrieve a single row of the table."""
+        async with self._read_session_scope() as session:
+            stmt = select(TableRow).where(TableRow.id == row_id, TableRow.table_id == table_id)
+            return (await session.scalars(stmt)).one_or_none()
 
+    async def lookup_rows(self, table_id: int, key_column: str, values: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Find rows of a table by values of its natural key column in one query.
+
+        The condition repeats the expression and the predicate of the natural
+        key index (see ``TableRepository.set_natural_key``) with the table ID
+        inlined, so every value is looked up in that index.
+
+        Args:
+            table_id: ID of the table
+            key_column: The single column of the table's natural key
+            values: Key values as text
+
+        Returns:
+            dict: ``row_data`` of the found rows by key value
+        """
+        if not values:
+            return {}
+        key = natural_key_expressions([key_column])
+        stmt = text(
+            f"SELECT {key} AS key, row_data FROM {TableRow.__tablename__} "
+            f"WHERE table_id = {int(table_id)} AND {key} = ANY(:values)"
+        ).columns(column("key"), column("row_data", JSON))
+        async with self._read_session_scope() as session:
+            result = await session.execute(stmt, {"values": list(values)})
+            return {key_value: row_data for key_value, row_data in result.all()}
+
+    async def create_row(
+            self,
+            table_id: int,
+            row_data: Dict[str, Any],
+            user_id: Optional[int] = None,
+            after_row_id: Optional[int] = None,
+            before_row_id: Optional[int] = None,
+    ) -> TableRow:
+        """Insert a new row, record it in the change log and bump the table version.
+
+        The row is placed right after ``after_row_id``, right before
+        ``before_row_id`` or, by default, at the end of the table. Only the new
+        row gets a position, other rows are not renumbered.
+
+        Raises:
+            ValueError: The anchor row does not exist in the table
+        """
+        async with self._session_scope() as session:
+            await lock_row_order(session, table_id)
+            position = key_between(*await _neighbour_positions(session, table_id, after_row_id, before_row_id))
+            stmt = insert(TableRow).values(table_id=table_id, row_data=row_data, position=position).returning(TableRow)
+            row = (await session.scalars(stmt)).one()
+            await log_changes(session, table_id, user_id, "insert", [(row.id, None, row_data)])
+            await check_positions(session, table_id, [position])
+            await bump_table_version(session, table_id)
+            return row
+
+    async def move_rows(
+            self,
+            table_id: int,
+            row_ids: Sequence[int],
+            after_row_id: Optional[int] = None,
+            before_row_id: Optional[int] = None,
+    ) -> List[TableRow]:
+        """Move rows so that they follow each other right after ``after_row_id``,
+        right before ``before_row_id`` or at the end of the table.
+
+        Moved rows keep their relative order. Only their positions change, the
+        rest of the table is not renumbered.
+
+        Returns:
+            list[TableRow]: Moved rows in their new order
+
+        Raises:
+            ValueError: A moved or anchor row does not exist in the table
+        """
+        async with self._session_scope() as session:
+            await lock_row_order(session, table_id)
+            stmt = (
+                select(TableRow)
+                .where(TableRow.table_id == table_id, TableRow.id.in_(row_ids))
+                .order_by(TableRow.position, TableRow.id)
+                .with_for_update()
+            )
+            rows = list((await session.scalars(stmt)).all())
+            missing = set(row_ids) - {row.id for row in rows}
+            if missing:
+                raise ValueError(f"Row {min(missing)} not found")
+
+            lower, upper = await _neighbour_positions(session, table_id, after_row_id, before_row_id, row_ids)
+            positions = keys_between(lower, upper, len(rows))
+            for row, position in zip(rows, positions):
+                row.position = position
+            await check_positions(session, table_id, positions)
+            await bump_table_version(session, table_id)
+            await session.flush()
+            for row in rows:
+                await session.refresh(row, ["updated_at"])
+            return rows
+
+    async def get_tables_to_rebalance(self) -> List[int]:
+        """Return IDs of tables marked for rebalancing of the manual row order."""
+        async with self._session_scope() as session:
+            stmt = select(DataTable.id).where(DataTable.needs_rebalance.is_(True)).order_by(DataTable.id)
+            return list((await session.scalars(stmt)).all())
+
+    async def rebalance_positions(self, table_id: int) -> int:
+        """Rewrite the row positions of a table as evenly spaced keys of equal length.
+
+        The row order does not change. Positions recorded in the change log for
+        deleted rows are translated to the new key space, so that undo still
+        puts the rows back in place. The whole table is rewritten in one
+        transaction, which is why it is done in the background and only for
+        tables whose keys have grown too long.
+
+        Returns:
+            int: Number of rewritten rows, 0 if the table no longer needs rebalancing
+        """
+        async with self._session_scope() as session:
+            await lock_row_order(session, table_id)
+            if not await session.scalar(select(DataTable.needs_rebalance).where(DataTable.id == table_id)):
+                return 0
+
+            count = await session.scalar(select(func.count()).where(TableRow.table_id == table_id))
+            head, digits, step = key_spacing(count)
+            params = {"table_id": table_id, "head": head, "digits": digits, "step": step, "alphabet": DIGITS}
+            # Ключ строки с номером rn: первый символ и rn * step, записанное digits цифрами base62
+            await session.execute(text(f"""
+                CREATE TEMPORARY TABLE rebalanced ON COMMIT DROP AS
+                SELECT n.id, n.position AS old_position, :head || (
+                    SELECT string_agg(
+                        substr(:alphabet, (div(n.rn * :step, power(62::numeric, :digits - 1 - i)) % 62)::int + 1, 1),
+                        '' ORDER BY i
+                    )
+                    FROM generate_series(0, :digits - 1) AS i
+                ) AS position
+                FROM (
+                    SELECT id, position, row_number() OVER (ORDER BY position, id) AS rn
+                    FROM {TableRow.__tablename__}
+                    WHERE table_id = :table_id
+                ) AS n
+            """), params)
+            await session.execute(text("CREATE INDEX ON rebalanced (old_position, id)"))
+            # Удалённая строка встаёт сразу за строкой, которая ей предшествовала:
+            # новые ключи одной длины, поэтому ключ с добавленной цифрой лежит между соседними
+            await session.execute(text(f"""
+                UPDATE {RowChange.__tablename__} AS c
+                SET position = coalesce((
+                    SELECT r.position || 'V'
+                    FROM rebalanced r
+                    WHERE r.old_position <= c.position
+                    ORDER BY r.old_position DESC, r.id DESC
+                    LIMIT 1
+                ), :initial)
+                WHERE c.table_id = :table_id AND c.position IS NOT NULL
+            """), {"table_id": table_id, "initial": INITIAL_KEY})
+            await session.execute(text(f"""
+                UPDATE {TableRow.__tablename__} AS t
+                SET position = r.position
+                FROM rebalanced r
+                WHERE t.id = r.id AND t.position <> r.position
+            """))
+            await session.execute(
+                update(DataTable)
+                .where(DataTable.id == table_id)
+                .values(
+                    needs_rebalance=False,
+                    version=DataTable.version + 1,
+                    order_version=DataTable.order_version + 1,
+                )
+            )
+            return count
+
+    async def update_row(
+            self,
+            table_id: int,
+            row_id: int,
+            row_data: Dict[str, Any],
+            user_id: Optional[int] = None,
+    ) -> Optional[TableRow]:
+        """Merge ``row_data`` into an existing row.
+
+        Only the cells that actually changed are recorded in the change log.
+
+        Returns:
+            Optional[TableRow]: Updated row, None if the row does not exist
+        """
         async with self._session_scope() as session:
-            if sort_order.lower() == "desc":
-                stmt = select(TableRow).where(TableRow.table_id == table_id).limit(limit).offset(skip).order_by(sort_by)
+            stmt = (
+                select(TableRow)
+                .where(TableRow.id == row_id, TableRow.table_id == table_id)
+                .with_for_update()
+            )
+            row = (await session.scalars(stmt)).one_or_none()
+            if row is None:
+                return None
+
+            before, after = diff_cells(row.row_data, row_data)
+            if not after:
+                return row
+
+            row.row_data = {**row.row_data, **row_data}
+            await log_changes(session, table_id, user_id, "update", [(row_id, before, after)])
+            await bump_table_version(session, table_id, after)
+            await session.flush()
+            await session.refresh(row, ["updated_at"])
+            return row
+
+    async def delete_row(self, table_id: int, row_id: int, user_id: Optional[int] = None) -> bool:
+        """Delete a row, keeping its data in the change log for undo.
+
+        Returns:
+            bool: True if the row was deleted
+        """
+        async with self._session_scope() as session:
+            stmt = (
+                delete(TableRow)
+                .where(TableRow.id == row_id, TableRow.table_id == table_id)
+                .returning(TableRow.row_data, TableRow.position)
+            )
+            row = (await session.execute(stmt)).one_or_none()
+            if row is None:
+                return False
+            await log_changes(
+                session, table_id, user_id, "delete", [(row_id, row.row_data, None)], {row_id: row.position}
+            )
+            await bump_table_version(session, table_id)
+            return True
+
+    async def upsert_rows(
+            self,
+            table_id: int,
+            key_columns: Sequence[str],
+            columns: Sequence[str],
+            batches: Iterable[List[str]],
+            user_id: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Merge rows into a table by its natural key in one transaction.
+
+        Every batch is written with a single ``INSERT ... ON CONFLICT DO UPDATE``
+        against the table's natural key index. Cells of ``columns`` are replaced
+        (empty cells are removed), other cells of existing rows are kept. Rows
+        whose data would not change are not written at all, so re-importing a
+        mostly unchanged file only touches the rows that differ. Within a batch
+        the last row with a given key wins.
+
+        Args:
+            table_id: ID of the table
+            key_columns: Natural key columns, must be backed by an index
+                (see ``TableRepository.set_natural_key``)
+            columns: Columns present in the imported file
+            batches: Batches of ``row_data`` values serialized to JSON, every
+                row must contain all key columns
+            user_id: ID of the user for the change log
+
+        Returns:
+            dict: Numbers of inserted, updated, unchanged and duplicate rows
+        """
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0}
+        async with self._session_scope() as session:
+            await lock_row_order(session, table_id)
+            # Индекс естественного ключа есть только у партиции таблицы, вставка идёт прямо в неё
+            partition = await row_partition(session, table_id)
+            keys = natural_key_expressions(key_columns, "r.value::jsonb")
+            stmt = text(f"""
+                WITH incoming AS (
+                    SELECT DISTINCT ON ({keys}) r.value::jsonb AS row_data, r.n
+                    FROM unnest(CAST(:rows AS text[])) WITH ORDINALITY AS r(value, n)
+                    ORDER BY {keys}, r.n DESC
+                ),
+                existing AS (
+                    SELECT t.id, t.row_data
+                    FROM {TableRow.__tablename__} t
+                    JOIN incoming i
+                      ON ({natural_key_expressions(key_columns, "t.row_data")})
+                       = ({natural_key_expressions(key_columns, "i.row_data")})
+                    WHERE t.table_id = :table_id
+                ),
+                upserted AS (
+                    INSERT INTO {partition} AS t (table_id, row_data, position)
+                    SELECT :table_id, row_data::json, (CAST(:positions AS text[]))[n] FROM incoming
+                    ON CONFLICT ({natural_key_expressions(key_columns)}) WHERE table_id = {int(table_id)}
+                    DO UPDATE SET
+                        row_data = ((t.row_data::jsonb - CAST(:columns AS text[])) || EXCLUDED.row_data::jsonb)::json,
+                        updated_at = now()
+                    WHERE ((t.row_data::jsonb - CAST(:columns AS text[])) || EXCLUDED.row_data::jsonb)
+                          IS DISTINCT FROM t.row_data::jsonb
+                    RETURNING t.id, t.row_data, xmax = 0 AS inserted
+                )
+                SELECT
+                    (SELECT count(*) FROM incoming) AS distinct_rows,
+                    (
+                        SELECT coalesce(json_agg(json_build_array(u.id, e.row_data, u.row_data)), '[]'::json)
+                        FROM upserted u
+                        LEFT JOIN existing e ON e.id = u.id
+                    ) AS changes
+            """).columns(column("distinct_rows", Integer), column("changes", JSON))
+
+            batch_id = None
+            columns: Optional[Set[str]] = set()
+            position = await last_position(session, table_id)
+            for batch in batches:
+                # Новые строки добавляются в конец таблицы в порядке файла;
+                # ключи строк, оказавшихся обновлениями, просто не используются
+                positions = keys_between(position, None, len(batch))
+                result = (await session.execute(
+                    stmt,
+                    {"rows": batch, "table_id": table_id, "columns": list(columns), "positions": positions},
+                )).one()
+                position = positions[-1] if positions else position
+                deltas = []
+                for row_id, before, after in result.changes:
+                    if before is None:
+                        counts["inserted"] += 1
+                        deltas.append((row_id, None, after))
+                    else:
+                        counts["updated"] += 1
+                        deltas.append(row_delta(row_id, before, after))
+                counts["duplicates"] += len(batch) - result.distinct_rows
+                counts["unchanged"] += result.distinct_rows - len(deltas)
+                batch_columns = changed_columns(deltas)
+                columns = None if columns is None or batch_columns is None else columns | batch_columns
+                if batch_id is None:
+                    batch_id = await log_changes(session, table_id, user_id, "import", deltas)
+                else:
+                    await append_changes(session, batch_id, table_id, deltas)
+            if batch_id is not None:
+                await bump_table_version(session, table_id, columns)
+        return counts
+
+    async def aggregate_rows(
+            self,
+            table_id: int,
+            group_by: Sequence[Tuple[str, str]],
+            aggregates: Sequence[Tuple[str, Optional[str], Optional[str]]],
+            limit: Optional[int] = None,
+    ) -> List[Tuple[Any, ...]]:
+        """Group rows of a table and compute aggregates in a single GROUP BY.
+
+        Args:
+            table_id: ID of the table
+            group_by: Pairs of (column, column type) to group by
+            aggregates: Triples of (function, column, column type); column is
+                None for ``count(*)``
+            limit: Maximum number of groups to return
+
+        Returns:
+            list[tuple]: Group values followed by aggregate values for every group
+        """
+        group_columns = [
+            typed_value(column, column_type).label(f"g{index}")
+            for index, (column, column_type) in enumerate(group_by)
+        ]
+        aggregate_columns = []
+        for index, (function, column, column_type) in enumerate(aggregates):
+            aggregate = _AGGREGATE_FUNCTIONS[function]
+            if column is None:
+                expression = aggregate()
             else:
-                stmt = select(TableRow).where(TableRow.table_id == table_id).limit(limit).offset(skip).order_by(sort_by)
-
-
-
-    # async def _get_task(self, *filters: Any) -> Optional[Task]:
-    #     """Generic method to retrieve a single task matching given filters.
-    #
-    #     Args:
-    #         *filters: SQLAlchemy filter conditions
-    #
-    #     Returns:
-    #         Optional[Task]: Task object if found, None otherwise
-    #     """
-    #     async with self._session_scope() as session:
-    #         stmt = select(Task).where(*filters)
-    #         return (await session.scalars(stmt)).one_or_none()
-    #
-    #
-    # async def get_user_task(self, task_id: UUID, user_id: UUID) -> Optional[Task]:
-    #     """Retrieve a specific task belonging to a particular user.
-    #
-    #     Args:
-    #         task_id: UUID of the task to find
-    #         user_id: ID of the user
-    #
-    #     Returns:
-    #         Optional[Task]: Task object if found and belongs to user, None otherwise
-    #     """
-    #     return await self._get_task(Task.task_id == task_id, Task.user_id == user_id)
-    #
-    # async def get_user_tasks(self, user_id: UUID) -> list[Task]:
-    #     """Retrieve all users tasks from the database.
-    #
-    #     Args:
-    #         user_id: ID of the user
-    #
-    #     Returns:
-    #         list[Task]: List of all tasks
-    #     """
-    #     async with self._session_scope() as session:
-    #         stmt = select(Task).where(Task.user_id == user_id)
-    #         return (await session.scalars(stmt)).all()
-    #
-    # async def get_tasks_by_category(self, category_name: str) -> list[Task]:
-    #     """Retrieve all tasks belonging to a specific category.
-    #
-    #     Args:
-    #         category_name: Name of the category to filter by
-    #
-    #     Returns:
-    #         list[Task]: List of tasks in the specified category
-    #     """
-    #     async with self._session_scope() as session:
-    #         stmt = (
-    #             select(Task)
-    #             .join(Category, Task.category_id == Category.category_id)
-    #             .where(Category.name == category_name)
-    #         )
-    #         return (await session.scalars(stmt)).all()
-    #
-    # async def create_task(self, task: TaskCreate, user_id: UUID) -> UUID:
-    #     """Retrieve all tasks from the database.
-    #
-    #     Returns:
-    #         list[Task]: List of all tasks
-    #     """
-    #     async with self._session_scope() as session:
-    #         task_model = Task(
-    #             name=task.name,
-    #             pomodoro_count=task.pomodoro_count,
-    #             category_id=task.category_id,
-    #             user_id=user_id,
-    #         )
-    #
-    #         session.add(task_model)
-    #         await session.flush()
-    #         return task_model.task_id
-    #
-    # async def delete_task(self, task_id: UUID, user_id: UUID) -> None:
-    #     """Retrieve all tasks from the database.
-    #
-    #     Returns:
-    #         list[Task]: List of all tasks
-    #     """
-    #     async with self._session_scope() as session:
-    #         stmt = delete(Task).where(Task.task_id == task_id, Task.user_id == user_id)
-    #         await session.execute(stmt)
-    #
-    # async def update_task(self, task_update: TaskUpdate) -> Task:
-    #     """Retrieve all tasks from the database.
-    #
-    #     Returns:
-    #         list[Task]: List of all tasks
-    #     """
-    #     async with self._session_scope() as session:
-    #         stmt = (
-    #             update(Task)
-    #             .where(Task.task_id == task_update.task_id)
-    #             .values(
-    #                 name=task_update.name,
-    #                 category_id=task_update.category_id,
-    #                 pomodoro_count=task_update.pomodoro_count,
-    #             )
-    #             .returning(Task)
-    #         )
-    #         return (await session.scalars(stmt)).one_or_none()
+                expression = aggregate(typed_value(column, column_type))
+            aggregate_columns.append(expression.label(f"a{index}"))
+
+        stmt = (
+            select(*group_columns, *aggregate_columns)
+            .where(TableRow.table_id == table_id)
+            .group_by(*group_columns)
+            .order_by(*[column.asc().nulls_last() for column in group_columns])
+        )
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        async with self._read_session_scope() as session:
+            result = await session.execute(stmt)
+            return [tuple(row) for row in result.all()]
@@ -0,0 +1,590 @@
+import bisect
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select, update, delete, insert, func, text, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.models import ChangeBatch, RowChange, TableRow, DataTable, TableSnapshot
+from backend.app.utils.ordering import key_between
+from .base import BaseRepository
+
+# (row_id, значения до, значения после); None вместо словаря - строки не существует.
+# Ячейки, которой не было до изменения, нет в "до"; удалённой ячейки нет в "после"
+Delta = Tuple[int, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+# Значение отсутствующей ячейки при сравнении версий строки
+_MISSING = object()
+
+UNDOABLE_OPERATIONS = ("insert", "update", "delete", "import", "cleanup", "redo")
+
+# Ключи ручного порядка длиннее этого помечают таблицу для перебалансировки
+MAX_POSITION_LENGTH = 24
+
+# Ключ advisory-блокировки, чтобы сжатие истории выполнял только один воркер
+_COMPACTION_LOCK_ID = 0x6869_7374
+
+# Ключ ``session.info`` со списком пачек, записанных в транзакции, но ещё не
+# получивших время под блокировкой таблицы (см. ``bump_table_version``)
+_PENDING_BATCHES = "pending_change_batches"
+
+
+def diff_cells(old: Dict[str, Any], new: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Return only the cells that ``new`` changes in ``old``.
+
+    A cell missing from ``old`` is left out of the first dict, so that undo
+    removes it instead of setting it to null.
+    """
+    changed = [key for key in new if old.get(key, _MISSING) != new[key]]
+    return {key: old[key] for key in changed if key in old}, {key: new[key] for key in changed}
+
+
+def replace_cells(old: Dict[str, Any], new: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Return the cells that differ between two versions of a row, including removed ones.
+
+    Cells missing from a version are left out of its dict (see ``Delta``).
+    """
+    changed = [key for key in {*old, *new} if old.get(key, _MISSING) != new.get(key, _MISSING)]
+    return (
+        {key: old[key] for key in changed if key in old},
+        {key: new[key] for key in changed if key in new},
+    )
+
+
+def apply_cells(row_data: Dict[str, Any], before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply the change of cells from ``before`` to ``after`` to a row.
+
+    Cells present only in ``before`` did not exist after the change and are removed.
+    """
+    row_data = {key: value for key, value in row_data.items() if key in after or key not in before}
+    row_data.update(after)
+    return row_data
+
+
+def changed_columns(deltas: Iterable[Delta]) -> Optional[Set[str]]:
+    """Columns changed by deltas, None if any of them adds or removes a row."""
+    columns: Set[str] = set()
+    for _, before, after in deltas:
+        if before is None or after is None:
+            return None
+        columns.update(before, after)
+    return columns
+
+
+async def bump_table_version(
+        session: AsyncSession,
+        table_id: int,
+        columns: Optional[Iterable[str]] = None,
+) -> None:
+    """Increment the table version so version-keyed caches are invalidated.
+
+    ``columns`` are the columns changed by an operation that only changed
+    cells of existing rows (see ``changed_columns``): their versions in
+    ``column_versions`` move to the new table version and the row order
+    version is kept, so caches of orders by other columns stay valid.
+    Without ``columns`` the row order version is incremented as well.
+
+    The update locks the table row until commit. Batches logged earlier in
+    the transaction are stamped with the current time under that lock: the
+    default ``now()`` is the start of the transaction, which may precede a
+    snapshot created while the transaction waited for the lock.
+    """
+    values = {"version": DataTable.version + 1}
+    if columns is None:
+        values["order_version"] = DataTable.order_version + 1
+    elif columns:
+        pairs = [item for name in sorted(columns) for item in (name, DataTable.version + 1)]
+        values["column_versions"] = DataTable.column_versions.op("||")(func.jsonb_build_object(*pairs))
+    await session.execute(update(DataTable).where(DataTable.id == table_id).values(**values))
+    batch_ids = session.info.pop(_PENDING_BATCHES, None)
+    if batch_ids:
+        await session.execute(
+            update(ChangeBatch)
+            .where(ChangeBatch.id.in_(batch_ids))
+            .values(created_at=func.clock_timestamp())
+        )
+
+
+async def last_position(session: AsyncSession, table_id: int) -> Optional[str]:
+    """Return the largest row position of a table, None for an empty table."""
+    return await session.scalar(
+        select(TableRow.position)
+        .where(TableRow.table_id == table_id)
+        .order_by(TableRow.position.desc())
+        .limit(1)
+    )
+
+
+async def lock_row_order(session: AsyncSession, table_id: int) -> None:
+    """Lock the table row until commit, serializing changes of the manual row order.
+
+    Taken before new positions are computed, so that they are derived from
+    the current positions and never interleave with a rebalancing.
+    """
+    await session.execute(
+        select(DataTable.id).where(DataTable.id == table_id).with_for_update(key_share=True)
+    )
+
+
+async def check_positions(session: AsyncSession, table_id: int, positions: Sequence[str]) -> None:
+    """Mark the table for rebalancing if any of the new positions is too long."""
+    if any(len(position) > MAX_POSITION_LENGTH for position in positions):
+        await session.execute(
+            update(DataTable)
+            .where(DataTable.id == table_id, DataTable.needs_rebalance.is_(False))
+            .values(needs_rebalance=True)
+        )
+
+
+async def _insert_batch(
+        session: AsyncSession,
+        table_id: int,
+        user_id: Optional[int],
+        operation: str,
+        deltas: Sequence[Delta],
+        undo_of_id: Optional[int] = None,
+        created_at: Optional[datetime] = None,
+        positions: Optional[Dict[int, str]] = None,
+) -> int:
+    values = {"table_id": table_id, "user_id": user_id, "operation": operation, "undo_of_id": undo_of_id}
+    if created_at is not None:
+        values["created_at"] = created_at
+    batch_id = (await session.execute(insert(ChangeBatch).values(**values).returning(ChangeBatch.id))).scalar_one()
+    if created_at is None:
+        session.info.setdefault(_PENDING_BATCHES, []).append(batch_id)
+    await append_changes(session, batch_id, table_id, deltas, positions)
+    return batch_id
+
+
+async def append_changes(
+        session: AsyncSession,
+        batch_id: int,
+        table_id: int,
+        deltas: Sequence[Delta],
+        positions: Optional[Dict[int, str]] = None,
+) -> None:
+    """Add row changes to an existing batch, e.g. for an operation applied in chunks.
+
+    ``positions`` holds positions of deleted rows so that undo can put them back in place.
+    """
+    positions = positions or {}
+    if deltas:
+        await session.execute(
+            insert(RowChange),
+            [
+                {
+                    "batch_id": batch_id,
+                    "table_id": table_id,
+                    "row_id": row_id,
+                    "before": before,
+                    "after": after,
+                    "position": positions.get(row_id) if after is None else None,
+                }
+                for row_id, before, after in deltas
+            ],
+        )
+
+
+async def log_changes(
+        session: AsyncSession,
+        table_id: int,
+        user_id: Optional[int],
+        operation: str,
+        deltas: Sequence[Delta],
+        positions: Optional[Dict[int, str]] = None,
+) -> Optional[int]:
+    """Record a user mutation in the change log within the caller's transaction.
+
+    A new edit makes the user's pending undo entries unavailable for redo.
+    ``positions`` holds positions of deleted rows.
+
+    Returns:
+        Optional[int]: ID of the created batch, None if nothing changed
+    """
+    if not deltas:
+        return None
+    if user_id is not None:
+        await session.execute(
+            update(ChangeBatch)
+            .where(
+                ChangeBatch.table_id == table_id,
+                ChangeBatch.user_id == user_id,
+                ChangeBatch.operation == "undo",
+                ChangeBatch.undone.is_(False),
+            )
+            .values(undone=True)
+        )
+    return await _insert_batch(session, table_id, user_id, operation, deltas, positions=positions)
+
+
+async def _apply_deltas(
+        session: AsyncSession,
+        table_id: int,
+        deltas: Sequence[Delta],
+        positions: Optional[Dict[int, str]] = None,
+) -> Tuple[List[Delta], List[int], Dict[int, str]]:
+    """Apply deltas to the live table, skipping cells changed by someone else.
+
+    Each delta is (row_id, expected values, target values). A cell is only
+    written if its current value still equals the expected one. Restored rows
+    get their recorded position from ``positions``, or go to the end of the table.
+
+    Returns:
+        tuple: Deltas actually applied (with real previous values), IDs of
+        rows that had conflicts and positions of the rows deleted
+    """
+    positions = positions or {}
+    deleted_positions: Dict[int, str] = {}
+    end_position: Optional[str] = None
+    row_ids = {row_id for row_id, _, _ in deltas}
+    stmt = (
+        select(TableRow)
+        .where(TableRow.table_id == table_id, TableRow.id.in_(row_ids))
+        .with_for_update()
+    )
+    rows = {row.id: row for row in (await session.scalars(stmt)).all()}
+
+    applied: List[Delta] = []
+    conflicts: List[int] = []
+    for row_id, expected, target in deltas:
+        row = rows.get(row_id)
+        if expected is None:
+            # Строка должна появиться снова (отмена удаления)
+            if row is not None:
+                conflicts.append(row_id)
+                continue
+            position = positions.get(row_id)
+            if position is None:
+                if end_position is None:
+                    end_position = await last_position(session, table_id)
+                position = end_position = key_between(end_position, None)
+            row = TableRow(id=row_id, table_id=table_id, row_data=dict(target), position=position)
+            session.add(row)
+            rows[row_id] = row
+            applied.append((row_id, None, dict(target)))
+        elif row is None:
+            conflicts.append(row_id)
+        elif target is None:
+            applied.append((row_id, dict(row.row_data), None))
+            deleted_positions[row_id] = row.position
+            await session.delete(row)
+            del rows[row_id]
+        else:
+            keys = {*expected, *target}
+            cells = [
+                key for key in keys
+                if (row.row_data.get(key) == expected[key] if key in expected else key not in row.row_data)
+            ]
+            if len(cells) < len(keys):
+                conflicts.append(row_id)
+            if cells:
+                before = {key: row.row_data[key] for key in cells if key in row.row_data}
+                after = {key: target[key] for key in cells if key in target}
+                row.row_data = apply_cells(row.row_data, before, after)
+                applied.append((row_id, before, after))
+        await session.flush()
+    return applied, conflicts, deleted_positions
+
+
+def _net_deltas(changes: Sequence[RowChange]) -> List[Delta]:
+    """Collapse consecutive row changes into one net delta per row."""
+    state: Dict[int, Dict[str, Any]] = {}
+    for change in changes:
+        entry = state.get(change.row_id)
+        if entry is None:
+            entry = state[change.row_id] = {
+                "existed": change.before is not None,
+                "exists": change.before is not None,
+                "before": {},
+                "after": {},
+            }
+        if change.before is None:
+            entry["exists"] = True
+            entry["after"] = dict(change.after)
+            continue
+        if entry["existed"]:
+            for key in {*change.before, *(change.after or {})}:
+                entry["before"].setdefault(key, change.before.get(key, _MISSING))
+        if change.after is None:
+            entry["exists"] = False
+            entry["after"] = {}
+        else:
+            entry["after"].update(change.after)
+            entry["after"].update({key: _MISSING for key in change.before if key not in change.after})
+
+    def present(cells: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in cells.items() if value is not _MISSING}
+
+    deltas: List[Delta] = []
+    for row_id, entry in state.items():
+        if not entry["existed"]:
+            if entry["exists"]:
+                deltas.append((row_id, None, present(entry["after"])))
+        elif not entry["exists"]:
+            deltas.append((row_id, present(entry["before"]), None))
+        else:
+            before, after = entry["before"], entry["after"]
+            changed = [
+                key for key in {*before, *after}
+                if before.get(key, _MISSING) != after.get(key, _MISSING)
+            ]
+            if changed:
+                deltas.append((
+                    row_id,
+                    present({key: before.get(key, _MISSING) for key in changed}),
+                    present({key: after.get(key, _MISSING) for key in changed}),
+                ))
+    return deltas
+
+
+class HistoryRepository(BaseRepository):
+
+    async def undo(self, table_id: int, user_id: int, count: int = 1) -> List[Dict[str, Any]]:
+        """Revert the user's last ``count`` operations on a table.
+
+        Returns:
+            list[dict]: For every reverted batch its ID, the ID of the undo
+            entry and rows skipped because of conflicting edits
+        """
+        async with self._session_scope() as session:
+            stmt = (
+                select(ChangeBatch)
+                .where(
+                    ChangeBatch.table_id == table_id,
+                    ChangeBatch.user_id == user_id,
+                    ChangeBatch.operation.in_(UNDOABLE_OPERATIONS),
+                    ChangeBatch.undone.is_(False),
+                )
+                .order_by(ChangeBatch.id.desc())
+                .limit(count)
+                .with_for_update()
+            )
+            return await self._revert(session, table_id, user_id, (await session.scalars(stmt)).all(), "undo")
+
+    async def redo(self, table_id: int, user_id: int, count: int = 1) -> List[Dict[str, Any]]:
+        """Re-apply the user's last ``count`` undone operations."""
+        async with self._session_scope() as session:
+            stmt = (
+                select(ChangeBatch)
+                .where(
+                    ChangeBatch.table_id == table_id,
+                    ChangeBatch.user_id == user_id,
+                    ChangeBatch.operation == "undo",
+                    ChangeBatch.undone.is_(False),
+                )
+                .order_by(ChangeBatch.id.desc())
+                .limit(count)
+                .with_for_update()
+            )
+            return await self._revert(session, table_id, user_id, (await session.scalars(stmt)).all(), "redo")
+
+    @staticmethod
+    async def _revert(
+            session: AsyncSession,
+            table_id: int,
+            user_id: int,
+            batches: Sequence[ChangeBatch],
+            operation: str,
+    ) -> List[Dict[str, Any]]:
+        result = []
+        reverted: List[Delta] = []
+        if batches:
+            await lock_row_order(session, table_id)
+        for batch in batches:
+            changes = (await session.scalars(
+                select(RowChange).where(RowChange.batch_id == batch.id).order_by(RowChange.id.desc())
+            )).all()
+            applied, conflicts, deleted_positions = await _apply_deltas(
+                session,
+                table_id,
+                [(change.row_id, change.after, change.before) for change in changes],
+                {change.row_id: change.position for change in changes if change.position is not None},
+            )
+            batch.undone = True
+            reverted += applied
+            new_batch_id = await _insert_batch(
+                session, table_id, user_id, operation, applied, undo_of_id=batch.id, positions=deleted_positions
+            )
+            result.append({"batch_id": batch.id, "new_batch_id": new_batch_id, "conflicts": conflicts})
+        if batches:
+            await bump_table_version(session, table_id, changed_columns(reverted))
+        return result
+
+    async def get_batches(self, table_id: int, skip: int = 0, limit: int = 50) -> List[Tuple[ChangeBatch, int]]:
+        """Retrieve change batches of a table, newest first, with the number of changed rows."""
+        async with self._read_session_scope() as session:
+            stmt = (
+                select(ChangeBatch, func.count(RowChange.id))
+                .outerjoin(RowChange, RowChange.batch_id == ChangeBatch.id)
+                .where(ChangeBatch.table_id == table_id)
+                .group_by(ChangeBatch.id)
+                .order_by(ChangeBatch.id.desc())
+                .offset(skip)
+                .limit(limit)
+            )
+            return [(batch, count) for batch, count in (await session.execute(stmt)).all()]
+
+    async def get_row_history(self, table_id: int, row_id: int, limit: int = 100) -> List[Tuple[RowChange, ChangeBatch]]:
+        """Retrieve cell-level changes of a single row, newest first."""
+        async with self._read_session_scope() as session:
+            stmt = (
+                select(RowChange, ChangeBatch)
+                .join(ChangeBatch, RowChange.batch_id == ChangeBatch.id)
+                .where(RowChange.table_id == table_id, RowChange.row_id == row_id)
+                .order_by(ChangeBatch.created_at.desc(), RowChange.id.desc())
+                .limit(limit)
+            )
+            return [(change, batch) for change, batch in (await session.execute(stmt)).all()]
+
+    async def get_rows_at(
+            self,
+            table_id: int,
+            at: datetime,
+            skip: int = 0,
+            limit: int = 100,
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """Reconstruct a page of the table as it was at the given moment.
+
+        The live table is rolled back by replaying, newest first, the inverse of
+        every change made after ``at``. Changes are ordered by the time of their
+        batch: compacted batches are inserted later than the batches they
+        replace, so their change IDs do not follow the order of the edits.
+        Only rows touched by those changes are rebuilt in memory; all other
+        rows are read directly in id order.
+
+        Returns:
+            list[tuple]: Pairs of (row_id, row_data) ordered by row id
+        """
+        async with self._read_session_scope() as session:
+            later_changes = (
+                select(RowChange.row_id, RowChange.before, RowChange.after)
+                .join(ChangeBatch, RowChange.batch_id == ChangeBatch.id)
+                .where(ChangeBatch.table_id == table_id, ChangeBatch.created_at > at)
+                .order_by(ChangeBatch.created_at.desc(), RowChange.id.desc())
+            )
+            changes = (await session.execute(later_changes)).all()
+            affected = {row_id for row_id, _, _ in changes}
+
+            state: Dict[int, Dict[str, Any]] = {}
+            if affected:
+                current = await session.execute(
+                    select(TableRow.id, TableRow.row_data)
+                    .where(TableRow.table_id == table_id, TableRow.id.in_(affected))
+                )
+                state = {row_id: dict(row_data) for row_id, row_data in current.all()}
+
+            for row_id, before, after in changes:
+                if before is None:
+                    state.pop(row_id, None)
+                elif after is None:
+                    state[row_id] = dict(before)
+                else:
+                    state[row_id] = apply_cells(state.get(row_id, {}), after, before)
+
+            affected_subquery = (
+                select(RowChange.row_id)
+                .join(ChangeBatch, RowChange.batch_id == ChangeBatch.id)
+                .where(ChangeBatch.table_id == table_id, ChangeBatch.created_at > at)
+            )
+            unaffected = await session.execute(
+                select(TableRow.id, TableRow.row_data)
+                .where(TableRow.table_id == table_id, TableRow.id.not_in(affected_subquery))
+                .order_by(TableRow.id)
+                .limit(skip + limit)
+            )
+            rebuilt = sorted(state.items())
+            merged = heapq.merge(unaffected.all(), rebuilt, key=lambda item: item[0])
+            return [(row_id, row_data) for row_id, row_data in merged][skip:skip + limit]
+
+    async def compact(self, compact_after: timedelta, retention: timedelta) -> Dict[str, int]:
+        """Compact and prune the change log.
+
+        Batches older than ``retention`` are removed. Older than ``compact_after``
+        are merged into one net delta per table and day, which keeps history
+        replay cheap while bounding its storage.
+
+        Snapshots (``TableSnapshot``) pin the changes made after them: such
+        batches are not removed, and batches on both sides of a snapshot are
+        never merged together.
+
+        Returns:
+            dict: Numbers of deleted and compacted batches
+        """
+        now = datetime.now(timezone.utc)
+        async with self._session_scope() as session:
+            locked = (await session.execute(
+                text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": _COMPACTION_LOCK_ID}
+            )).scalar()
+            if not locked:
+                return {"deleted": 0, "compacted": 0}
+
+            pinned = exists().where(
+                TableSnapshot.table_id == ChangeBatch.table_id,
+                TableSnapshot.created_at < ChangeBatch.created_at,
+            )
+            deleted = (await session.execute(
+                delete(ChangeBatch).where(ChangeBatch.created_at < now - retention, ~pinned)
+            )).rowcount
+
+            day = func.date_trunc("day", ChangeBatch.created_at)
+            buckets = (await session.execute(
+                select(ChangeBatch.table_id, day)
+                .where(
+                    ChangeBatch.created_at < now - compact_after,
+                    ChangeBatch.operation != "compacted",
+                )
+                .group_by(ChangeBatch.table_id, day)
+            )).all()
+
+            snapshots = defaultdict(list)
+            if buckets:
+                result = await session.execute(
+                    select(TableSnapshot.table_id, TableSnapshot.created_at)
+                    .where(TableSnapshot.table_id.in_({table_id for table_id, _ in buckets}))
+                    .order_by(TableSnapshot.created_at)
+                )
+                for table_id, created_at in result.all():
+                    snapshots[table_id].append(created_at)
+
+            compacted = 0
+            for table_id, bucket_day in buckets:
+                batches = (await session.scalars(
+                    select(ChangeBatch)
+                    .where(
+                        ChangeBatch.table_id == table_id,
+                        day == bucket_day,
+                        ChangeBatch.operation != "compacted",
+                    )
+                    .order_by(ChangeBatch.id)
+                )).all()
+                # Пачки между соседними снимками сжимаются отдельно, чтобы каждый снимок восстанавливался точно
+                segments = defaultdict(list)
+                for batch in batches:
+                    segments[bisect.bisect_left(snapshots[table_id], batch.created_at)].append(batch)
+
+                for segment in segments.values():
+                    batch_ids = [batch.id for batch in segment]
+                    changes = (await session.scalars(
+                        select(RowChange).where(RowChange.batch_id.in_(batch_ids)).order_by(RowChange.id)
+                    )).all()
+                    users = {batch.user_id for batch in segment}
+                    positions = {}
+                    for change in changes:
+                        if change.position is not None:
+                            positions.setdefault(change.row_id, change.position)
+
+                    await _insert_batch(
+                        session,
+                        table_id,
+                        users.pop() if len(users) == 1 else None,
+                        "compacted",
+                        _net_deltas(changes),
+                        created_at=max(batch.created_at for batch in segment),
+                        positions=positions,
+                    )
+                    await session.execute(delete(ChangeBatch).where(ChangeBatch.id.in_(batch_ids)))
+                    compacted += len(batch_ids)
+
+            return {"deleted": deleted, "compacted": compacted}
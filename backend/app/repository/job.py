@@ -0,0 +1,118 @@
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.models import DataTable, TableJob
+from .base import BaseRepository
+
+
+class JobRepository(BaseRepository):
+
+    async def create_job(
+            self,
+            table_id: int,
+            user_id: int,
+            operation: str,
+            name: Optional[str] = None,
+            options: Optional[Dict[str, Any]] = None,
+    ) -> TableJob:
+        """Queue a background operation on a table.
+
+        A ``delete`` job hides the table from users in the same transaction,
+        so it disappears immediately while its rows are removed later.
+        """
+        async with self._session_scope() as session:
+            if operation == "delete":
+                await session.execute(update(DataTable).where(DataTable.id == table_id).values(is_deleted=True))
+            job = TableJob(table_id=table_id, user_id=user_id, operation=operation, name=name, options=options)
+            session.add(job)
+            await session.flush()
+            await session.refresh(job)
+            return job
+
+    async def get_job(self, job_id: int, user_id: int) -> Optional[TableJob]:
+        """Retrieve a job queued by the user."""
+        async with self._session_scope() as session:
+            stmt = select(TableJob).where(TableJob.id == job_id, TableJob.user_id == user_id)
+            return (await session.scalars(stmt)).first()
+
+    async def run_next_job(
+            self,
+            handler: Callable[[TableJob], Awaitable[None]],
+            max_attempts: int,
+            retry_delay_seconds: float = 30.0,
+            lease_seconds: int = 3600,
+    ) -> Optional[TableJob]:
+        """Run the oldest due job with ``handler``.
+
+        The job is claimed in a short transaction: it becomes ``running`` until
+        ``lease_seconds`` pass, so concurrent workers skip it, and a job whose
+        worker died is picked up again after that. The handler runs without
+        an open transaction and stores its results (``row_count``,
+        ``result_table_id``, ``report``) on the job. A failed job is retried
+        after ``retry_delay_seconds``, doubled with every attempt, until
+        ``max_attempts`` is reached. A ``delete`` job that failed for good
+        makes the table visible again (see ``create_job``): its rows are
+        removed in one transaction, so the table is intact.
+
+        Returns:
+            Optional[TableJob]: The processed job, None if no job is due
+        """
+        async with self._session_scope() as session:
+            stmt = (
+                select(TableJob)
+                .where(TableJob.status.in_(("pending", "running")), TableJob.run_after <= func.now())
+                .order_by(TableJob.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            job = (await session.scalars(stmt)).first()
+            if job is None:
+                return None
+            if job.attempts >= max_attempts:
+                # Воркер остановился во время последней попытки
+                job.error = job.error or "Job was interrupted"
+                await self._fail(session, job)
+                return job
+
+            job.attempts += 1
+            job.status = "running"
+            job.run_after = func.now() + timedelta(seconds=lease_seconds)
+            await session.flush()
+            await session.refresh(job)
+
+        error = None
+        try:
+            await handler(job)
+        except Exception as e:
+            error = str(e)
+
+        async with self._session_scope() as session:
+            stmt = select(TableJob).where(TableJob.id == job.id, TableJob.attempts == job.attempts).with_for_update()
+            claimed = (await session.scalars(stmt)).first()
+            if claimed is None:
+                # Срок выполнения истёк, и задачу уже взял другой воркер
+                return job
+            claimed.error = error
+            if error is None:
+                claimed.status = "done"
+                claimed.row_count = job.row_count
+                claimed.result_table_id = job.result_table_id
+                claimed.report = job.report
+                claimed.finished_at = func.clock_timestamp()
+            elif claimed.attempts >= max_attempts:
+                await self._fail(session, claimed)
+            else:
+                claimed.status = "pending"
+                claimed.run_after = func.now() + timedelta(seconds=retry_delay_seconds * 2 ** (claimed.attempts - 1))
+            await session.flush()
+            await session.refresh(claimed)
+            return claimed
+
+    @staticmethod
+    async def _fail(session: AsyncSession, job: TableJob) -> None:
+        job.status = "failed"
+        job.finished_at = func.clock_timestamp()
+        if job.operation == "delete":
+            await session.execute(update(DataTable).where(DataTable.id == job.table_id).values(is_deleted=False))
@@ -0,0 +1,231 @@
+"""Партиционирование строк таблиц.
+
+``table_rows`` партиционирована списком по ``table_id``. Крупная таблица
+получает собственную партицию ``table_rows_t{table_id}``; строки остальных
+таблиц лежат в партиции по умолчанию, которая разбита хешем по ``table_id`` на
+``HASH_PARTITIONS`` частей ``table_rows_h{остаток}``. Индексы и очистка
+крупной таблицы не затрагивают остальные, а её удаление - это удаление партиции.
+"""
+import re
+from typing import Dict, List, Union
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from backend.app.models import TableRow
+from .base import BaseRepository
+from .history import lock_row_order
+
+ROWS_TABLE = TableRow.__tablename__
+DEFAULT_PARTITION = f"{ROWS_TABLE}_default"
+HASH_PARTITIONS = 16
+ROW_COLUMNS = "id, table_id, row_data, position, created_at, updated_at"
+
+# Ключ advisory-блокировки, чтобы таблицу переносил только один воркер
+_PROMOTION_LOCK_ID = 0x7061_7274
+
+
+def table_partition_name(table_id: int) -> str:
+    """Name of the dedicated partition of a table."""
+    return f"{ROWS_TABLE}_t{int(table_id)}"
+
+
+async def row_partition(connection: Union[AsyncSession, AsyncConnection], table_id: int) -> str:
+    """Return the name of the leaf partition that stores rows of a table.
+
+    Unique indexes of a single table (natural keys) live on this partition,
+    and ``INSERT ... ON CONFLICT`` against them must target it directly.
+    """
+    promoted = table_partition_name(table_id)
+    if await connection.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": promoted}):
+        return promoted
+    remainder = await connection.scalar(
+        text(
+            f"SELECT r FROM generate_series(0, {HASH_PARTITIONS - 1}) AS r "
+            f"WHERE satisfies_hash_partition(CAST(:parent AS regclass), {HASH_PARTITIONS}, r, CAST(:table_id AS integer))"
+        ),
+        {"parent": DEFAULT_PARTITION, "table_id": table_id},
+    )
+    return f"{ROWS_TABLE}_h{remainder}"
+
+
+async def _key_indexes(session: AsyncSession, partition: str, table_id: int) -> Dict[str, str]:
+    """Natural key indexes of a table on a partition: name to ``CREATE INDEX`` statement."""
+    result = await session.execute(
+        text("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = :partition AND indexname LIKE :prefix"),
+        {"partition": partition, "prefix": f"ix\\_table\\_rows\\_key\\_{int(table_id)}\\_%"},
+    )
+    return dict(result.all())
+
+
+def _staged_index_name(name: str) -> str:
+    return f"{name}_new"
+
+
+def _move_index_definition(definition: str, name: str, source: str, partition: str, staged: bool = True) -> str:
+    """Rewrite ``CREATE INDEX`` of a key index on ``source`` to build it on ``partition``."""
+    definition = re.sub(rf" ON (\S+\.)?{source} ", f" ON {partition} ", definition)
+    return definition.replace(f" {name} ", f" {_staged_index_name(name)} ", 1) if staged else definition
+
+
+async def create_table_partition(session: AsyncSession, table_id: int) -> str:
+    """Create an empty dedicated partition of a table, not yet attached.
+
+    The partition gets the indexes of ``table_rows``, so attaching it does
+    not build them. Until the transaction commits the new table is invisible
+    to other sessions, and nothing else is locked: the caller fills the
+    partition and then calls ``attach_table_partition``.
+
+    Returns:
+        str: Name of the created partition
+    """
+    partition = table_partition_name(table_id)
+    await session.execute(text(f"CREATE TABLE {partition} (LIKE {ROWS_TABLE} INCLUDING DEFAULTS INCLUDING INDEXES)"))
+    # Ограничение избавляет ATTACH PARTITION от проверки всех строк новой партиции
+    await session.execute(text(
+        f"ALTER TABLE {partition} ADD CONSTRAINT {partition}_table_id CHECK (table_id = {int(table_id)})"
+    ))
+    return partition
+
+
+async def lock_default_partition(session: AsyncSession) -> None:
+    """Lock the default partition exclusively until the end of the transaction.
+
+    Attaching a partition requires that the default partition holds no rows
+    of its table; the lock blocks all reads and writes of small tables, so
+    it is taken only right before the rows are removed from there.
+    """
+    await session.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN ACCESS EXCLUSIVE MODE"))
+
+
+async def attach_table_partition(session: AsyncSession, table_id: int) -> None:
+    """Attach a partition created by ``create_table_partition``.
+
+    Takes the lock of ``lock_default_partition`` if the caller does not hold
+    it yet: the default partition is scanned to verify that it has no rows
+    of the table.
+    """
+    partition = table_partition_name(table_id)
+    await lock_default_partition(session)
+    await session.execute(text(
+        f"ALTER TABLE {ROWS_TABLE} ATTACH PARTITION {partition} FOR VALUES IN ({int(table_id)})"
+    ))
+    await session.execute(text(f"ALTER TABLE {partition} DROP CONSTRAINT {partition}_table_id"))
+
+
+class PartitionRepository(BaseRepository):
+
+    async def get_tables_to_promote(self, min_rows: int) -> List[int]:
+        """Return IDs of tables in the default partition with at least ``min_rows`` rows.
+
+        Candidates come from the planner statistics of the hash partitions
+        (the most common ``table_id`` values and their frequencies), so the
+        default partition is not scanned. The estimates are rough, so tables
+        estimated at half of ``min_rows`` are candidates too; each is confirmed
+        by counting at most ``min_rows`` of its rows.
+        """
+        async with self._session_scope() as session:
+            candidates = (await session.execute(
+                text(f"""
+                    SELECT DISTINCT v.table_id
+                    FROM pg_stats s
+                    JOIN pg_class c ON c.oid = to_regclass(quote_ident(s.schemaname) || '.' || quote_ident(s.tablename))
+                    CROSS JOIN LATERAL unnest(CAST(CAST(s.most_common_vals AS text) AS integer[]), s.most_common_freqs)
+                        AS v(table_id, freq)
+                    WHERE s.tablename ~ '^{ROWS_TABLE}_h[0-9]+$' AND s.attname = 'table_id'
+                      AND v.freq * c.reltuples >= :min_rows / 2.0
+                    ORDER BY v.table_id
+                """),
+                {"min_rows": min_rows},
+            )).scalars().all()
+
+            tables = []
+            for table_id in candidates:
+                source = await row_partition(session, table_id)
+                rows = await session.scalar(
+                    text(f"SELECT count(*) FROM (SELECT 1 FROM {source} WHERE table_id = :table_id LIMIT :min_rows) s"),
+                    {"table_id": table_id, "min_rows": min_rows},
+                )
+                if rows >= min_rows:
+                    tables.append(table_id)
+            return tables
+
+    async def promote_table(self, table_id: int, lock_timeout_ms: int = 5000) -> int:
+        """Move the rows of a table from the default partition to its own partition.
+
+        The rows are copied into a new table with all indexes, including the
+        natural key indexes of the table, before anything is locked, so reads
+        and writes continue during the copy. Then the default partition is
+        locked exclusively (see ``lock_default_partition``) only to replace
+        the rows changed meanwhile (found by their ``xmin``), delete the rows
+        from the default partition and attach the new partition.
+        ``lock_timeout_ms`` bounds the wait for that lock, not the time it is
+        held: the operation gives up instead of queueing behind long
+        transactions.
+
+        Returns:
+            int: Number of moved rows, 0 if the table already has its own partition
+        """
+        partition = table_partition_name(table_id)
+        async with self._session_scope() as session:
+            locked = (await session.execute(
+                text("SELECT pg_try_advisory_xact_lock(:lock_id, :table_id)"),
+                {"lock_id": _PROMOTION_LOCK_ID, "table_id": table_id},
+            )).scalar()
+            source = await row_partition(session, table_id)
+            if not locked or source == partition:
+                return 0
+
+            await create_table_partition(session, table_id)
+            # Версии скопированных строк (xmin) запоминаются, чтобы под блокировкой найти изменённые после копирования
+            await session.execute(text("CREATE TEMP TABLE promoted_versions (id integer, version xid) ON COMMIT DROP"))
+            await session.execute(text(
+                f"WITH copied AS MATERIALIZED ("
+                f"SELECT xmin AS version, {ROW_COLUMNS} FROM {source} WHERE table_id = {int(table_id)}"
+                f"), inserted AS (INSERT INTO {partition} ({ROW_COLUMNS}) SELECT {ROW_COLUMNS} FROM copied) "
+                f"INSERT INTO promoted_versions SELECT id, version FROM copied"
+            ))
+            key_indexes = await _key_indexes(session, source, table_id)
+            # Имена индексов уникальны в схеме: копии строятся под временными именами
+            for name, definition in key_indexes.items():
+                await session.execute(text(_move_index_definition(definition, name, source, partition)))
+            await session.execute(text(f"ANALYZE {partition}"))
+
+            await session.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+            await lock_row_order(session, table_id)
+            await lock_default_partition(session)
+
+            # Строки, изменённые, добавленные или удалённые во время копирования, заменяются актуальными
+            changed = (await session.execute(text(
+                f"SELECT DISTINCT coalesce(s.id, v.id) FROM "
+                f"(SELECT id, xmin AS version FROM {source} WHERE table_id = {int(table_id)}) s "
+                f"FULL JOIN promoted_versions v ON v.id = s.id AND v.version = s.version "
+                f"WHERE s.id IS NULL OR v.id IS NULL"
+            ))).scalars().all()
+            if changed:
+                await session.execute(
+                    text(f"DELETE FROM {partition} WHERE id = ANY(CAST(:ids AS integer[]))"), {"ids": changed}
+                )
+                await session.execute(
+                    text(
+                        f"INSERT INTO {partition} ({ROW_COLUMNS}) SELECT {ROW_COLUMNS} FROM {source} "
+                        f"WHERE table_id = {int(table_id)} AND id = ANY(CAST(:ids AS integer[]))"
+                    ),
+                    {"ids": changed},
+                )
+            moved = (await session.execute(
+                text(f"DELETE FROM {source} WHERE table_id = {int(table_id)}")
+            )).rowcount
+            await attach_table_partition(session, table_id)
+
+            # Ключ таблицы мог смениться во время копирования
+            current_keys = await _key_indexes(session, source, table_id)
+            for name, definition in current_keys.items():
+                await session.execute(text(f"DROP INDEX {name}"))
+                if name in key_indexes:
+                    await session.execute(text(f"ALTER INDEX {_staged_index_name(name)} RENAME TO {name}"))
+                else:
+                    await session.execute(text(_move_index_definition(definition, name, source, partition, staged=False)))
+            for name in key_indexes.keys() - current_keys.keys():
+                await session.execute(text(f"DROP INDEX {_staged_index_name(name)}"))
+            return moved
@@ -0,0 +1,214 @@
+"""Проверка качества данных таблицы: невалидные строки и дубликаты.
+
+Строки читаются пачками по ``id`` (каждая пачка - короткий запрос), поэтому
+таблица никогда не загружается в память целиком. Дубликаты ищутся в SQL:
+для каждой строки вычисляется хеш содержимого (или значений ключевых колонок),
+строки группируются по хешу, и из базы возвращаются только группы дубликатов.
+"""
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, JSON, column, select, text
+
+from backend.app.models import TableRow
+from .base import BaseRepository
+from .data import natural_key_expressions, row_delta
+from .history import append_changes, bump_table_version, changed_columns, log_changes
+
+
+def row_hash(key_columns: Optional[Sequence[str]] = None, source: str = "row_data") -> str:
+    """SQL expression hashing a row's content, or only its ``key_columns`` cells.
+
+    Content is hashed as ``jsonb`` text, so key order and formatting of the
+    stored JSON do not matter. Key cells are compared as text, like the
+    natural key (see ``natural_key_expressions``).
+    """
+    if key_columns:
+        return f"md5(jsonb_build_array({natural_key_expressions(key_columns, source)})::text)"
+    return f"md5({source}::jsonb::text)"
+
+
+def key_present(key_columns: Optional[Sequence[str]] = None, source: str = "row_data") -> str:
+    """SQL condition that all ``key_columns`` cells of a row have a value.
+
+    Like the unique index of the natural key, rows with an empty key cell
+    are never duplicates of each other. Without key columns the condition
+    is always true.
+    """
+    if not key_columns:
+        return "true"
+    return " AND ".join(f"{natural_key_expressions([name], source)} IS NOT NULL" for name in key_columns)
+
+
+class QualityRepository(BaseRepository):
+
+    async def iter_rows(self, table_id: int, batch_size: int) -> AsyncIterator[List[Tuple[int, Dict[str, Any]]]]:
+        """Iterate over all rows of a table in batches of ``(id, row_data)`` ordered by id.
+
+        Every batch is read by its own query after the last seen id, so no
+        transaction stays open between batches and rows may be changed meanwhile.
+        """
+        last_id = 0
+        while True:
+            async with self._session_scope() as session:
+                stmt = (
+                    select(TableRow.id, TableRow.row_data)
+                    .where(TableRow.table_id == table_id, TableRow.id > last_id)
+                    .order_by(TableRow.id)
+                    .limit(batch_size)
+                )
+                batch = [tuple(row) for row in (await session.execute(stmt)).all()]
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1][0]
+
+    async def find_duplicates(
+            self,
+            table_id: int,
+            key_columns: Optional[Sequence[str]] = None,
+            samples: int = 100,
+    ) -> Dict[str, Any]:
+        """Group rows of a table by content hash and report groups with several rows.
+
+        Rows with an empty cell in one of ``key_columns`` are not compared.
+
+        Args:
+            table_id: ID of the table
+            key_columns: Compare only these cells; whole rows are compared if omitted
+            samples: Maximum number of groups listed in the report, largest first
+
+        Returns:
+            dict: ``groups`` - number of duplicate groups, ``rows`` - number of
+            rows that would be removed keeping the first row of every group,
+            ``samples`` - row IDs of the largest groups in row order
+        """
+        stmt = text(f"""
+            WITH groups AS (
+                SELECT count(*) AS n, (array_agg(id ORDER BY position, id))[1:20] AS row_ids
+                FROM {TableRow.__tablename__}
+                WHERE table_id = :table_id AND {key_present(key_columns)}
+                GROUP BY {row_hash(key_columns)}
+                HAVING count(*) > 1
+            )
+            SELECT
+                count(*) AS groups,
+                coalesce(sum(n - 1), 0) AS rows,
+                (
+                    SELECT coalesce(json_agg(s.row_ids), '[]'::json)
+                    FROM (SELECT row_ids FROM groups ORDER BY n DESC LIMIT :samples) s
+                ) AS samples
+            FROM groups
+        """).columns(column("groups", Integer), column("rows", Integer), column("samples", JSON))
+        async with self._session_scope() as session:
+            result = (await session.execute(stmt, {"table_id": table_id, "samples": samples})).one()
+            return {"groups": result.groups, "rows": int(result.rows), "samples": result.samples}
+
+    async def delete_duplicates(
+            self,
+            table_id: int,
+            key_columns: Optional[Sequence[str]] = None,
+            user_id: Optional[int] = None,
+    ) -> int:
+        """Delete all but the first row (in row order) of every group of duplicates.
+
+        Rows with an empty cell in one of ``key_columns`` are kept.
+        Deleted rows are recorded in the change log as one ``cleanup``
+        operation, so the deletion can be undone.
+
+        Returns:
+            int: Number of deleted rows
+        """
+        stmt = text(f"""
+            WITH duplicates AS (
+                SELECT unnest((array_agg(id ORDER BY position, id))[2:]) AS id
+                FROM {TableRow.__tablename__}
+                WHERE table_id = :table_id AND {key_present(key_columns)}
+                GROUP BY {row_hash(key_columns)}
+                HAVING count(*) > 1
+            )
+            DELETE FROM {TableRow.__tablename__} t
+            WHERE t.table_id = :table_id AND t.id = ANY(ARRAY(SELECT id FROM duplicates))
+            RETURNING t.id, t.row_data, t.position
+        """).columns(column("id", Integer), column("row_data", JSON), column("position"))
+        async with self._session_scope() as session:
+            deleted = (await session.execute(stmt, {"table_id": table_id})).all()
+            if deleted:
+                await log_changes(
+                    session,
+                    table_id,
+                    user_id,
+                    "cleanup",
+                    [(row.id, row.row_data, None) for row in deleted],
+                    {row.id: row.position for row in deleted},
+                )
+                await bump_table_version(session, table_id)
+            return len(deleted)
+
+    async def fix_rows(
+            self,
+            table_id: int,
+            rows: Sequence[Tuple[int, Dict[str, Any], Optional[Dict[str, Any]]]],
+            user_id: Optional[int] = None,
+            batch_id: Optional[int] = None,
+    ) -> Tuple[int, Optional[int]]:
+        """Replace or delete rows found invalid by a scan.
+
+        A row is only changed if it still holds the scanned data, so edits made
+        after the scan are never overwritten. The rows are found by the ``id``
+        index: ``ANY(:ids)`` keeps the planner from joining the whole table. Changes of consecutive calls are
+        recorded in one ``cleanup`` operation of the change log.
+
+        Args:
+            table_id: ID of the table
+            rows: Triples ``(row_id, scanned row_data, new row_data)``; None deletes the row
+            user_id: ID of the user for the change log
+            batch_id: Change log operation returned by the previous call
+
+        Returns:
+            tuple: Number of changed rows and the change log operation ID
+        """
+        replaced = [(row_id, old, new) for row_id, old, new in rows if new is not None]
+        deleted = [(row_id, old) for row_id, old, new in rows if new is None]
+        deltas = []
+        positions = {}
+        async with self._session_scope() as session:
+            if replaced:
+                result = await session.execute(text(f"""
+                    UPDATE {TableRow.__tablename__} t
+                    SET row_data = f.new::json, updated_at = now()
+                    FROM unnest(CAST(:ids AS integer[]), CAST(:old AS text[]), CAST(:new AS text[])) AS f(id, old, new)
+                    WHERE t.table_id = :table_id AND t.id = ANY(CAST(:ids AS integer[]))
+                      AND t.id = f.id AND t.row_data::jsonb = f.old::jsonb
+                    RETURNING t.id
+                """), {
+                    "table_id": table_id,
+                    "ids": [row_id for row_id, _, _ in replaced],
+                    "old": [json.dumps(old) for _, old, _ in replaced],
+                    "new": [json.dumps(new) for _, _, new in replaced],
+                })
+                changed = set(result.scalars().all())
+                deltas += [row_delta(row_id, old, new) for row_id, old, new in replaced if row_id in changed]
+            if deleted:
+                result = await session.execute(text(f"""
+                    DELETE FROM {TableRow.__tablename__} t
+                    USING unnest(CAST(:ids AS integer[]), CAST(:old AS text[])) AS f(id, old)
+                    WHERE t.table_id = :table_id AND t.id = ANY(CAST(:ids AS integer[]))
+                      AND t.id = f.id AND t.row_data::jsonb = f.old::jsonb
+                    RETURNING t.id, t.row_data, t.position
+                """).columns(column("id", Integer), column("row_data", JSON), column("position")), {
+                    "table_id": table_id,
+                    "ids": [row_id for row_id, _ in deleted],
+                    "old": [json.dumps(old) for _, old in deleted],
+                })
+                for row in result.all():
+                    deltas.append((row.id, row.row_data, None))
+                    positions[row.id] = row.position
+
+            if deltas:
+                if batch_id is None:
+                    batch_id = await log_changes(session, table_id, user_id, "cleanup", deltas, positions)
+                else:
+                    await append_changes(session, batch_id, table_id, deltas, positions)
+                await bump_table_version(session, table_id, changed_columns(deltas))
+        return len(deltas), batch_id
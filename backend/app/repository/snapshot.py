@@ -0,0 +1,180 @@
+"""Снимки таблиц с копированием при записи.
+
+Снимок хранит только момент создания. Строки, не менявшиеся после него,
+читаются прямо из ``table_rows``; строки, изменённые или удалённые позже,
+восстанавливаются из журнала изменений: значение каждой ячейки в снимке - это
+``before`` первого изменения этой ячейки после снимка, а ячейки, которых нет в
+``before`` этого изменения, добавлены позже и убираются. Поэтому снимок занимает
+место только под последующие изменения, которые журнал и так хранит.
+
+Изменения упорядочены по времени их пачки, а не по ID: сжатая пачка
+вставляется позже тех, что она заменила, и её ID больше ID последующих правок.
+
+Ручной порядок строк в журнал не пишется: строки снимка стоят в текущем порядке,
+удалённые после снимка - на своих прежних местах.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import func, select, delete, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from backend.app.models import ChangeBatch, DataTable, RowChange, TableRow, TableSnapshot
+from .base import BaseRepository
+from .data import RowOrder
+
+_SNAPSHOT_ROWS = f"""
+    WITH later AS (
+        SELECT c.id, c.row_id, c.before, c.after, c.position, b.created_at
+        FROM {RowChange.__tablename__} c
+        JOIN {ChangeBatch.__tablename__} b ON b.id = c.batch_id
+        WHERE b.table_id = :table_id AND b.created_at > :at
+    ),
+    first_changes AS (
+        SELECT DISTINCT ON (row_id) row_id, before IS NOT NULL AS existed
+        FROM later
+        ORDER BY row_id, created_at, id
+    ),
+    first_values AS (
+        SELECT
+            row_id,
+            jsonb_object_agg(key, value) FILTER (WHERE existed) AS cells,
+            array_agg(key) FILTER (WHERE NOT existed) AS added
+        FROM (
+            SELECT DISTINCT ON (l.row_id, e.key) l.row_id, e.key, e.value, e.existed
+            FROM later l, LATERAL (
+                SELECT key, value, true AS existed FROM jsonb_each(l.before::jsonb)
+                UNION ALL
+                SELECT key, NULL, false FROM jsonb_each(l.after::jsonb) a
+                WHERE NOT coalesce(l.before::jsonb ? a.key, false)
+            ) e
+            ORDER BY l.row_id, e.key, l.created_at, l.id
+        ) cells
+        GROUP BY row_id
+    ),
+    deleted_positions AS (
+        SELECT DISTINCT ON (row_id) row_id, position
+        FROM later
+        WHERE position IS NOT NULL
+        ORDER BY row_id, created_at, id
+    )
+    SELECT t.id, t.table_id, t.row_data, t.position, t.created_at, t.updated_at
+    FROM {TableRow.__tablename__} t
+    WHERE t.table_id = :table_id AND NOT EXISTS (SELECT 1 FROM later l WHERE l.row_id = t.id)
+    UNION ALL
+    SELECT
+        f.row_id,
+        :table_id,
+        (
+            (coalesce(t.row_data::jsonb, '{{}}'::jsonb) - coalesce(v.added, '{{}}'::text[]))
+            || coalesce(v.cells, '{{}}'::jsonb)
+        )::json,
+        coalesce(t.position, d.position),
+        coalesce(t.created_at, :at),
+        NULL
+    FROM first_changes f
+    LEFT JOIN {TableRow.__tablename__} t ON t.table_id = :table_id AND t.id = f.row_id
+    LEFT JOIN first_values v ON v.row_id = f.row_id
+    LEFT JOIN deleted_positions d ON d.row_id = f.row_id
+    WHERE f.existed
+"""
+
+
+def snapshot_rows(table_id: int, at: datetime):
+    """Alias of ``TableRow`` over the rows of a table as they were at ``at``.
+
+    The alias can be queried like ``TableRow``: filtered, ordered with
+    ``RowOrder.create(..., rows=alias)`` and paged.
+    """
+    stmt = (
+        text(_SNAPSHOT_ROWS)
+        .bindparams(table_id=table_id, at=at)
+        .columns(
+            TableRow.id,
+            TableRow.table_id,
+            TableRow.row_data,
+            TableRow.position,
+            TableRow.created_at,
+            TableRow.updated_at,
+        )
+    )
+    return aliased(TableRow, stmt.subquery("snapshot_rows"), adapt_on_names=True)
+
+
+class SnapshotRepository(BaseRepository):
+
+    async def create_snapshot(self, table_id: int, user_id: int, name: str) -> TableSnapshot:
+        """Create a named snapshot of the table's current state.
+
+        The table row is locked first, so changes committed by concurrent
+        writers (they bump the table version) are either before the snapshot
+        or wait for it. Writers stamp their batches under the same lock (see
+        ``bump_table_version``), so a batch committed after the snapshot is
+        always later than it, even if its transaction started earlier.
+
+        Raises:
+            ValueError: The table already has a snapshot with this name
+        """
+        try:
+            async with self._session_scope() as session:
+                await session.execute(select(DataTable.id).where(DataTable.id == table_id).with_for_update())
+                snapshot = TableSnapshot(
+                    table_id=table_id,
+                    name=name,
+                    created_by_id=user_id,
+                    created_at=func.clock_timestamp(),
+                )
+                session.add(snapshot)
+                await session.flush()
+                await session.refresh(snapshot)
+                return snapshot
+        except IntegrityError:
+            raise ValueError(f"Snapshot '{name}' already exists")
+
+    async def get_snapshot(self, table_id: int, snapshot_id: int) -> Optional[TableSnapshot]:
+        async with self._read_session_scope() as session:
+            stmt = select(TableSnapshot).where(TableSnapshot.id == snapshot_id, TableSnapshot.table_id == table_id)
+            return (await session.scalars(stmt)).first()
+
+    async def get_snapshots(self, table_id: int) -> List[TableSnapshot]:
+        """Retrieve snapshots of a table, newest first."""
+        async with self._read_session_scope() as session:
+            stmt = (
+                select(TableSnapshot)
+                .where(TableSnapshot.table_id == table_id)
+                .order_by(TableSnapshot.created_at.desc())
+            )
+            return list((await session.scalars(stmt)).all())
+
+    async def delete_snapshot(self, table_id: int, snapshot_id: int) -> bool:
+        """Delete a snapshot; the change log it pinned is compacted and pruned as usual afterwards."""
+        async with self._session_scope() as session:
+            stmt = delete(TableSnapshot).where(TableSnapshot.id == snapshot_id, TableSnapshot.table_id == table_id)
+            return (await session.execute(stmt)).rowcount > 0
+
+    async def get_rows(
+            self,
+            snapshot: TableSnapshot,
+            skip: int = 0,
+            limit: int = 100,
+            sort_by: Optional[str] = None,
+            sort_order: Optional[str] = "asc",
+            sort_type: str = "string",
+    ) -> List[TableRow]:
+        """Retrieve a page of the snapshot's rows in the same orders as live rows.
+
+        Returns:
+            list[TableRow]: Rows with the data they had in the snapshot
+        """
+        rows = snapshot_rows(snapshot.table_id, snapshot.created_at)
+        order = RowOrder.create(sort_by, sort_order, sort_type, rows)
+        stmt = select(rows).order_by(*order.clauses).offset(skip).limit(limit)
+        async with self._read_session_scope() as session:
+            return list((await session.scalars(stmt)).all())
+
+    async def get_row(self, snapshot: TableSnapshot, row_id: int) -> Optional[TableRow]:
+        """Retrieve a single row as it was in the snapshot."""
+        rows = snapshot_rows(snapshot.table_id, snapshot.created_at)
+        async with self._read_session_scope() as session:
+            return (await session.scalars(select(rows).where(rows.id == row_id))).first()
@@ -1,5 +1,439 @@
-class TableRepository:
+from typing import Any, Dict, Iterable, List, Literal, Optional, Sequence, Tuple, Union
+from sqlalchemy import Select, bindparam, select, update, delete, func, or_, and_, text, exists
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
 
+from backend.app.core.database import get_engine
+from backend.app.models import (
+    ChangeBatch,
+    DataTable,
+    RowChange,
+    TablePermission,
+    TableRow,
+    TableSnapshot,
+    User,
+    UserRole,
+)
+from .base import BaseRepository
+from .data import copy_rows, natural_key_expressions, natural_key_index_name
+from .history import bump_table_version, lock_row_order
+from .partition import (
+    ROWS_TABLE,
+    attach_table_partition,
+    create_table_partition,
+    row_partition,
+    table_partition_name,
+)
 
-    async def get_table_with_access(self, table_id: int, user_id: int):
-        pass
+
+async def _delete_rows(session: AsyncSession, table_id: int, drop_partition: bool = False) -> int:
+    """Delete all rows, the change history and the snapshots of a table with set-based statements.
+
+    A dedicated partition is truncated, or dropped with ``drop_partition``,
+    instead of deleting its rows one by one. The rows go last: dropping the
+    partition locks ``table_rows`` exclusively until the end of the
+    transaction, and the history must not be deleted under that lock.
+
+    Returns:
+        int: Number of deleted rows
+    """
+    await session.execute(delete(RowChange).where(RowChange.table_id == table_id))
+    await session.execute(delete(ChangeBatch).where(ChangeBatch.table_id == table_id))
+    # Снимки восстанавливаются по журналу изменений и без него теряют смысл
+    await session.execute(delete(TableSnapshot).where(TableSnapshot.table_id == table_id))
+    partition = await row_partition(session, table_id)
+    if partition == table_partition_name(table_id):
+        deleted = await session.scalar(text(f"SELECT count(*) FROM {partition}"))
+        await session.execute(text(f"{'DROP TABLE' if drop_partition else 'TRUNCATE'} {partition}"))
+    else:
+        deleted = (await session.execute(delete(TableRow).where(TableRow.table_id == table_id))).rowcount
+    return deleted
+
+
+async def _create_key_index(table_id: int, key_columns: Sequence[str]) -> None:
+    """Build the unique natural key index of a table without blocking writes.
+
+    The index is built concurrently outside of a transaction: the partition
+    may be a hash partition shared with other tables, whose writes a plain
+    ``CREATE INDEX`` would block until the end of the transaction.
+
+    Raises:
+        ValueError: Key columns contain duplicate values
+    """
+    index_name = natural_key_index_name(table_id, key_columns)
+    async with get_engine().connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        partition = await row_partition(connection, table_id)
+        try:
+            await connection.execute(text(
+                f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {index_name} "
+                f"ON {partition} ({natural_key_expressions(key_columns)}) "
+                f"WHERE table_id = {int(table_id)}"
+            ))
+        except DBAPIError:
+            # Неудачное построение оставляет невалидный индекс
+            await connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+            raise ValueError("Key columns contain duplicate values")
+
+
+async def _drop_key_indexes(table_id: int) -> None:
+    """Drop natural key indexes left on a shared hash partition by a deleted table."""
+    async with get_engine().connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        names = (await connection.execute(
+            text("SELECT indexname FROM pg_indexes WHERE tablename LIKE :rows AND indexname LIKE :prefix"),
+            {"rows": f"{ROWS_TABLE}\\_h%", "prefix": f"ix\\_table\\_rows\\_key\\_{int(table_id)}\\_%"},
+        )).scalars().all()
+        for name in names:
+            await connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def effective_permissions(user_id: Union[int, ColumnElement]) -> Tuple[ColumnElement, ColumnElement, ColumnElement]:
+    """Effective read, write and manage flags of a user on ``DataTable``.
+
+    The flags combine the explicit grant (``TablePermission`` outer-joined
+    for the user, see ``_with_grant``), ownership, public read access and
+    the admin role. They are plain SQL expressions, so an access check or a
+    listing of accessible tables is a single statement.
+    """
+    is_admin = select(User.id).where(User.id == user_id, User.role == UserRole.ADMIN).exists()
+    is_owner = DataTable.created_by_id == user_id
+    return (
+        or_(TablePermission.can_read.is_(True), DataTable.is_public.is_(True), is_owner, is_admin),
+        or_(TablePermission.can_write.is_(True), is_owner, is_admin),
+        or_(TablePermission.can_manage.is_(True), is_owner, is_admin),
+    )
+
+
+def _with_grant(stmt: Select, user_id: Union[int, ColumnElement]) -> Select:
+    """Outer-join the explicit grant of the user, found by the unique ``(user_id, table_id)`` index."""
+    return stmt.outerjoin(
+        TablePermission,
+        and_(
+            TablePermission.user_id == user_id,
+            TablePermission.table_id == DataTable.id,
+        ),
+    )
+
+
+def _table_with_permission_statement(permission: str) -> Select:
+    """Select a table by ``:table_id`` if ``:user_id`` has the permission on it."""
+    user_id = bindparam("user_id")
+    access = dict(zip(("read", "write", "manage"), effective_permissions(user_id)))[permission]
+    return _with_grant(select(DataTable), user_id).where(
+        DataTable.id == bindparam("table_id"),
+        DataTable.is_deleted.is_(False),
+        access,
+    )
+
+
+def _accessible_tables_statement() -> Select:
+    """Select tables readable by ``:user_id`` with their write and manage flags."""
+    user_id = bindparam("user_id")
+    can_read, can_write, can_manage = effective_permissions(user_id)
+    return (
+        _with_grant(select(DataTable, can_write, can_manage), user_id)
+        .where(DataTable.is_deleted.is_(False), can_read)
+        .order_by(func.coalesce(DataTable.updated_at, DataTable.created_at).desc(), DataTable.id.desc())
+    )
+
+
+# Проверка прав выполняется в каждом запросе к данным, поэтому её запросы собираются
+# один раз с параметрами: повторно используемый запрос не пересобирается, ключ кэша
+# SQLAlchemy для него не вычисляется заново, а его SQL остаётся в кэше asyncpg
+_TABLE_WITH_PERMISSION = {
+    permission: _table_with_permission_statement(permission) for permission in ("read", "write", "manage")
+}
+_ACCESSIBLE_TABLES = _accessible_tables_statement()
+
+
+class TableRepository(BaseRepository):
+
+    async def get_table_with_permission(
+            self,
+            table_id: int,
+            user_id: int,
+            permission: Literal["read", "write", "manage"] = "read",
+    ) -> Optional[DataTable]:
+        """Load a table if the user has the given effective permission on it.
+
+        Args:
+            table_id: ID of the table
+            user_id: ID of the user
+            permission: Required permission
+
+        Returns:
+            Optional[DataTable]: Table if found and accessible, None otherwise
+        """
+        async with self._read_session_scope() as session:
+            stmt = _TABLE_WITH_PERMISSION[permission]
+            return (await session.scalars(stmt, {"table_id": table_id, "user_id": user_id})).first()
+
+    async def get_table_with_access(self, table_id: int, user_id: int) -> Optional[DataTable]:
+        """Retrieve a table the user is allowed to read."""
+        return await self.get_table_with_permission(table_id, user_id, "read")
+
+    async def get_table_with_write_access(self, table_id: int, user_id: int) -> Optional[DataTable]:
+        """Retrieve a table the user is allowed to modify."""
+        return await self.get_table_with_permission(table_id, user_id, "write")
+
+    async def get_table_with_manage_access(self, table_id: int, user_id: int) -> Optional[DataTable]:
+        """Retrieve a table whose settings the user is allowed to change."""
+        return await self.get_table_with_permission(table_id, user_id, "manage")
+
+    async def get_tables_with_access(self, table_ids: Sequence[int], user_id: int) -> Dict[int, DataTable]:
+        """Retrieve the tables among ``table_ids`` the user can read with one query."""
+        if not table_ids:
+            return {}
+        can_read = effective_permissions(user_id)[0]
+        stmt = _with_grant(select(DataTable), user_id).where(
+            DataTable.id.in_(table_ids),
+            DataTable.is_deleted.is_(False),
+            can_read,
+        )
+        async with self._read_session_scope() as session:
+            return {table.id: table for table in (await session.scalars(stmt)).all()}
+
+    async def get_accessible_tables(self, user_id: int) -> List[Tuple[DataTable, bool, bool, bool]]:
+        """Retrieve all tables the user can read together with the effective permissions.
+
+        Returns:
+            list: Tuples ``(table, can_read, can_write, can_manage)``, recently modified tables first
+        """
+        async with self._read_session_scope() as session:
+            result = await session.execute(_ACCESSIBLE_TABLES, {"user_id": user_id})
+            return [(table, True, bool(write), bool(manage)) for table, write, manage in result.all()]
+
+    async def create_table(
+            self,
+            name: str,
+            columns_schema: List[Dict[str, Any]],
+            user_id: int,
+            description: Optional[str] = None,
+            row_batches: Iterable[List[str]] = (),
+    ) -> Tuple[DataTable, int]:
+        """Create a table owned by the user, optionally loading rows in the same transaction.
+
+        The owner gets an explicit full-access permission.
+
+        Args:
+            name: Table name
+            columns_schema: Column definitions
+            user_id: ID of the owner
+            description: Table description
+            row_batches: Batches of JSON-serialized ``row_data`` loaded with COPY
+
+        Returns:
+            tuple: Created table and the number of loaded rows
+        """
+        async with self._session_scope() as session:
+            table = DataTable(
+                name=name,
+                description=description,
+                columns_schema=columns_schema,
+                created_by_id=user_id,
+                is_public=False,
+            )
+            session.add(table)
+            await session.flush()
+            session.add(TablePermission(
+                user_id=user_id,
+                table_id=table.id,
+                can_read=True,
+                can_write=True,
+                can_manage=True,
+            ))
+            await session.flush()
+            row_count = await copy_rows(session, table.id, row_batches)
+            await session.refresh(table)
+            return table, row_count
+
+    async def set_natural_key(self, table: DataTable, key_columns: Sequence[str]) -> DataTable:
+        """Declare the natural key of a table and build the unique index backing it.
+
+        The index is a partial unique expression index over the key cells of
+        the table's rows, built on the partition that stores them. It is built concurrently, so writes to ``table_rows``
+        are not blocked; the previous key index is dropped afterwards. Key
+        columns are marked ``key`` and ``required`` in ``columns_schema``.
+        An empty ``key_columns`` removes the key.
+
+        Raises:
+            ValueError: Some rows have no value in a key column or share a key
+        """
+        key_columns = list(key_columns)
+        old_key = [column["name"] for column in table.columns_schema if column.get("key")]
+        if key_columns == old_key:
+            return table
+
+        if key_columns:
+            async with self._session_scope() as session:
+                missing = or_(*(TableRow.row_data[name].as_string().is_(None) for name in key_columns))
+                stmt = select(exists().where(TableRow.table_id == table.id, missing))
+                if await session.scalar(stmt):
+                    raise ValueError("Some rows have no value in a key column")
+
+            await _create_key_index(table.id, key_columns)
+
+        columns_schema = []
+        for column in table.columns_schema:
+            column = {key: value for key, value in column.items() if key != "key"}
+            if column["name"] in key_columns:
+                column.update(key=True, required=True)
+            columns_schema.append(column)
+        async with self._session_scope() as session:
+            await session.execute(
+                update(DataTable).where(DataTable.id == table.id).values(columns_schema=columns_schema)
+            )
+            table = await session.get(DataTable, table.id)
+
+        if old_key:
+            async with get_engine().connect() as connection:
+                connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+                await connection.execute(text(
+                    f"DROP INDEX CONCURRENTLY IF EXISTS {natural_key_index_name(table.id, old_key)}"
+                ))
+        return table
+
+    async def set_column_reference(
+            self,
+            table: DataTable,
+            column: str,
+            reference: Optional[Dict[str, Any]],
+    ) -> DataTable:
+        """Make a column a reference to rows of another table or a plain column again.
+
+        Only ``columns_schema`` changes: cells keep their values, which are
+        looked up in the target table when rows are read.
+
+        Args:
+            table: Table owning the column
+            column: Name of the column
+            reference: ``{"table_id", "column", "display"}``, None removes the reference
+        """
+        columns_schema = []
+        for item in table.columns_schema:
+            item = {key: value for key, value in item.items() if key != "reference"}
+            if item["name"] == column and reference is not None:
+                item["reference"] = reference
+            columns_schema.append(item)
+        async with self._session_scope() as session:
+            await session.execute(
+                update(DataTable).where(DataTable.id == table.id).values(columns_schema=columns_schema)
+            )
+            return await session.get(DataTable, table.id)
+
+    async def delete_table(self, table_id: int, lock_timeout_ms: int = 5000) -> int:
+        """Delete a table with its rows, history and permissions.
+
+        Rows of a table with its own partition are removed by dropping the
+        partition. Dropping locks ``table_rows`` exclusively, so it is the
+        last statement but the delete of the table row itself, and the
+        operation gives up after ``lock_timeout_ms`` instead of queueing
+        behind long transactions. Key indexes of a table in a shared hash
+        partition are dropped concurrently after the commit.
+
+        Returns:
+            int: Number of deleted rows, 0 if the table does not exist
+        """
+        async with self._session_scope() as session:
+            await session.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+            await lock_row_order(session, table_id)
+            if await session.get(DataTable, table_id) is None:
+                return 0
+            await session.execute(delete(TablePermission).where(TablePermission.table_id == table_id))
+            deleted = await _delete_rows(session, table_id, drop_partition=True)
+            await session.execute(delete(DataTable).where(DataTable.id == table_id))
+        await _drop_key_indexes(table_id)
+        return deleted
+
+    async def clear_rows(self, table_id: int) -> int:
+        """Delete all rows of a table, keeping its schema and permissions.
+
+        The change history and snapshots are deleted as well: undo cannot bring the rows back.
+
+        Returns:
+            int: Number of deleted rows
+        """
+        async with self._session_scope() as session:
+            await lock_row_order(session, table_id)
+            deleted = await _delete_rows(session, table_id)
+            await session.execute(
+                update(DataTable).where(DataTable.id == table_id).values(needs_rebalance=False)
+            )
+            await bump_table_version(session, table_id)
+            return deleted
+
+    async def copy_table(
+            self,
+            table_id: int,
+            user_id: int,
+            name: str,
+            lock_timeout_ms: int = 5000,
+    ) -> Tuple[DataTable, int]:
+        """Copy the schema and rows of a table into a new table owned by the user.
+
+        Rows are copied with a single ``INSERT ... SELECT`` and keep their
+        order. The copy of a table with its own partition gets its own
+        partition too: it is filled and indexed first, and the default
+        partition is locked only to attach it at the end of the transaction
+        (see ``attach_table_partition``). The natural key index is built after
+        loading: in the new partition within the transaction, in a shared hash
+        partition concurrently after the commit. History and permissions are
+        not copied.
+
+        Returns:
+            tuple: Created table and the number of copied rows
+
+        Raises:
+            ValueError: Table not found
+        """
+        async with self._session_scope() as session:
+            source = await session.get(DataTable, table_id)
+            if source is None or source.is_deleted:
+                raise ValueError(f"Table {table_id} not found")
+
+            table = DataTable(
+                name=name,
+                description=source.description,
+                columns_schema=source.columns_schema,
+                created_by_id=user_id,
+                is_public=False,
+            )
+            session.add(table)
+            await session.flush()
+            session.add(TablePermission(
+                user_id=user_id,
+                table_id=table.id,
+                can_read=True,
+                can_write=True,
+                can_manage=True,
+            ))
+            await session.flush()
+
+            source_partition = await row_partition(session, table_id)
+            own_partition = source_partition == table_partition_name(table_id)
+            target = await create_table_partition(session, table.id) if own_partition else ROWS_TABLE
+            copied = (await session.execute(text(
+                f"INSERT INTO {target} (table_id, row_data, position) "
+                f"SELECT {int(table.id)}, row_data, position FROM {source_partition} "
+                f"WHERE table_id = {int(table_id)}"
+            ))).rowcount
+
+            key_columns = [column["name"] for column in table.columns_schema if column.get("key")]
+            if own_partition:
+                if key_columns:
+                    await session.execute(text(
+                        f"CREATE UNIQUE INDEX {natural_key_index_name(table.id, key_columns)} "
+                        f"ON {target} ({natural_key_expressions(key_columns)}) "
+                        f"WHERE table_id = {int(table.id)}"
+                    ))
+                await session.execute(text(f"ANALYZE {target}"))
+                # Партиция по умолчанию блокируется только на присоединение, до конца транзакции
+                await session.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+                await attach_table_partition(session, table.id)
+            await session.refresh(table)
+
+        if key_columns and not own_partition:
+            await _create_key_index(table.id, key_columns)
+        return table, copied
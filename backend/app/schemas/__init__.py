@@ -1,4 +1,61 @@
-from .data import TableRowCreate, TableRowResponse, TableRowUpdate, TableRowInDB
+from .data import (
+    TableRowCreate,
+    TableRowResponse,
+    TableRowUpdate,
+    TableRowInDB,
+    RowMoveRequest,
+    ViewportResponse,
+    RowIndexResponse,
+)
+from .pivot import PivotAggregate, PivotRequest, PivotResponse
+from .history import ChangeBatchResponse, RowChangeResponse, UndoResult, HistoricalRowResponse
+from .table import (
+    TableResponse,
+    AccessibleTableResponse,
+    SheetImportResult,
+    SheetImportError,
+    WorkbookImportResponse,
+    ColumnProfileResponse,
+    SchemaProposalResponse,
+    NaturalKeyUpdate,
+    ColumnReferenceUpdate,
+    UpsertImportResponse,
+    TableCopyRequest,
+    TableSnapshotCreate,
+    TableSnapshotResponse,
+    TableScanRequest,
+    TableJobResponse,
+)
 
 
-__all__ = ["TableRowCreate", "TableRowResponse", "TableRowUpdate", "TableRowInDB"]
+__all__ = [
+    "TableRowCreate",
+    "TableRowResponse",
+    "TableRowUpdate",
+    "TableRowInDB",
+    "RowMoveRequest",
+    "ViewportResponse",
+    "RowIndexResponse",
+    "PivotAggregate",
+    "PivotRequest",
+    "PivotResponse",
+    "ChangeBatchResponse",
+    "RowChangeResponse",
+    "UndoResult",
+    "HistoricalRowResponse",
+    "TableResponse",
+    "AccessibleTableResponse",
+    "SheetImportResult",
+    "SheetImportError",
+    "WorkbookImportResponse",
+    "ColumnProfileResponse",
+    "SchemaProposalResponse",
+    "NaturalKeyUpdate",
+    "ColumnReferenceUpdate",
+    "UpsertImportResponse",
+    "TableCopyRequest",
+    "TableSnapshotCreate",
+    "TableSnapshotResponse",
+    "TableScanRequest",
+    "TableJobResponse",
+]
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 
@@ -32,11 +32,29 @@ class TableRowUpdate(TableRowBase):
         return v
 
 
+class RowMoveRequest(BaseModel):
+    """Перемещение строк: строки встают подряд после after_row_id, перед before_row_id или в конец таблицы"""
+
+    row_ids: List[int] = Field(..., min_length=1, max_length=1000, description="Перемещаемые строки")
+    after_row_id: Optional[int] = Field(None, description="Строка, после которой встают перемещаемые")
+    before_row_id: Optional[int] = Field(None, description="Строка, перед которой встают перемещаемые")
+
+    @model_validator(mode="after")
+    def validate_anchor(self):
+        if self.after_row_id is not None and self.before_row_id is not None:
+            raise ValueError("Specify either after_row_id or before_row_id, not both")
+        anchor = self.after_row_id if self.after_row_id is not None else self.before_row_id
+        if anchor is not None and anchor in self.row_ids:
+            raise ValueError("Rows cannot be moved relative to themselves")
+        return self
+
+
 class TableRowInDB(TableRowBase):
     """Схема строки таблицы как она хранится в базе данных"""
 
     id: int
     table_id: int
+    position: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -45,4 +63,23 @@ class TableRowInDB(TableRowBase):
 
 
 class TableRowResponse(TableRowInDB):
-    pass
+    lookups: Optional[Dict[str, Optional[Dict[str, Any]]]] = Field(
+        None,
+        description="Значения колонок-ссылок: колонка -> колонки display найденной строки (null, если строки нет)",
+    )
+
+
+class ViewportResponse(BaseModel):
+    """Окно строк таблицы для виртуальной прокрутки"""
+
+    start: int = Field(..., description="Индекс первой строки окна в текущем порядке")
+    total: int = Field(..., description="Всего строк в таблице")
+    rows: List[TableRowResponse]
+
+
+class RowIndexResponse(BaseModel):
+    """Позиция строки в текущем порядке"""
+
+    row_id: int
+    index: int = Field(..., description="Индекс строки (с нуля)")
+    total: int
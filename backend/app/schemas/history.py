@@ -0,0 +1,48 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Dict, Any, Optional, List
+from datetime import datetime
+
+
+class ChangeBatchResponse(BaseModel):
+    """Операция в истории изменений таблицы"""
+
+    id: int
+    table_id: int
+    user_id: Optional[int] = None
+    operation: str
+    undone: bool
+    undo_of_id: Optional[int] = None
+    created_at: datetime
+    rows_changed: int = 0
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class RowChangeResponse(BaseModel):
+    """Изменение ячеек строки: значения до и после операции.
+
+    Ячейки, добавленной операцией, нет в ``before``; удалённой - нет в ``after``.
+    """
+
+    batch_id: int
+    row_id: int
+    user_id: Optional[int] = None
+    operation: str
+    created_at: datetime
+    before: Optional[Dict[str, Any]] = None
+    after: Optional[Dict[str, Any]] = None
+
+
+class UndoResult(BaseModel):
+    """Результат отмены или повтора одной операции"""
+
+    batch_id: int
+    new_batch_id: int
+    conflicts: List[int] = []
+
+
+class HistoricalRowResponse(BaseModel):
+    """Строка таблицы в состоянии на заданный момент"""
+
+    id: int
+    row_data: Dict[str, Any]
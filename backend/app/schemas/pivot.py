@@ -0,0 +1,47 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Dict, List, Literal, Optional
+
+
+class PivotAggregate(BaseModel):
+    """Агрегат сводной таблицы"""
+
+    function: Literal["sum", "count", "avg", "min", "max"]
+    column: Optional[str] = Field(None, description="Колонка; для count может быть пустой (count(*))")
+
+    @model_validator(mode="after")
+    def check_column(self):
+        if self.column is None and self.function != "count":
+            raise ValueError(f"{self.function} requires a column")
+        return self
+
+    @property
+    def label(self) -> str:
+        return f"{self.function}({self.column or '*'})"
+
+
+class PivotRequest(BaseModel):
+    """Запрос на группировку / сводную таблицу"""
+
+    group_by: List[str] = Field(default_factory=list, description="Колонки группировки")
+    aggregates: List[PivotAggregate] = Field(..., min_length=1, description="Вычисляемые агрегаты")
+    pivot_column: Optional[str] = Field(None, description="Колонка, значения которой становятся столбцами")
+    limit: int = Field(1000, ge=1, le=10000, description="Максимальное количество групп")
+
+    @model_validator(mode="after")
+    def check_columns(self):
+        if self.pivot_column is not None and self.pivot_column in self.group_by:
+            raise ValueError("pivot_column cannot be used in group_by")
+        return self
+
+
+class PivotResponse(BaseModel):
+    """Результат группировки.
+
+    Каждая строка содержит значения колонок группировки и агрегаты. Для сводной
+    таблицы ключи агрегатов имеют вид ``"<значение pivot_column>|sum(amount)"``.
+    """
+
+    group_by: List[str]
+    columns: List[str]
+    rows: List[Dict[str, Any]]
+    truncated: bool = False
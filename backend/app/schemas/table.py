@@ -0,0 +1,165 @@
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, Any, Literal, Optional, List
+from datetime import datetime
+
+
+class TableResponse(BaseModel):
+    """Таблица (шаблон) с описанием колонок"""
+
+    id: int
+    name: str
+    description: Optional[str] = None
+    columns_schema: List[Dict[str, Any]]
+    created_by_id: int
+    is_public: bool
+    version: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AccessibleTableResponse(TableResponse):
+    """Таблица, доступная пользователю, с его правами и количеством строк"""
+
+    row_count: int
+    is_owner: bool
+    can_read: bool
+    can_write: bool
+    can_manage: bool
+
+
+class SheetImportResult(BaseModel):
+    """Результат импорта одного листа книги"""
+
+    sheet_name: str
+    table: TableResponse
+    row_count: int
+    invalid_cells: int = 0
+
+
+class SheetImportError(BaseModel):
+    """Лист книги, который не удалось разобрать"""
+
+    sheet_name: str
+    error: str
+
+
+class WorkbookImportResponse(BaseModel):
+    """Результат импорта Excel-книги: по таблице на каждый непустой лист"""
+
+    tables: List[SheetImportResult]
+    errors: List[SheetImportError] = Field(default_factory=list, description="Листы, которые не удалось импортировать")
+
+
+class ColumnProfileResponse(BaseModel):
+    """Статистика колонки, по которой предложен её тип"""
+
+    name: str
+    type: str
+    required: bool
+    unique: bool = Field(..., description="Значения не повторяются в выборке")
+    null_count: int = Field(..., description="Пустых ячеек среди просмотренных строк")
+    distinct_count: int = Field(..., description="Различных значений в выборке")
+    invalid_count: int = Field(..., description="Значений выборки, не подходящих под тип")
+    options: Optional[List[Any]] = None
+    examples: List[Any] = Field(default_factory=list)
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SchemaProposalResponse(BaseModel):
+    """Предлагаемая схема таблицы для загруженного файла"""
+
+    sheet_name: Optional[str] = None
+    columns_schema: List[Dict[str, Any]] = Field(..., description="Готовая схема для создания таблицы")
+    columns: List[ColumnProfileResponse]
+    rows_scanned: int
+    rows_sampled: int
+    complete: bool = Field(..., description="False, если файл просмотрен не полностью (лимит строк или времени)")
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class NaturalKeyUpdate(BaseModel):
+    """Естественный ключ таблицы"""
+
+    columns: List[str] = Field(..., description="Колонки ключа; пустой список удаляет ключ")
+
+
+class ColumnReferenceUpdate(BaseModel):
+    """Ссылка колонки на строки другой таблицы"""
+
+    table_id: int = Field(..., ge=1, description="Таблица, в которой ищутся значения колонки")
+    column: str = Field(..., description="Колонка естественного ключа этой таблицы")
+    display: List[str] = Field(..., min_length=1, max_length=20, description="Колонки найденной строки, возвращаемые со строками")
+
+
+class UpsertImportResponse(BaseModel):
+    """Результат импорта файла в существующую таблицу по естественному ключу"""
+
+    table_id: int
+    key: List[str]
+    inserted: int = Field(..., description="Добавлено новых строк")
+    updated: int = Field(..., description="Изменено существующих строк")
+    unchanged: int = Field(..., description="Строк, совпавших с уже сохранёнными")
+    duplicates: int = Field(..., description="Строк, перекрытых более поздней строкой с тем же ключом")
+    skipped_rows: int = Field(..., description="Строк без значения ключа")
+    invalid_cells: int = Field(..., description="Значений, не подошедших под тип колонки")
+    ignored_columns: List[str] = Field(default_factory=list, description="Колонки файла, которых нет в таблице")
+
+
+class TableCopyRequest(BaseModel):
+    """Параметры копирования таблицы"""
+
+    name: Optional[str] = Field(None, min_length=1, max_length=255, description="Имя копии; по умолчанию «<имя> (копия)»")
+
+
+class TableSnapshotCreate(BaseModel):
+    """Новый снимок таблицы"""
+
+    name: str = Field(..., min_length=1, max_length=255, description="Имя снимка, уникальное в пределах таблицы")
+
+
+class TableSnapshotResponse(BaseModel):
+    """Снимок таблицы; его строки читаются обычными эндпоинтами строк с параметром snapshot_id"""
+
+    id: int
+    table_id: int
+    name: str
+    created_by_id: int
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TableScanRequest(BaseModel):
+    """Параметры проверки качества данных таблицы"""
+
+    key_columns: List[str] = Field(
+        default_factory=list, description="Колонки, по которым строки считаются дубликатами; по умолчанию - только полные совпадения"
+    )
+    fix_invalid: Optional[Literal["clear", "delete"]] = Field(
+        None, description="clear - удалить неподходящие значения и неизвестные колонки, delete - удалить невалидные строки"
+    )
+    delete_duplicates: Optional[Literal["exact", "key"]] = Field(
+        None, description="Удалить дубликаты (полные или по key_columns), оставив первую строку каждой группы"
+    )
+
+
+class TableJobResponse(BaseModel):
+    """Фоновая операция над таблицей"""
+
+    id: int
+    table_id: int
+    operation: str = Field(..., description="delete, clear, copy или scan")
+    status: str = Field(..., description="pending, running, done или failed")
+    attempts: int
+    result_table_id: Optional[int] = Field(None, description="ID созданной копии")
+    row_count: Optional[int] = Field(None, description="Удалено, скопировано или проверено строк")
+    report: Optional[Dict[str, Any]] = Field(None, description="Отчёт проверки качества данных (scan)")
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,140 @@
+"""Запуск приложения в production: gunicorn с воркерами uvicorn.
+
+    python -m backend.app.server
+
+Настройки берутся из ``app_settings.gunicorn`` (``GUNICORN__WORKERS`` и т.д.).
+Приложение импортируется в мастер-процессе до создания воркеров (``PRELOAD``),
+поэтому воркеры стартуют быстро и делят память с мастером; движки БД, пулы
+соединений и фоновые задачи создаются в lifespan уже в каждом воркере.
+
+Воркер перезапускается после ``MAX_REQUESTS`` запросов. При остановке (SIGTERM)
+или перезапуске воркеров (SIGHUP) текущие запросы дорабатывают до
+``GRACEFUL_TIMEOUT`` секунд, затем lifespan закрывает пулы соединений. Новый код
+при ``PRELOAD`` подхватывается заменой мастера: SIGUSR2, затем SIGQUIT старому.
+
+Состояние в памяти процесса не разделяется воркерами, поэтому с несколькими
+воркерами запуск завершается ошибкой, если отзывы токенов или ограничения
+частоты запросов не хранятся в Redis (или предупреждает при ``ALLOW_LOCAL_STATE``).
+
+Без gunicorn (например, под Windows) приложение запускается через uvicorn
+с настройками ``app_settings.uvicorn``.
+"""
+import os
+from typing import Any, Dict, List
+
+from loguru import logger
+
+from backend.app.core import app_settings
+
+APP = "backend.app.main:app"
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+try:
+    from uvicorn_worker import UvicornWorker as BaseUvicornWorker
+except ImportError:
+    try:
+        from uvicorn.workers import UvicornWorker as BaseUvicornWorker
+    except ImportError:
+        BaseUvicornWorker = None
+
+
+if BaseUvicornWorker is not None:
+    class UvicornWorker(BaseUvicornWorker):
+        """Воркер uvicorn: uvloop и httptools, если они установлены; ошибка запуска lifespan останавливает воркер"""
+
+        CONFIG_KWARGS = {
+            "loop": "auto",
+            "http": "auto",
+            "lifespan": "on",
+            "timeout_graceful_shutdown": app_settings.gunicorn.GRACEFUL_TIMEOUT,
+        }
+
+
+def worker_count() -> int:
+    """Количество воркеров: из настроек или по числу доступных процессу ядер"""
+    if app_settings.gunicorn.WORKERS > 0:
+        return app_settings.gunicorn.WORKERS
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def process_local_state() -> List[str]:
+    """Состояние, которое хранится в памяти процесса и у каждого воркера своё"""
+    from backend.app.auth.revocation import MemoryRevocations, revocations
+    from backend.app.core.rate_limit import MemoryLimiter, limiter
+
+    local = []
+    if isinstance(revocations, MemoryRevocations):
+        local.append("token revocations (AUTH__REVOCATION_BACKEND)")
+    if app_settings.rate_limits.enabled and isinstance(limiter, MemoryLimiter):
+        local.append("rate limits (RATE_LIMITS__BACKEND)")
+    return local
+
+
+def check_local_state(workers: int) -> None:
+    """Остановить запуск нескольких воркеров, если их состояние не общее"""
+    local = process_local_state()
+    if workers <= 1 or not local:
+        return
+    message = f"{workers} workers keep {', '.join(local)} in process memory, each worker sees only its own"
+    if not app_settings.gunicorn.ALLOW_LOCAL_STATE:
+        logger.error(f"{message}: use the redis backend or set GUNICORN__ALLOW_LOCAL_STATE=true")
+        raise SystemExit(1)
+    logger.warning(message)
+
+
+def gunicorn_options() -> Dict[str, Any]:
+    config = app_settings.gunicorn
+    return {
+        "bind": f"{config.APP_HOST}:{config.APP_PORT}",
+        "workers": worker_count(),
+        "worker_class": "backend.app.server.UvicornWorker",
+        "timeout": config.TIMEOUT,
+        "graceful_timeout": config.GRACEFUL_TIMEOUT,
+        "keepalive": config.KEEPALIVE,
+        "max_requests": config.MAX_REQUESTS,
+        "max_requests_jitter": config.MAX_REQUESTS_JITTER,
+        "preload_app": config.PRELOAD,
+    }
+
+
+if BaseApplication is not None:
+    class Application(BaseApplication):
+        """Приложение gunicorn с настройками из ``app_settings`` вместо командной строки"""
+
+        def __init__(self, options: Dict[str, Any]):
+            self.options = options
+            super().__init__()
+
+        def load_config(self) -> None:
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from backend.app.main import app
+            return app
+
+
+def main() -> None:
+    if BaseApplication is None or BaseUvicornWorker is None:
+        import uvicorn
+
+        config = app_settings.uvicorn
+        logger.warning("Package gunicorn is not installed, starting a single uvicorn process")
+        uvicorn.run(APP, host=config.APP_HOST, port=config.APP_PORT, lifespan="on")
+        return
+
+    options = gunicorn_options()
+    check_local_state(options["workers"])
+    logger.info(f"Starting gunicorn on {options['bind']} with {options['workers']} workers")
+    Application(options).run()
+
+
+if __name__ == "__main__":
+    main()
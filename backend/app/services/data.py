@@ -1,8 +1,75 @@
-from typing import Optional, Literal, List
+import asyncio
+import math
+from datetime import date
+from decimal import Decimal
+from typing import Optional, Literal, List, Dict, Any, Tuple
+from loguru import logger
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.app.schemas import TableRowResponse
-from backend.app.repository import DataRepository, TableRepository
+from backend.app.core import app_settings
+from backend.app.custom_exceptions import AccessDeniedException, NotFoundException, ValidationException
+from backend.app.models import DataTable, TableSnapshot
+from backend.app.schemas import (
+    TableRowResponse,
+    RowMoveRequest,
+    PivotRequest,
+    PivotResponse,
+    ViewportResponse,
+    RowIndexResponse,
+)
+from backend.app.repository import DataRepository, SnapshotRepository, TableRepository
+from backend.app.repository.data import RowOrder
+from backend.app.utils.cache import LRUCache, SingleFlight
+from backend.app.utils.validators import (
+    get_reference_columns,
+    get_schema_columns,
+    validate_row_data,
+    NUMERIC_TYPES,
+)
+
+# Максимальное количество различных значений pivot_column (столбцов сводной таблицы)
+MAX_PIVOT_VALUES = 200
+
+# Результаты сводных таблиц; ключ содержит версию таблицы, поэтому после
+# любого изменения строк старые записи просто перестают запрашиваться
+pivot_cache = LRUCache(maxsize=512)
+
+# Минимальное расстояние между опорными строками окна прокрутки
+MIN_CHECKPOINT_INTERVAL = 256
+
+# Опорные ключи сортировки для окон прокрутки: ключ каждой K-й строки в заданном
+# порядке (K ~ sqrt(n)). Переход к строке N - поиск по индексу от ближайшей
+# опорной строки и пропуск не более K строк вместо OFFSET N. Ключи зависят только
+# от набора строк, их ручного порядка и значений колонки сортировки, поэтому кэш
+# привязан к их версиям, а не к версии таблицы: правки других колонок его не сбрасывают.
+viewport_cache = LRUCache(maxsize=256)
+
+# Одинаковые одновременные чтения (например, вся команда открывает одну таблицу)
+# выполняются одним запросом к базе; ключи содержат вид чтения и версию таблицы
+read_flights = SingleFlight()
+
+# Строки целевых таблиц колонок-ссылок (row_data или None, если строки нет).
+# Ключ - (ID целевой таблицы, её версия, колонка ключа, значение): правка целевой
+# таблицы меняет версию, и старые значения больше не читаются
+lookup_cache = LRUCache(maxsize=100_000)
+
+
+def _lookup_value(value: Any) -> Optional[str]:
+    """Значение ячейки-ссылки в том виде, в каком его возвращает ``row_data ->> 'column'``"""
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _to_json_value(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
 
 
 class DataService:
@@ -11,6 +78,76 @@ class DataService:
         self.db = db
         self.data_repo = DataRepository()
         self.table_repo = TableRepository()
+        self.snapshot_repo = SnapshotRepository()
+
+    @staticmethod
+    def _validate_row_data_with_schema(
+            columns_schema: List[Dict[str, Any]],
+            row_data: Dict[str, Any],
+            partial: bool = False,
+    ) -> List[str]:
+        return validate_row_data(columns_schema, row_data, partial=partial)
+
+    async def _resolve_references(
+            self,
+            table: DataTable,
+            rows: List[TableRowResponse],
+            user_id: int,
+    ) -> List[TableRowResponse]:
+        """Добавить к строкам значения колонок-ссылок.
+
+        Значения всех строк страницы ищутся одним запросом на каждую пару
+        (целевая таблица, колонка ключа) по уникальному индексу ключа, а не по
+        ячейке. Ссылки на недоступные пользователю таблицы и таблицы, ключ
+        которых изменился, не разрешаются. Строки не изменяются: они могут быть
+        общими для одновременных запросов (см. ``read_flights``).
+        """
+        references = get_reference_columns(table.columns_schema)
+        if not references or not rows:
+            return rows
+
+        targets = await self.table_repo.get_tables_with_access(
+            list({reference["table_id"] for reference in references.values()}), user_id
+        )
+        lookups: Dict[str, Tuple[tuple, List[str]]] = {}
+        values: Dict[tuple, set] = {}
+        for column, reference in references.items():
+            target = targets.get(reference["table_id"])
+            if target is None:
+                continue
+            if [item["name"] for item in target.columns_schema if item.get("key")] != [reference["column"]]:
+                continue
+            prefix = (target.id, target.version, reference["column"])
+            lookups[column] = (prefix, reference["display"])
+            values.setdefault(prefix, set()).update(
+                value for value in (_lookup_value(row.row_data.get(column)) for row in rows) if value is not None
+            )
+
+        for prefix, keys in values.items():
+            missing = sorted(key for key in keys if (*prefix, key) not in lookup_cache)
+            if not missing:
+                continue
+            target_id, _, key_column = prefix
+            found = await read_flights.do(
+                ("lookup", *prefix, tuple(missing)),
+                lambda: self.data_repo.lookup_rows(target_id, key_column, missing),
+            )
+            for key in missing:
+                lookup_cache.set((*prefix, key), found.get(key))
+
+        if not lookups:
+            return rows
+        resolved = []
+        for row in rows:
+            row_lookups = {}
+            for column, (prefix, display) in lookups.items():
+                key = _lookup_value(row.row_data.get(column))
+                target_row = lookup_cache.get((*prefix, key)) if key is not None else None
+                row_lookups[column] = (
+                    {name: target_row.get(name) for name in display} if target_row is not None else None
+                )
+            resolved.append(row.model_copy(update={"lookups": row_lookups}))
+        return resolved
 
     async def get_table_rows(
         self,
@@ -19,9 +156,10 @@ class DataService:
         skip: int = 0,
         limit: int = 100,
         sort_by: Optional[str] = None,
-        sort_order: Literal["asc", "desc"] = "asc"
+        sort_order: Literal["asc", "desc"] = "asc",
+        snapshot_id: Optional[int] = None,
     ) -> List[TableRowResponse]:
-        """Получить строки таблицы"""
+        """Получить строки таблицы (или её снимка ``snapshot_id``)"""
 
         table = await self.table_repo.get_table_with_access(
             table_id=table_id,
@@ -31,25 +169,69 @@ class DataService:
         if not table:
             raise AccessDeniedException("No access to this table")
 
-        rows = await self.data_repo.get_rows_by_table_id(
-            table_id, skip, limit, sort_by, sort_order
+        columns = get_schema_columns(table.columns_schema)
+        if sort_by is not None and sort_by not in columns:
+            raise ValidationException(f"Unknown column '{sort_by}'")
+
+        snapshot = await self._get_snapshot(table_id, snapshot_id)
+
+        async def load_rows() -> List[TableRowResponse]:
+            if snapshot is not None:
+                rows = await self.snapshot_repo.get_rows(
+                    snapshot, skip, limit, sort_by, sort_order, columns.get(sort_by, "string")
+                )
+            else:
+                rows = await self.data_repo.get_rows_by_table_id(
+                    table_id, skip, limit, sort_by, sort_order, columns.get(sort_by, "string")
+                )
+            return [TableRowResponse.model_validate(row) for row in rows]
+
+        rows = await read_flights.do(
+            ("rows", table.id, table.version, snapshot_id, skip, limit, sort_by, sort_order), load_rows
         )
+        return await self._resolve_references(table, rows, user_id)
+
+    async def _get_snapshot(self, table_id: int, snapshot_id: Optional[int]) -> Optional[TableSnapshot]:
+        if snapshot_id is None:
+            return None
+        snapshot = await self.snapshot_repo.get_snapshot(table_id, snapshot_id)
+        if not snapshot:
+            raise NotFoundException("Snapshot not found")
+        return snapshot
 
-        return [TableRowResponse(
-            "id"=row.id,
-            "table_id"=row.table_id,
-            "row_data"=row.row_data)
-        for row in rows]
+    async def get_table_row(
+            self,
+            table_id: int,
+            row_id: int,
+            user_id: int,
+            snapshot_id: Optional[int] = None,
+    ) -> TableRowResponse:
+        """Получить строку таблицы (или её снимка ``snapshot_id``) по ID"""
+        table = await self.table_repo.get_table_with_access(table_id, user_id)
+        if not table:
+            raise AccessDeniedException("No access to this table")
 
-        pass
+        snapshot = await self._get_snapshot(table_id, snapshot_id)
+        if snapshot is not None:
+            row = await self.snapshot_repo.get_row(snapshot, row_id)
+        else:
+            row = await self.data_repo.get_row(table_id, row_id)
+        if not row:
+            raise NotFoundException("Row not found")
+        return (await self._resolve_references(table, [TableRowResponse.model_validate(row)], user_id))[0]
 
     async def create_table_row(
             self,
             table_id: int,
             user_id: int,
-            row_data: Dict[str, Any]
+            row_data: Dict[str, Any],
+            after_row_id: Optional[int] = None,
+            before_row_id: Optional[int] = None,
     ) -> TableRowResponse:
-        """Создать новую строку в таблице"""
+        """Создать новую строку в таблице (в конце или рядом с указанной строкой)"""
+        if after_row_id is not None and before_row_id is not None:
+            raise ValidationException("Specify either after_row_id or before_row_id, not both")
+
         # Проверяем доступ на запись
         table = await self.table_repo.get_table_with_write_access(table_id, user_id)
         if not table:
@@ -61,15 +243,15 @@ class DataService:
             raise ValidationException("; ".join(validation_errors))
 
         # Создаем строку
-        row = await self.data_repo.create_row(table_id, row_data)
+        try:
+            row = await self.data_repo.create_row(table_id, row_data, user_id, after_row_id, before_row_id)
+        except IntegrityError:
+            raise ValidationException("Row with the same key already exists")
+        except ValueError as e:
+            raise NotFoundException(str(e))
 
         logger.info(f"User {user_id} created row {row.id} in table {table_id}")
-        return {
-            "id": row.id,
-            "table_id": row.table_id,
-            "row_data": row.row_data,
-            "created_at": row.created_at
-        }
+        return TableRowResponse.model_validate(row)
 
     async def update_table_row(
             self,
@@ -85,22 +267,20 @@ class DataService:
             raise AccessDeniedException("No write access to this table")
 
         # Валидация данных
-        validation_errors = self._validate_row_data_with_schema(table.columns_schema, row_data)
+        validation_errors = self._validate_row_data_with_schema(table.columns_schema, row_data, partial=True)
         if validation_errors:
             raise ValidationException("; ".join(validation_errors))
 
         # Обновляем строку
-        row = await self.data_repo.update_row(table_id, row_id, row_data)
+        try:
+            row = await self.data_repo.update_row(table_id, row_id, row_data, user_id)
+        except IntegrityError:
+            raise ValidationException("Row with the same key already exists")
         if not row:
             raise NotFoundException("Row not found")
 
         logger.info(f"User {user_id} updated row {row_id} in table {table_id}")
-        return {
-            "id": row.id,
-            "table_id": row.table_id,
-            "row_data": row.row_data,
-            "updated_at": row.updated_at
-        }
+        return TableRowResponse.model_validate(row)
 
     async def delete_table_row(
             self,
@@ -115,13 +295,211 @@ class DataService:
             raise AccessDeniedException("No write access to this table")
 
         # Удаляем строку
-        success = await self.data_repo.delete_row(table_id, row_id)
+        success = await self.data_repo.delete_row(table_id, row_id, user_id)
         if not success:
             raise NotFoundException("Row not found")
 
         logger.info(f"User {user_id} deleted row {row_id} from table {table_id}")
         return True
 
+    async def move_table_rows(self, table_id: int, user_id: int, move: RowMoveRequest) -> List[TableRowResponse]:
+        """Переместить строки (перетаскивание): меняются только ключи порядка перемещаемых строк"""
+        table = await self.table_repo.get_table_with_write_access(table_id, user_id)
+        if not table:
+            raise AccessDeniedException("No write access to this table")
+
+        try:
+            rows = await self.data_repo.move_rows(table_id, move.row_ids, move.after_row_id, move.before_row_id)
+        except ValueError as e:
+            raise NotFoundException(str(e))
+
+        logger.info(f"User {user_id} moved {len(rows)} rows in table {table_id}")
+        return [TableRowResponse.model_validate(row) for row in rows]
+
+    async def _get_viewport_index(
+            self,
+            table: DataTable,
+            sort_by: Optional[str],
+            sort_order: str,
+    ) -> Tuple[RowOrder, int, int, List[tuple]]:
+        columns = get_schema_columns(table.columns_schema)
+        if sort_by is not None and sort_by not in columns:
+            raise ValidationException(f"Unknown column '{sort_by}'")
+        sort_type = columns.get(sort_by, "string")
+        order = RowOrder.create(sort_by, sort_order, sort_type)
+
+        async def load_index() -> Tuple[int, int, List[tuple]]:
+            total = await self.data_repo.count_rows(table.id)
+            interval = max(MIN_CHECKPOINT_INTERVAL, math.isqrt(total))
+            checkpoints = await self.data_repo.get_sort_checkpoints(table.id, order, interval)
+            return total, interval, checkpoints
+
+        column_version = table.column_versions.get(sort_by) if sort_by is not None else None
+        cache_key = (table.id, table.order_version, column_version, sort_by, sort_order, sort_type)
+        cached = viewport_cache.get(cache_key)
+        if cached is None:
+            cached = await read_flights.do(("viewport", *cache_key), load_index)
+            viewport_cache.set(cache_key, cached)
+        return (order, *cached)
+
+    async def get_viewport(
+            self,
+            table_id: int,
+            user_id: int,
+            start: int = 0,
+            count: int = 100,
+            sort_by: Optional[str] = None,
+            sort_order: Literal["asc", "desc"] = "asc",
+    ) -> ViewportResponse:
+        """Получить строки с ``start`` по ``start + count`` в текущем порядке"""
+        table = await self.table_repo.get_table_with_access(table_id, user_id)
+        if not table:
+            raise AccessDeniedException("No access to this table")
+
+        order, total, interval, checkpoints = await self._get_viewport_index(table, sort_by, sort_order)
+        rows = []
+        if start < total:
+            checkpoint = start // interval
+            anchor = checkpoints[checkpoint - 1] if checkpoint else None
+            rows = await self.data_repo.get_rows_after(
+                table_id, order, anchor, start - checkpoint * interval, count
+            )
+        return ViewportResponse(
+            start=start,
+            total=total,
+            rows=await self._resolve_references(
+                table, [TableRowResponse.model_validate(row) for row in rows], user_id
+            ),
+        )
+
+    async def get_row_index(
+            self,
+            table_id: int,
+            row_id: int,
+            user_id: int,
+            sort_by: Optional[str] = None,
+            sort_order: Literal["asc", "desc"] = "asc",
+    ) -> RowIndexResponse:
+        """Найти индекс строки в текущем порядке"""
+        table = await self.table_repo.get_table_with_access(table_id, user_id)
+        if not table:
+            raise AccessDeniedException("No access to this table")
+
+        order, total, interval, checkpoints = await self._get_viewport_index(table, sort_by, sort_order)
+        key = await self.data_repo.get_sort_key(table_id, row_id, order)
+        if key is None:
+            raise NotFoundException("Row not found")
+
+        # Сначала - сколько опорных строк предшествует искомой, затем подсчёт
+        # не более чем ``interval`` строк от ближайшей из них
+        checkpoint = 0
+        if checkpoints:
+            checkpoint = await self.data_repo.count_rows_before(
+                table_id, order, key, row_ids=[checkpoint_key[-1] for checkpoint_key in checkpoints]
+            )
+        anchor = checkpoints[checkpoint - 1] if checkpoint else None
+        index = checkpoint * interval + await self.data_repo.count_rows_before(table_id, order, key, after=anchor)
+        return RowIndexResponse(row_id=row_id, index=index, total=total)
+
+    async def get_pivot(
+            self,
+            table_id: int,
+            user_id: int,
+            pivot: PivotRequest,
+    ) -> PivotResponse:
+        """Сгруппировать строки таблицы и посчитать агрегаты (сводная таблица)"""
+        table = await self.table_repo.get_table_with_access(table_id, user_id)
+        if not table:
+            raise AccessDeniedException("No access to this table")
+
+        cache_key = (table.id, table.version, pivot.model_dump_json())
+        cached = pivot_cache.get(cache_key)
+        if cached is None:
+            cached = await read_flights.do(("pivot", *cache_key), lambda: self._build_pivot(table, pivot))
+            pivot_cache.set(cache_key, cached)
+        return cached
+
+    async def _build_pivot(self, table: DataTable, pivot: PivotRequest) -> PivotResponse:
+        columns = get_schema_columns(table.columns_schema)
+        group_columns = list(pivot.group_by)
+        if pivot.pivot_column is not None:
+            group_columns.append(pivot.pivot_column)
+
+        errors = [f"Unknown column '{column}'" for column in group_columns if column not in columns]
+        for aggregate in pivot.aggregates:
+            if aggregate.column is None:
+                continue
+            if aggregate.column not in columns:
+                errors.append(f"Unknown column '{aggregate.column}'")
+            elif aggregate.function in ("sum", "avg") and columns[aggregate.column] not in NUMERIC_TYPES:
+                errors.append(f"{aggregate.function} requires a numeric column, got '{aggregate.column}'")
+        if errors:
+            raise ValidationException("; ".join(errors))
+
+        # Для сводной таблицы одна группа разворачивается в несколько строк результата
+        sql_limit = pivot.limit + 1
+        if pivot.pivot_column is not None:
+            sql_limit = (pivot.limit + 1) * MAX_PIVOT_VALUES
+
+        result = await self.data_repo.aggregate_rows(
+            table.id,
+            group_by=[(column, columns[column]) for column in group_columns],
+            aggregates=[
+                (aggregate.function, aggregate.column, columns.get(aggregate.column))
+                for aggregate in pivot.aggregates
+            ],
+            limit=sql_limit,
+        )
+
+        labels = [aggregate.label for aggregate in pivot.aggregates]
+        group_size = len(pivot.group_by)
+        rows: Dict[tuple, Dict[str, Any]] = {}
+        pivot_values: Dict[Any, None] = {}
+
+        for record in result:
+            keys = tuple(_to_json_value(value) for value in record[:group_size])
+            values = [_to_json_value(value) for value in record[len(group_columns):]]
+            row = rows.setdefault(keys, dict(zip(pivot.group_by, keys)))
+            if pivot.pivot_column is None:
+                row.update(zip(labels, values))
+                continue
+
+            pivot_value = _to_json_value(record[group_size])
+            pivot_values.setdefault(pivot_value, None)
+            if len(pivot_values) > MAX_PIVOT_VALUES:
+                raise ValidationException(
+                    f"Column '{pivot.pivot_column}' has more than {MAX_PIVOT_VALUES} distinct values"
+                )
+            row.update((f"{pivot_value}|{label}", value) for label, value in zip(labels, values))
+
+        if pivot.pivot_column is None:
+            value_columns = labels
+        else:
+            value_columns = [f"{value}|{label}" for value in pivot_values for label in labels]
+
+        response_rows = list(rows.values())
+        return PivotResponse(
+            group_by=pivot.group_by,
+            columns=[*pivot.group_by, *value_columns],
+            rows=response_rows[:pivot.limit],
+            truncated=len(response_rows) > pivot.limit or len(result) >= sql_limit,
+        )
+
 
+async def rebalance_row_order() -> None:
+    """Перебалансировать ключи порядка строк в помеченных таблицах"""
+    data_repo = DataRepository()
+    for table_id in await data_repo.get_tables_to_rebalance():
+        count = await data_repo.rebalance_positions(table_id)
+        if count:
+            logger.info(f"Rebalanced positions of {count} rows in table {table_id}")
 
 
+async def run_row_order_rebalancing() -> None:
+    """Фоновая задача периодической перебалансировки порядка строк"""
+    while True:
+        await asyncio.sleep(app_settings.ordering.rebalance_interval_seconds)
+        try:
+            await rebalance_row_order()
+        except Exception as e:
+            logger.error(f"Row order rebalancing failed: {e}")
@@ -0,0 +1,194 @@
+"""Разбор Excel-файлов.
+
+Функции разбора выполняются в пуле процессов: чтение XLSX - чисто CPU-задача,
+поэтому листы книги разбираются параллельно на всех ядрах, а загрузка в базу
+остаётся асинхронной в основном процессе. Чтобы не передавать между процессами
+миллионы строк, воркер пишет строки листа во временный JSON Lines файл.
+"""
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from backend.app.core import app_settings
+from backend.app.services.schema_inference import (
+    InferenceOptions,
+    SchemaSampler,
+    coerce_value,
+    column_names,
+    iter_sheet_rows,
+    load_workbook,
+    open_rows,
+)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Пул процессов для разбора файлов, создаётся при первом обращении"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=app_settings.imports.max_workers or os.cpu_count())
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+
+
+@dataclass
+class ParsedSheet:
+    """Результат разбора листа: схема колонок и путь к файлу со строками"""
+
+    sheet_name: str
+    columns_schema: List[Dict[str, Any]]
+    rows_path: str
+    row_count: int = 0
+    invalid_cells: int = 0
+    # Строки без значения в колонке естественного ключа (только для импорта в таблицу)
+    skipped_rows: int = 0
+    # Колонки файла, которых нет в схеме таблицы
+    ignored_columns: List[str] = field(default_factory=list)
+
+
+def list_sheets(path: str) -> List[str]:
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def parse_sheet(path: str, sheet_name: str, options: InferenceOptions, output_dir: str) -> ParsedSheet:
+    """Разбирает лист книги (выполняется в процессе-воркере).
+
+    Первый проход читает лист, сохраняет значения во временный файл и набирает
+    равномерную выборку строк, по которой определяются типы колонок. Второй проход
+    приводит значения к этим типам; значения, которые привести не удалось,
+    сохраняются как пустые ячейки и учитываются в ``invalid_cells``. Признак
+    ``required`` и список ``options`` проверяются по всем строкам листа.
+    """
+    fd, rows_path = tempfile.mkstemp(suffix=".jsonl", dir=output_dir)
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = iter_sheet_rows(workbook[sheet_name])
+        header = next(rows, None)
+        if header is None:
+            os.close(fd)
+            return ParsedSheet(sheet_name=sheet_name, columns_schema=[], rows_path=rows_path)
+
+        sampler = SchemaSampler(column_names(header), options)
+        raw_fd, raw_path = tempfile.mkstemp(suffix=".raw.jsonl", dir=output_dir)
+        with os.fdopen(raw_fd, "w", encoding="utf-8") as raw:
+            for row in rows:
+                raw.write(json.dumps(sampler.add(row), ensure_ascii=False))
+                raw.write("\n")
+    finally:
+        workbook.close()
+
+    columns = sampler.profile(complete=True, sheet_name=sheet_name).columns
+    names = [column.name for column in columns]
+    types = [column.type for column in columns]
+    null_counts = [0] * len(columns)
+    allowed = [set(column.options) if column.options is not None else None for column in columns]
+
+    result = ParsedSheet(sheet_name=sheet_name, columns_schema=[], rows_path=rows_path)
+    with open(raw_path, encoding="utf-8") as raw, os.fdopen(fd, "w", encoding="utf-8") as output:
+        for line in raw:
+            values = json.loads(line)
+            row_data = {}
+            for index, name in enumerate(names):
+                value = values[index] if index < len(values) else None
+                try:
+                    value = coerce_value(value, types[index])
+                except (TypeError, ValueError):
+                    result.invalid_cells += 1
+                    value = None
+                if value is None:
+                    null_counts[index] += 1
+                    continue
+                if allowed[index] is not None and value not in allowed[index]:
+                    allowed[index] = None
+                row_data[name] = value
+            output.write(json.dumps(row_data, ensure_ascii=False))
+            output.write("\n")
+            result.row_count += 1
+    os.remove(raw_path)
+
+    for index, column in enumerate(columns):
+        column.required = result.row_count > 0 and null_counts[index] == 0
+        if allowed[index] is None:
+            column.options = None
+    result.columns_schema = [column.schema() for column in columns]
+    return result
+
+
+def parse_rows_for_table(
+        path: str,
+        sheet_name: Optional[str],
+        columns_schema: List[Dict[str, Any]],
+        output_dir: str,
+) -> ParsedSheet:
+    """Разбирает CSV-файл или лист книги по схеме существующей таблицы (выполняется в процессе-воркере).
+
+    Колонки файла сопоставляются с колонками схемы по имени, значения
+    приводятся к их типам; значения, не подходящие под тип или список
+    ``options``, сохраняются как пустые ячейки. Строки без значения в какой-либо
+    колонке естественного ключа пропускаются.
+
+    Raises:
+        ValueError: В файле нет колонки естественного ключа
+    """
+    types = {column["name"]: column.get("type", "string") for column in columns_schema}
+    key_columns = [column["name"] for column in columns_schema if column.get("key")]
+    fd, rows_path = tempfile.mkstemp(suffix=".jsonl", dir=output_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as output, open_rows(path, sheet_name) as (rows, sheet_name):
+        names = column_names(next(rows, ()))
+        missing = [name for name in key_columns if name not in names]
+        if missing:
+            raise ValueError(f"File has no key columns: {', '.join(missing)}")
+        result = ParsedSheet(
+            sheet_name=sheet_name or os.path.basename(path),
+            columns_schema=[column for column in columns_schema if column["name"] in names],
+            rows_path=rows_path,
+            ignored_columns=[name for name in names if name not in types],
+        )
+        options = {column["name"]: set(column["options"]) for column in columns_schema if column.get("options")}
+        mapped = [(index, name, types[name], options.get(name)) for index, name in enumerate(names) if name in types]
+        for row in rows:
+            row_data = {}
+            for index, name, column_type, allowed in mapped:
+                try:
+                    value = coerce_value(row[index] if index < len(row) else None, column_type)
+                    if allowed is not None and value is not None and value not in allowed:
+                        raise ValueError(value)
+                except (TypeError, ValueError):
+                    result.invalid_cells += 1
+                    value = None
+                if value is not None:
+                    row_data[name] = value
+            if any(name not in row_data for name in key_columns):
+                result.skipped_rows += 1
+                continue
+            output.write(json.dumps(row_data, ensure_ascii=False))
+            output.write("\n")
+            result.row_count += 1
+    return result
+
+
+def read_rows(rows_path: str, batch_size: int) -> Iterator[List[str]]:
+    """Читает строки листа пачками в виде готовых JSON-строк"""
+    batch: List[str] = []
+    with open(rows_path, encoding="utf-8") as file:
+        for line in file:
+            batch.append(line.rstrip("\n"))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import List
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core import app_settings
+from backend.app.custom_exceptions import AccessDeniedException, ValidationException
+from backend.app.repository import HistoryRepository, TableRepository
+from backend.app.schemas import ChangeBatchResponse, RowChangeResponse, UndoResult, HistoricalRowResponse
+
+
+class HistoryService:
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.history_repo = HistoryRepository()
+        self.table_repo = TableRepository()
+
+    async def _check_read_access(self, table_id: int, user_id: int) -> None:
+        if not await self.table_repo.get_table_with_access(table_id, user_id):
+            raise AccessDeniedException("No access to this table")
+
+    async def _check_write_access(self, table_id: int, user_id: int) -> None:
+        if not await self.table_repo.get_table_with_write_access(table_id, user_id):
+            raise AccessDeniedException("No write access to this table")
+
+    async def undo(self, table_id: int, user_id: int, count: int = 1) -> List[UndoResult]:
+        """Отменить последние операции пользователя"""
+        await self._check_write_access(table_id, user_id)
+        results = await self.history_repo.undo(table_id, user_id, min(count, app_settings.history.max_undo))
+        logger.info(f"User {user_id} undid {len(results)} operations in table {table_id}")
+        return [UndoResult(**result) for result in results]
+
+    async def redo(self, table_id: int, user_id: int, count: int = 1) -> List[UndoResult]:
+        """Повторить последние отменённые операции пользователя"""
+        await self._check_write_access(table_id, user_id)
+        results = await self.history_repo.redo(table_id, user_id, min(count, app_settings.history.max_undo))
+        logger.info(f"User {user_id} redid {len(results)} operations in table {table_id}")
+        return [UndoResult(**result) for result in results]
+
+    async def get_history(self, table_id: int, user_id: int, skip: int = 0, limit: int = 50) -> List[ChangeBatchResponse]:
+        """Получить историю операций таблицы"""
+        await self._check_read_access(table_id, user_id)
+        batches = await self.history_repo.get_batches(table_id, skip, limit)
+        return [
+            ChangeBatchResponse.model_validate(batch).model_copy(update={"rows_changed": count})
+            for batch, count in batches
+        ]
+
+    async def get_row_history(self, table_id: int, row_id: int, user_id: int, limit: int = 100) -> List[RowChangeResponse]:
+        """Кто и когда менял ячейки строки"""
+        await self._check_read_access(table_id, user_id)
+        changes = await self.history_repo.get_row_history(table_id, row_id, limit)
+        return [
+            RowChangeResponse(
+                batch_id=batch.id,
+                row_id=change.row_id,
+                user_id=batch.user_id,
+                operation=batch.operation,
+                created_at=batch.created_at,
+                before=change.before,
+                after=change.after,
+            )
+            for change, batch in changes
+        ]
+
+    async def get_rows_at(
+            self,
+            table_id: int,
+            user_id: int,
+            at: datetime,
+            skip: int = 0,
+            limit: int = 100,
+    ) -> List[HistoricalRowResponse]:
+        """Получить строки таблицы в состоянии на заданный момент времени"""
+        await self._check_read_access(table_id, user_id)
+        if at.tzinfo is None:
+            at = at.replace(tzinfo=timezone.utc)
+        history_start = datetime.now(timezone.utc) - timedelta(days=app_settings.history.retention_days)
+        if at < history_start:
+            raise ValidationException(
+                f"History is kept for {app_settings.history.retention_days} days only"
+            )
+        rows = await self.history_repo.get_rows_at(table_id, at, skip, limit)
+        return [HistoricalRowResponse(id=row_id, row_data=row_data) for row_id, row_data in rows]
+
+
+async def compact_history() -> None:
+    """Сжать и очистить журнал изменений всех таблиц"""
+    config = app_settings.history
+    result = await HistoryRepository().compact(
+        compact_after=timedelta(days=config.compact_after_days),
+        retention=timedelta(days=config.retention_days),
+    )
+    if result["deleted"] or result["compacted"]:
+        logger.info(f"History compaction: {result['deleted']} batches deleted, {result['compacted']} compacted")
+
+
+async def run_history_compaction() -> None:
+    """Фоновая задача периодического сжатия истории"""
+    while True:
+        await asyncio.sleep(app_settings.history.compaction_interval_seconds)
+        try:
+            await compact_history()
+        except Exception as e:
+            logger.error(f"History compaction failed: {e}")
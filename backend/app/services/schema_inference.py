@@ -0,0 +1,415 @@
+"""Определение схемы колонок по содержимому файла.
+
+Файл читается потоково, из строк набирается равномерная выборка фиксированного
+размера (reservoir sampling), и типы колонок определяются только по ней - стоимость
+разбора значений не зависит от размера файла. Сам просмотр ограничен количеством
+строк и временем, поэтому ответ для файла любого размера приходит за ограниченное
+время; по полному просмотру считаются только пропуски в колонках.
+"""
+import codecs
+import csv
+import io
+import random
+import re
+import time as time_module
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+BOOLEAN_VALUES = {
+    "true": True, "false": False,
+    "yes": True, "no": False,
+    "да": True, "нет": False,
+}
+DATE_FORMATS = ("%d.%m.%Y", "%d/%m/%Y", "%Y/%m/%d", "%d.%m.%y")
+CSV_DELIMITERS = ",;\t|"
+CSV_ENCODINGS = ("utf-8-sig", "cp1251")
+
+_INTEGER_RE = re.compile(r"^[+-]?(0|[1-9]\d*)$")
+# Значения с ведущими нулями (коды, индексы) остаются текстом
+_NUMBER_RE = re.compile(r"^[+-]?((0|[1-9]\d*)(\.\d*)?|\.\d+)([eE][+-]?\d+)?$")
+_COMMA_NUMBER_RE = re.compile(r"^[+-]?(0|[1-9]\d*),\d+$")
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?$")
+
+
+@dataclass
+class InferenceOptions:
+    sample_rows: int = 1000
+    max_scan_rows: int = 1_000_000
+    time_budget_seconds: float = 10.0
+    # Текстовая колонка считается перечислением, если в выборке не больше
+    # ``enum_max_values`` различных значений и каждое встречается в среднем
+    # хотя бы ``enum_min_repeats`` раз
+    enum_max_values: int = 20
+    enum_min_repeats: int = 3
+    # Доля значений, которые могут не подойти под тип колонки
+    type_tolerance: float = 0.01
+
+
+@dataclass
+class ColumnProfile:
+    """Статистика колонки, по которой предложен её тип"""
+
+    name: str
+    type: str = "string"
+    required: bool = False
+    unique: bool = False
+    null_count: int = 0
+    distinct_count: int = 0
+    invalid_count: int = 0
+    options: Optional[List[Any]] = None
+    examples: List[Any] = field(default_factory=list)
+
+    def schema(self) -> Dict[str, Any]:
+        """Элемент ``DataTable.columns_schema`` для колонки"""
+        column = {"name": self.name, "type": self.type, "required": self.required}
+        if self.options is not None:
+            column["options"] = self.options
+        return column
+
+
+@dataclass
+class SchemaProposal:
+    """Предлагаемая схема таблицы"""
+
+    columns: List[ColumnProfile]
+    rows_scanned: int
+    rows_sampled: int
+    # False, если просмотр остановлен по лимиту строк или времени
+    complete: bool
+    sheet_name: Optional[str] = None
+
+    @property
+    def columns_schema(self) -> List[Dict[str, Any]]:
+        return [column.schema() for column in self.columns]
+
+
+def parse_boolean(value: str) -> Optional[bool]:
+    return BOOLEAN_VALUES.get(value.lower())
+
+
+def parse_number(value: str) -> Optional[float]:
+    if _NUMBER_RE.match(value):
+        return float(value)
+    if _COMMA_NUMBER_RE.match(value):
+        return float(value.replace(",", "."))
+    return None
+
+
+def parse_date(value: str) -> Optional[date]:
+    if _ISO_DATE_RE.match(value):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    if len(value) > 10 or not value[:1].isdigit():
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_value(value: Any) -> Any:
+    """Приводит значение ячейки к JSON-совместимому виду; пустые строки становятся None"""
+    if isinstance(value, datetime):
+        if value.time() == time(0):
+            return value.date().isoformat()
+        return value.isoformat()
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def detect_type(value: Any) -> str:
+    """Самый узкий тип, к которому приводится непустое значение"""
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "integer" if value.is_integer() else "number"
+    if isinstance(value, (date, datetime)):
+        return "date"
+    if not isinstance(value, str):
+        return "string"
+    if parse_boolean(value) is not None:
+        return "boolean"
+    if _INTEGER_RE.match(value):
+        return "integer"
+    if parse_number(value) is not None:
+        return "number"
+    if parse_date(value) is not None:
+        return "date"
+    return "string"
+
+
+def coerce_value(value: Any, column_type: str) -> Any:
+    """Приводит значение к типу колонки.
+
+    Raises:
+        ValueError: Значение нельзя привести к типу колонки
+    """
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == "":
+        return None
+    if column_type == "string":
+        return str(normalize_value(value))
+    if column_type == "boolean":
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and parse_boolean(value) is not None:
+            return parse_boolean(value)
+        raise ValueError(value)
+    if isinstance(value, bool) and column_type in ("integer", "number"):
+        raise ValueError(value)
+    if column_type == "integer":
+        if isinstance(value, str):
+            if not _INTEGER_RE.match(value):
+                raise ValueError(value)
+            return int(value)
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError(value)
+        return int(value)
+    if column_type == "number":
+        if isinstance(value, str):
+            if _INTEGER_RE.match(value):
+                return int(value)
+            number = parse_number(value)
+            if number is None:
+                raise ValueError(value)
+            return number
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value if isinstance(value, int) else float(value)
+    if column_type == "date":
+        if isinstance(value, (date, datetime)):
+            return normalize_value(value)
+        if isinstance(value, str):
+            parsed = parse_date(value)
+            if parsed is None:
+                raise ValueError(value)
+            return parsed.isoformat() if len(value) <= 10 else value
+        raise ValueError(value)
+    return normalize_value(value)
+
+
+def choose_type(type_counts: Dict[str, int], tolerance: float = 0.0) -> str:
+    """Выбирает тип колонки по количеству значений каждого типа"""
+    total = sum(type_counts.values())
+    if not total:
+        return "string"
+    needed = total * (1 - tolerance)
+    integers = type_counts.get("integer", 0)
+    for column_type, matched in (
+        ("boolean", type_counts.get("boolean", 0)),
+        ("integer", integers),
+        ("number", integers + type_counts.get("number", 0)),
+        ("date", type_counts.get("date", 0)),
+    ):
+        if matched and matched >= needed:
+            return column_type
+    return "string"
+
+
+def column_names(header: Sequence[Any]) -> List[str]:
+    """Имена колонок из строки заголовка: пустые заменяются, повторяющиеся нумеруются"""
+    names: List[str] = []
+    for index, cell in enumerate(header):
+        name = str(normalize_value(cell) or f"column_{index + 1}")
+        candidate, suffix = name, 2
+        while candidate in names:
+            candidate = f"{name}_{suffix}"
+            suffix += 1
+        names.append(candidate)
+    return names
+
+
+class Reservoir:
+    """Равномерная выборка фиксированного размера из потока (алгоритм R)"""
+
+    def __init__(self, size: int, seed: Optional[int] = None):
+        self.size = size
+        self.seen = 0
+        self.items: List[Any] = []
+        self._random = random.Random(seed)
+
+    def add(self, item: Any) -> None:
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+            return
+        index = self._random.randrange(self.seen)
+        if index < self.size:
+            self.items[index] = item
+
+
+class SchemaSampler:
+    """Потоковый сбор выборки и статистики пропусков по строкам файла"""
+
+    def __init__(self, names: List[str], options: InferenceOptions, seed: Optional[int] = None):
+        self.names = names
+        self.options = options
+        self.reservoir = Reservoir(options.sample_rows, seed)
+        self.null_counts = [0] * len(names)
+
+    @property
+    def rows_scanned(self) -> int:
+        return self.reservoir.seen
+
+    def add(self, row: Sequence[Any]) -> List[Any]:
+        """Учитывает строку и возвращает её значения, приведённые к JSON-совместимому виду"""
+        row = [normalize_value(value) for value in row[:len(self.names)]]
+        for index in range(len(self.names)):
+            if index >= len(row) or row[index] is None:
+                self.null_counts[index] += 1
+        self.reservoir.add(row)
+        return row
+
+    def profile(self, complete: bool, sheet_name: Optional[str] = None) -> SchemaProposal:
+        sample = self.reservoir.items
+        columns = []
+        for index, name in enumerate(self.names):
+            values = [row[index] for row in sample if index < len(row) and row[index] is not None]
+            columns.append(self._profile_column(name, values, self.null_counts[index]))
+        return SchemaProposal(
+            columns=columns,
+            rows_scanned=self.rows_scanned,
+            rows_sampled=len(sample),
+            complete=complete,
+            sheet_name=sheet_name,
+        )
+
+    def _profile_column(self, name: str, values: List[Any], null_count: int) -> ColumnProfile:
+        type_counts: Dict[str, int] = {}
+        for value in values:
+            value_type = detect_type(value)
+            type_counts[value_type] = type_counts.get(value_type, 0) + 1
+        column_type = choose_type(type_counts, self.options.type_tolerance)
+
+        coerced = []
+        invalid_count = 0
+        for value in values:
+            try:
+                coerced.append(coerce_value(value, column_type))
+            except (TypeError, ValueError):
+                invalid_count += 1
+        distinct = set(coerced)
+
+        profile = ColumnProfile(
+            name=name,
+            type=column_type,
+            required=null_count == 0 and bool(values),
+            unique=bool(coerced) and len(distinct) == len(coerced),
+            null_count=null_count,
+            distinct_count=len(distinct),
+            invalid_count=invalid_count,
+            examples=list(dict.fromkeys(coerced))[:5],
+        )
+        if (
+                column_type == "string"
+                and 1 < len(distinct) <= self.options.enum_max_values
+                and len(coerced) >= len(distinct) * self.options.enum_min_repeats
+        ):
+            profile.options = sorted(distinct)
+        return profile
+
+
+def _scan(
+        rows: Iterator[Sequence[Any]],
+        options: InferenceOptions,
+        sheet_name: Optional[str] = None,
+) -> SchemaProposal:
+    header = next(rows, None)
+    if header is None:
+        return SchemaProposal(columns=[], rows_scanned=0, rows_sampled=0, complete=True, sheet_name=sheet_name)
+
+    sampler = SchemaSampler(column_names(header), options)
+    deadline = time_module.monotonic() + options.time_budget_seconds
+    complete = True
+    for row in rows:
+        if sampler.rows_scanned >= options.max_scan_rows or (
+                sampler.rows_scanned % 1024 == 0 and time_module.monotonic() > deadline
+        ):
+            complete = False
+            break
+        sampler.add(row)
+    return sampler.profile(complete, sheet_name)
+
+
+def iter_sheet_rows(sheet) -> Iterator[tuple]:
+    """Непустые строки листа Excel"""
+    for row in sheet.iter_rows(values_only=True):
+        if any(cell is not None and cell != "" for cell in row):
+            yield row
+
+
+def open_csv(path: str) -> Tuple[io.TextIOBase, csv.Dialect]:
+    """Открывает CSV-файл, определяя кодировку и разделитель по началу файла"""
+    with open(path, "rb") as file:
+        head = file.read(64 * 1024)
+    encoding = CSV_ENCODINGS[-1]
+    for candidate in CSV_ENCODINGS:
+        try:
+            # Начало файла может оборваться посреди многобайтного символа
+            codecs.getincrementaldecoder(candidate)().decode(head, final=False)
+        except UnicodeDecodeError:
+            continue
+        encoding = candidate
+        break
+    sample = head.decode(encoding, errors="ignore")
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        dialect = csv.excel
+    return open(path, encoding=encoding, newline=""), dialect
+
+
+def iter_csv_rows(file: io.TextIOBase, dialect: csv.Dialect) -> Iterator[List[str]]:
+    for row in csv.reader(file, dialect):
+        if any(cell.strip() for cell in row):
+            yield row
+
+
+def load_workbook(path: str, **kwargs):
+    """``openpyxl.load_workbook``; openpyxl импортируется при первом открытии книги, а не при старте приложения"""
+    from openpyxl import load_workbook as openpyxl_load_workbook
+    return openpyxl_load_workbook(path, **kwargs)
+
+
+@contextmanager
+def open_rows(path: str, sheet_name: Optional[str] = None) -> Iterator[Tuple[Iterator[Sequence[Any]], Optional[str]]]:
+    """Открывает CSV-файл или лист книги Excel (по умолчанию первый) как поток непустых строк"""
+    if path.lower().endswith(".csv"):
+        file, dialect = open_csv(path)
+        with file:
+            yield iter_csv_rows(file, dialect), None
+        return
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet_name is None:
+            sheet_name = workbook.sheetnames[0]
+        elif sheet_name not in workbook.sheetnames:
+            raise ValueError(f"Sheet '{sheet_name}' not found")
+        yield iter_sheet_rows(workbook[sheet_name]), sheet_name
+    finally:
+        workbook.close()
+
+
+def infer_schema(path: str, options: InferenceOptions, sheet_name: Optional[str] = None) -> SchemaProposal:
+    """Предлагает схему таблицы для CSV или XLSX файла (выполняется в процессе-воркере)"""
+    with open_rows(path, sheet_name) as (rows, sheet_name):
+        return _scan(rows, options, sheet_name)
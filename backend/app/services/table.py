@@ -0,0 +1,556 @@
+import asyncio
+import os
+import tempfile
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from fastapi import UploadFile
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core import app_settings
+from backend.app.custom_exceptions import AccessDeniedException, NotFoundException, ValidationException
+from backend.app.models import TableJob
+from backend.app.repository import (
+    DataRepository,
+    JobRepository,
+    PartitionRepository,
+    QualityRepository,
+    SnapshotRepository,
+    TableRepository,
+)
+from backend.app.schemas import (
+    TableResponse,
+    AccessibleTableResponse,
+    SheetImportResult,
+    SheetImportError,
+    WorkbookImportResponse,
+    SchemaProposalResponse,
+    ColumnReferenceUpdate,
+    UpsertImportResponse,
+    TableSnapshotResponse,
+    TableScanRequest,
+    TableJobResponse,
+)
+from backend.app.services.excel_processor import (
+    get_process_pool,
+    list_sheets,
+    parse_rows_for_table,
+    parse_sheet,
+    read_rows,
+)
+from backend.app.services.schema_inference import InferenceOptions, infer_schema
+from backend.app.utils.cache import LRUCache
+from backend.app.utils.validators import drop_invalid_cells, validate_row_data
+
+WORKBOOK_EXTENSIONS = (".xlsx", ".xlsm")
+INFERENCE_EXTENSIONS = (*WORKBOOK_EXTENSIONS, ".csv")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Количество строк таблиц для списка таблиц; ключ (ID таблицы, версия), поэтому
+# после изменения строк значение пересчитывается
+row_count_cache = LRUCache(maxsize=10_000)
+
+# Будит обработчик очереди, когда в этом процессе поставлена новая операция
+_job_queued = asyncio.Event()
+
+
+def inference_options() -> InferenceOptions:
+    config = app_settings.imports
+    return InferenceOptions(
+        sample_rows=config.sample_rows,
+        max_scan_rows=config.infer_max_scan_rows,
+        time_budget_seconds=config.infer_time_budget_seconds,
+        enum_max_values=config.enum_max_values,
+    )
+
+
+async def save_upload(upload: UploadFile, directory: str, max_size: int) -> str:
+    """Сохраняет загруженный файл на диск по частям, не держа его в памяти"""
+    suffix = os.path.splitext(upload.filename or "")[1].lower()
+    path = os.path.join(directory, f"upload{suffix}")
+    size = 0
+    with open(path, "wb") as file:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                raise ValidationException(f"File is larger than {max_size // (1024 * 1024)} MB")
+            file.write(chunk)
+    return path
+
+
+class TableService:
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.table_repo = TableRepository()
+        self.data_repo = DataRepository()
+        self.job_repo = JobRepository()
+        self.snapshot_repo = SnapshotRepository()
+
+    async def list_tables(self, user_id: int) -> List[AccessibleTableResponse]:
+        """Все таблицы, доступные пользователю (свои, общие и публичные), с правами и количеством строк.
+
+        Таблицы с правами загружаются одним запросом, количество строк - вторым,
+        только для таблиц, изменившихся с прошлого подсчёта.
+        """
+        tables = await self.table_repo.get_accessible_tables(user_id)
+        missing = [(table.id, table.version) for table, *_ in tables if (table.id, table.version) not in row_count_cache]
+        counts = await self.data_repo.count_rows_by_table([table_id for table_id, _ in missing])
+        for table_id, version in missing:
+            row_count_cache.set((table_id, version), counts.get(table_id, 0))
+
+        return [
+            AccessibleTableResponse(
+                **TableResponse.model_validate(table).model_dump(),
+                row_count=row_count_cache.get((table.id, table.version), 0),
+                is_owner=table.created_by_id == user_id,
+                can_read=can_read,
+                can_write=can_write,
+                can_manage=can_manage,
+            )
+            for table, can_read, can_write, can_manage in tables
+        ]
+
+    async def import_workbook(self, user_id: int, upload: UploadFile) -> WorkbookImportResponse:
+        """Импорт Excel-книги: каждый непустой лист становится отдельной таблицей.
+
+        Листы разбираются параллельно в пуле процессов; каждый разобранный лист
+        сразу загружается в базу, не дожидаясь остальных. Листы, которые не
+        удалось разобрать, перечисляются в ``errors``; если не удалось ни один,
+        возвращается ошибка валидации.
+        """
+        filename = upload.filename or "workbook.xlsx"
+        if not filename.lower().endswith(WORKBOOK_EXTENSIONS):
+            raise ValidationException("Only .xlsx and .xlsm files are supported")
+
+        config = app_settings.imports
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        loop = asyncio.get_running_loop()
+        pool = get_process_pool()
+        options = inference_options()
+
+        with tempfile.TemporaryDirectory(prefix="import-") as directory:
+            path = await save_upload(upload, directory, config.max_upload_mb * 1024 * 1024)
+            try:
+                sheet_names = await loop.run_in_executor(pool, list_sheets, path)
+            except Exception as e:
+                raise ValidationException(f"Cannot read workbook: {e}")
+
+            workers = [pool.submit(parse_sheet, path, sheet_name, options, directory) for sheet_name in sheet_names]
+            pending = {asyncio.wrap_future(worker): sheet_name for worker, sheet_name in zip(workers, sheet_names)}
+            results: List[SheetImportResult] = []
+            errors: List[SheetImportError] = []
+            try:
+                while pending:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        sheet_name = pending.pop(future)
+                        try:
+                            parsed = future.result()
+                        except Exception as e:
+                            logger.warning(f"Cannot parse sheet {sheet_name} of {filename}: {e}")
+                            errors.append(SheetImportError(sheet_name=sheet_name, error=str(e)))
+                            continue
+                        if not parsed.columns_schema:
+                            continue
+                        table, row_count = await self.table_repo.create_table(
+                            name=f"{stem} - {parsed.sheet_name}" if len(sheet_names) > 1 else stem,
+                            columns_schema=parsed.columns_schema,
+                            user_id=user_id,
+                            description=f"Импортировано из {filename}, лист {parsed.sheet_name}",
+                            row_batches=read_rows(parsed.rows_path, config.batch_size),
+                        )
+                        os.remove(parsed.rows_path)
+                        results.append(SheetImportResult(
+                            sheet_name=parsed.sheet_name,
+                            table=TableResponse.model_validate(table),
+                            row_count=row_count,
+                            invalid_cells=parsed.invalid_cells,
+                        ))
+            finally:
+                # Временный каталог удаляется только после того, как все воркеры перестали в него писать
+                running = [asyncio.wrap_future(worker) for worker in workers if not worker.cancel()]
+                if running:
+                    await asyncio.wait(running)
+
+        if errors and not results:
+            raise ValidationException("Cannot read workbook: " + "; ".join(f"{e.sheet_name}: {e.error}" for e in errors))
+        results.sort(key=lambda result: sheet_names.index(result.sheet_name))
+        errors.sort(key=lambda error: sheet_names.index(error.sheet_name))
+        logger.info(f"User {user_id} imported {len(results)} sheets from {filename}")
+        return WorkbookImportResponse(tables=results, errors=errors)
+
+    async def infer_schema(self, upload: UploadFile, sheet_name: Optional[str] = None) -> SchemaProposalResponse:
+        """Предложить схему таблицы по CSV или Excel файлу.
+
+        Типы определяются по равномерной выборке строк; просмотр файла ограничен
+        по количеству строк и времени, поэтому ответ приходит быстро для файла любого размера.
+        """
+        filename = upload.filename or ""
+        if not filename.lower().endswith(INFERENCE_EXTENSIONS):
+            raise ValidationException("Only .csv, .xlsx and .xlsm files are supported")
+
+        loop = asyncio.get_running_loop()
+        with tempfile.TemporaryDirectory(prefix="infer-") as directory:
+            path = await save_upload(upload, directory, app_settings.imports.max_upload_mb * 1024 * 1024)
+            try:
+                proposal = await loop.run_in_executor(
+                    get_process_pool(), infer_schema, path, inference_options(), sheet_name
+                )
+            except Exception as e:
+                raise ValidationException(f"Cannot read file: {e}")
+
+        if not proposal.columns:
+            raise ValidationException("File has no header row")
+        return SchemaProposalResponse(
+            sheet_name=proposal.sheet_name,
+            columns_schema=proposal.columns_schema,
+            columns=proposal.columns,
+            rows_scanned=proposal.rows_scanned,
+            rows_sampled=proposal.rows_sampled,
+            complete=proposal.complete,
+        )
+
+    async def set_natural_key(self, table_id: int, user_id: int, key_columns: List[str]) -> TableResponse:
+        """Объявить естественный ключ таблицы (колонки, однозначно определяющие строку)"""
+        table = await self.table_repo.get_table_with_manage_access(table_id, user_id)
+        if not table:
+            raise AccessDeniedException("No manage access to this table")
+
+        columns = {column["name"] for column in table.columns_schema}
+        unknown = [name for name in key_columns if name not in columns]
+        if unknown:
+            raise ValidationException(f"Unknown columns: {', '.join(unknown)}")
+        if len(set(key_columns)) != len(key_columns):
+            raise ValidationException("Key columns must be unique")
+
+        try:
+            table = await self.table_repo.set_natural_key(table, key_columns)
+        except ValueError as e:
+            raise ValidationException(str(e))
+        logger.info(f"User {user_id} set key {key_columns} for table {table_id}")
+        return TableResponse.model_validate(table)
+
+    async def set_column_reference(
+            self,
+            table_id: int,
+            user_id: int,
+            column: str,
+            reference: Optional[ColumnReferenceUpdate],
+    ) -> TableResponse:
+        """Сделать колонку ссылкой на строки другой таблицы (или убрать ссылку при ``reference=None``).
+
+        Значения ищутся по естественному ключу целевой таблицы из одной колонки:
+        его уникальный индекс делает поиск страницы значений одним запросом. Если
+        у целевой таблицы ключа нет, он объявляется (нужно право управления ею).
+        """
+        table = await self.table_repo.get_table_with_manage_access(table_id, user_id)
+        if not table:
+            raise AccessDeniedException("No manage access to this table")
+        if column not in {item["name"] for item in table.columns_schema}:
+            raise ValidationException(f"Unknown column '{column}'")
+
+        if reference is not None:
+            target = await self.table_repo.get_table_with_access(reference.table_id, user_id)
+            if not target:
+                raise AccessDeniedException("No access to the referenced table")
+            target_columns = {item["name"] for item in target.columns_schema}
+            unknown = [name for name in (reference.column, *reference.display) if name not in target_columns]
+            if unknown:
+                raise ValidationException(f"Unknown columns of the referenced table: {', '.join(unknown)}")
+
+            target_key = [item["name"] for item in target.columns_schema if item.get("key")]
+            if not target_key:
+                await self.set_natural_key(target.id, user_id, [reference.column])
+            elif target_key != [reference.column]:
+                raise ValidationException(
+                    f"Column '{reference.column}' is not the key of the referenced table (key: {', '.join(target_key)})"
+                )
+
+        table = await self.table_repo.set_column_reference(
+            table, column, reference.model_dump() if reference is not None else None
+        )
+        logger.info(
+            f"User {user_id} set reference of column '{column}' in table {table_id} "
+            f"to {reference.model_dump() if reference is not None else None}"
+        )
+        return TableResponse.model_validate(table)
+
+    async def upsert_import(
+            self,
+            table_id: int,
+            user_id: int,
+            upload: UploadFile,
+            key_columns: Optional[List[str]] = None,
+            sheet_name: Optional[str] = None,
+    ) -> UpsertImportResponse:
+        """Импорт CSV или Excel файла в существующую таблицу с объединением по естественному ключу.
+
+        Строки с уже существующим ключом обновляются, новые добавляются, а строки,
+        совпадающие с сохранёнными, не перезаписываются - повторная загрузка почти
+        не изменившегося файла обходится дёшево.
+        """
+        filename = upload.filename or ""
+        if not filename.lower().endswith(INFERENCE_EXTENSIONS):
+            raise ValidationException("Only .csv, .xlsx and .xlsm files are supported")
+
+        table = await self.table_repo.get_table_with_write_access(table_id, user_id)
+        if not table:
+            raise AccessDeniedException("No write access to this table")
+        if key_columns:
+            await self.set_natural_key(table_id, user_id, key_columns)
+            table = await self.table_repo.get_table_with_write_access(table_id, user_id)
+        key_columns = [column["name"] for column in table.columns_schema if column.get("key")]
+        if not key_columns:
+            raise ValidationException("Table has no natural key")
+
+        config = app_settings.imports
+        loop = asyncio.get_running_loop()
+        with tempfile.TemporaryDirectory(prefix="upsert-") as directory:
+            path = await save_upload(upload, directory, config.max_upload_mb * 1024 * 1024)
+            try:
+                parsed = await loop.run_in_executor(
+                    get_process_pool(), parse_rows_for_table, path, sheet_name, table.columns_schema, directory
+                )
+            except Exception as e:
+                raise ValidationException(f"Cannot read file: {e}")
+
+            counts = await self.data_repo.upsert_rows(
+                table_id,
+                key_columns,
+                [column["name"] for column in parsed.columns_schema],
+                read_rows(parsed.rows_path, config.batch_size),
+                user_id,
+            )
+
+        logger.info(
+            f"User {user_id} imported {filename} into table {table_id}: "
+            f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged"
+        )
+        return UpsertImportResponse(
+            table_id=table_id,
+            key=key_columns,
+            skipped_rows=parsed.skipped_rows,
+            invalid_cells=parsed.invalid_cells,
+            ignored_columns=parsed.ignored_columns,
+            **counts,
+        )
+
+
+    async def _queue_job(
+            self,
+            table_id: int,
+            user_id: int,
+            operation: str,
+            name: Optional[str] = None,
+            options: Optional[Dict[str, Any]] = None,
+    ) -> TableJobResponse:
+        job = await self.job_repo.create_job(table_id, user_id, operation, name, options)
+        _job_queued.set()
+        logger.info(f"User {user_id} queued {operation} of table {table_id} (job {job.id})")
+        return TableJobResponse.model_validate(job)
+
+    async def delete_table(self, table_id: int, user_id: int) -> TableJobResponse:
+        """Удалить таблицу: она сразу становится недоступна, строки удаляются в фоне"""
+        if not await self.table_repo.get_table_with_manage_access(table_id, user_id):
+            raise AccessDeniedException("No manage access to this table")
+        return await self._queue_job(table_id, user_id, "delete")
+
+    async def clear_table(self, table_id: int, user_id: int) -> TableJobResponse:
+        """Удалить все строки таблицы в фоне; история изменений тоже удаляется"""
+        if not await self.table_repo.get_table_with_manage_access(table_id, user_id):
+            raise AccessDeniedException("No manage access to this table")
+        return await self._queue_job(table_id, user_id, "clear")
+
+    async def copy_table(self, table_id: int, user_id: int, name: Optional[str] = None) -> TableJobResponse:
+        """Скопировать схему и строки таблицы в новую таблицу пользователя в фоне"""
+        table = await self.table_repo.get_table_with_access(table_id, user_id)
+        if not table:
+            raise AccessDeniedException("No access to this table")
+        return await self._queue_job(table_id, user_id, "copy", name or f"{table.name} (копия)")
+
+    async def scan_table(self, table_id: int, user_id: int, scan: TableScanRequest) -> TableJobResponse:
+        """Проверить все строки таблицы по схеме и найти дубликаты в фоне; отчёт - в report операции.
+
+        Исправления (``fix_invalid``, ``delete_duplicates``) требуют права записи
+        и отменяются как одна операция.
+        """
+        if scan.fix_invalid or scan.delete_duplicates:
+            table = await self.table_repo.get_table_with_write_access(table_id, user_id)
+            if not table:
+                raise AccessDeniedException("No write access to this table")
+        else:
+            table = await self.table_repo.get_table_with_access(table_id, user_id)
+            if not table:
+                raise AccessDeniedException("No access to this table")
+
+        columns = {column["name"] for column in table.columns_schema}
+        unknown = [name for name in scan.key_columns if name not in columns]
+        if unknown:
+            raise ValidationException(f"Unknown columns: {', '.join(unknown)}")
+        if scan.delete_duplicates == "key" and not scan.key_columns:
+            raise ValidationException("key_columns are required to delete duplicates by key")
+        return await self._queue_job(table_id, user_id, "scan", options=scan.model_dump())
+
+    async def create_snapshot(self, table_id: int, user_id: int, name: str) -> TableSnapshotResponse:
+        """Зафиксировать текущее состояние таблицы под именем; строки не копируются"""
+        if not await self.table_repo.get_table_with_write_access(table_id, user_id):
+            raise AccessDeniedException("No write access to this table")
+        try:
+            snapshot = await self.snapshot_repo.create_snapshot(table_id, user_id, name)
+        except ValueError as e:
+            raise ValidationException(str(e))
+        logger.info(f"User {user_id} created snapshot {snapshot.id} '{name}' of table {table_id}")
+        return TableSnapshotResponse.model_validate(snapshot)
+
+    async def list_snapshots(self, table_id: int, user_id: int) -> List[TableSnapshotResponse]:
+        if not await self.table_repo.get_table_with_access(table_id, user_id):
+            raise AccessDeniedException("No access to this table")
+        snapshots = await self.snapshot_repo.get_snapshots(table_id)
+        return [TableSnapshotResponse.model_validate(snapshot) for snapshot in snapshots]
+
+    async def delete_snapshot(self, table_id: int, snapshot_id: int, user_id: int) -> None:
+        """Удалить снимок; изменения, которые он удерживал в журнале, снова сжимаются и удаляются по сроку"""
+        if not await self.table_repo.get_table_with_manage_access(table_id, user_id):
+            raise AccessDeniedException("No manage access to this table")
+        if not await self.snapshot_repo.delete_snapshot(table_id, snapshot_id):
+            raise NotFoundException("Snapshot not found")
+        logger.info(f"User {user_id} deleted snapshot {snapshot_id} of table {table_id}")
+
+    async def get_job(self, job_id: int, user_id: int) -> TableJobResponse:
+        job = await self.job_repo.get_job(job_id, user_id)
+        if not job:
+            raise NotFoundException("Job not found")
+        return TableJobResponse.model_validate(job)
+
+
+async def scan_table(job: TableJob) -> Dict[str, Any]:
+    """Проверить строки таблицы по текущей схеме и найти дубликаты, при необходимости исправив их.
+
+    Строки читаются и проверяются пачками, в памяти держится только текущая
+    пачка и сводка отчёта. Дубликаты ищутся группировкой по хешу строк в SQL
+    после исправления невалидных строк.
+    """
+    config = app_settings.jobs
+    scan = TableScanRequest.model_validate(job.options or {})
+    fixes_requested = bool(scan.fix_invalid or scan.delete_duplicates)
+    table = await TableRepository().get_table_with_permission(
+        job.table_id, job.user_id, "write" if fixes_requested else "read"
+    )
+    if table is None:
+        raise ValueError(f"Table {job.table_id} is not available to user {job.user_id}")
+
+    quality_repo = QualityRepository()
+    errors = Counter()
+    invalid_samples = []
+    rows_scanned = invalid_rows = fixed_rows = 0
+    batch_id = None
+    async for batch in quality_repo.iter_rows(table.id, config.scan_batch_size):
+        rows_scanned += len(batch)
+        fixes = []
+        for row_id, row_data in batch:
+            row_errors = validate_row_data(table.columns_schema, row_data)
+            if not row_errors:
+                continue
+            invalid_rows += 1
+            errors.update(row_errors)
+            if len(invalid_samples) < config.scan_report_samples:
+                invalid_samples.append({"row_id": row_id, "errors": row_errors})
+            if scan.fix_invalid == "delete":
+                fixes.append((row_id, row_data, None))
+            elif scan.fix_invalid == "clear":
+                cleaned = drop_invalid_cells(table.columns_schema, row_data)
+                if cleaned != row_data:
+                    fixes.append((row_id, row_data, cleaned))
+        if fixes:
+            changed, batch_id = await quality_repo.fix_rows(table.id, fixes, job.user_id, batch_id)
+            fixed_rows += changed
+
+    samples = config.scan_report_samples
+    report = {
+        "rows_scanned": rows_scanned,
+        "invalid_rows": invalid_rows,
+        "errors": dict(errors.most_common(samples)),
+        "invalid_samples": invalid_samples,
+        "fixed_rows": fixed_rows,
+        "exact_duplicates": await quality_repo.find_duplicates(table.id, samples=samples),
+        "key_duplicates": None,
+        "deleted_duplicates": 0,
+    }
+    if scan.key_columns:
+        report["key_duplicates"] = await quality_repo.find_duplicates(table.id, scan.key_columns, samples)
+    if scan.delete_duplicates:
+        report["deleted_duplicates"] = await quality_repo.delete_duplicates(
+            table.id, scan.key_columns if scan.delete_duplicates == "key" else None, job.user_id
+        )
+    return report
+
+
+async def execute_job(job: TableJob) -> None:
+    """Выполнить фоновую операцию над таблицей, результат записывается в задачу"""
+    table_repo = TableRepository()
+    lock_timeout_ms = app_settings.partitions.lock_timeout_ms
+    if job.operation == "delete":
+        job.row_count = await table_repo.delete_table(job.table_id, lock_timeout_ms)
+    elif job.operation == "clear":
+        job.row_count = await table_repo.clear_rows(job.table_id)
+    elif job.operation == "copy":
+        table, job.row_count = await table_repo.copy_table(job.table_id, job.user_id, job.name, lock_timeout_ms)
+        job.result_table_id = table.id
+    elif job.operation == "scan":
+        job.report = await scan_table(job)
+        job.row_count = job.report["rows_scanned"]
+    else:
+        raise ValueError(f"Unknown operation {job.operation}")
+
+
+async def process_table_jobs() -> None:
+    """Выполнить все ожидающие операции над таблицами"""
+    job_repo = JobRepository()
+    config = app_settings.jobs
+    while job := await job_repo.run_next_job(
+            execute_job, config.max_attempts, config.retry_delay_seconds, config.lease_seconds
+    ):
+        if job.status == "done":
+            logger.info(f"Job {job.id}: {job.operation} of table {job.table_id} done, {job.row_count} rows")
+        elif job.status == "failed" and job.operation == "delete":
+            logger.error(f"Job {job.id}: deleting table {job.table_id} failed, the table is restored: {job.error}")
+        else:
+            logger.warning(f"Job {job.id}: {job.operation} of table {job.table_id} failed (attempt {job.attempts}): {job.error}")
+
+
+async def run_table_jobs() -> None:
+    """Фоновая задача обработки очереди операций над таблицами"""
+    while True:
+        try:
+            await process_table_jobs()
+        except Exception as e:
+            logger.error(f"Table jobs processing failed: {e}")
+        try:
+            await asyncio.wait_for(_job_queued.wait(), app_settings.jobs.poll_interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+        _job_queued.clear()
+
+
+async def promote_large_tables() -> None:
+    """Перенести крупные таблицы в собственные партиции"""
+    config = app_settings.partitions
+    partition_repo = PartitionRepository()
+    for table_id in await partition_repo.get_tables_to_promote(config.promote_min_rows):
+        try:
+            moved = await partition_repo.promote_table(table_id, config.lock_timeout_ms)
+        except Exception as e:
+            logger.warning(f"Cannot move table {table_id} to its own partition: {e}")
+            continue
+        logger.info(f"Moved {moved} rows of table {table_id} to its own partition")
+
+
+async def run_table_promotion() -> None:
+    """Фоновая задача периодического переноса крупных таблиц в собственные партиции"""
+    while True:
+        await asyncio.sleep(app_settings.partitions.check_interval_seconds)
+        try:
+            await promote_large_tables()
+        except Exception as e:
+            logger.error(f"Table promotion failed: {e}")
@@ -0,0 +1,76 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LRUCache:
+    """Ограниченный по размеру in-memory кэш с вытеснением давно неиспользуемых записей.
+
+    Кэш живёт в памяти процесса, поэтому ключи должны включать версию данных
+    (например, ``DataTable.version``), чтобы устаревшие значения никогда не читались.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        try:
+            value = self._data[key]
+        except KeyError:
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """Объединение одинаковых одновременных запросов в одно выполнение.
+
+    Пока вызов с ключом выполняется, остальные вызовы с тем же ключом ждут его
+    результат (или исключение) вместо повторного запроса к базе. Ключ должен
+    включать версию данных: запрос, начатый после изменения, получит новый
+    ключ и не присоединится к устаревшему вызову. Вызов выполняется отдельной
+    задачей, поэтому отмена первого запроса (клиент отключился) не отменяет
+    его для остальных.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Task"] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: "asyncio.Task") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Исключение считается полученным, даже если все ожидающие были отменены
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,203 @@
+"""Дробные ключи порядка (fractional indexing).
+
+Ключ - строка, сравниваемая побайтно (COLLATE "C"); между любыми двумя ключами
+всегда можно получить новый, поэтому вставка строки между соседними и
+перемещение строки меняют только её собственный ключ.
+
+Ключ состоит из целой части переменной длины и дробной части. Первый символ
+целой части задаёт её длину: ``a``-``z`` - неотрицательные числа из 1-26
+цифр, ``A``-``Z`` - отрицательные из 26-1 цифр. Последовательные ключи в
+конце таблицы получаются увеличением целой части, поэтому при добавлении
+строк длина ключа растёт логарифмически, а не линейно.
+"""
+from typing import List, Optional, Tuple
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+_DIGIT_INDEX = {digit: index for index, digit in enumerate(DIGITS)}
+SMALLEST_INTEGER = "A" + "0" * 26
+INITIAL_KEY = "a0"
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Invalid order key head: {head!r}")
+
+
+def _split(key: str) -> tuple:
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"Invalid order key: {key!r}")
+    return key[:length], key[length:]
+
+
+def validate_key(key: str) -> None:
+    """Проверяет формат ключа.
+
+    Raises:
+        ValueError: Ключ имеет неверный формат
+    """
+    integer, fraction = _split(key)
+    if integer == SMALLEST_INTEGER or fraction.endswith("0") or any(c not in _DIGIT_INDEX for c in key[1:]):
+        raise ValueError(f"Invalid order key: {key!r}")
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    """Дробная часть строго между ``a`` и ``b`` (``b is None`` - без верхней границы)."""
+    if b is not None:
+        prefix = 0
+        while prefix < len(b) and (a[prefix] if prefix < len(a) else "0") == b[prefix]:
+            prefix += 1
+        if prefix:
+            return b[:prefix] + _midpoint(a[prefix:], b[prefix:])
+
+    digit_a = _DIGIT_INDEX[a[0]] if a else 0
+    digit_b = _DIGIT_INDEX[b[0]] if b is not None else BASE
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b) // 2]
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _increment_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    index = len(digits) - 1
+    while index >= 0:
+        value = _DIGIT_INDEX[digits[index]] + 1
+        if value < BASE:
+            digits[index] = DIGITS[value]
+            return head + "".join(digits)
+        digits[index] = "0"
+        index -= 1
+    if head == "Z":
+        return "a0"
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append("0")
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    index = len(digits) - 1
+    while index >= 0:
+        value = _DIGIT_INDEX[digits[index]] - 1
+        if value >= 0:
+            digits[index] = DIGITS[value]
+            return head + "".join(digits)
+        digits[index] = DIGITS[-1]
+        index -= 1
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(a: Optional[str], b: Optional[str]) -> str:
+    """Ключ строго между ``a`` и ``b``; None означает начало или конец таблицы.
+
+    Raises:
+        ValueError: ``a`` не меньше ``b``
+    """
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"{a!r} must be less than {b!r}")
+    if a is None and b is None:
+        return INITIAL_KEY
+    if a is None:
+        integer, fraction = _split(b)
+        if integer == SMALLEST_INTEGER:
+            return integer + _midpoint("", fraction)
+        if integer < b:
+            return integer
+        result = _decrement_integer(integer)
+        if result is None:
+            raise ValueError("Cannot decrement any more")
+        return result
+    if b is None:
+        integer, fraction = _split(a)
+        result = _increment_integer(integer)
+        return result if result is not None else integer + _midpoint(fraction, None)
+
+    integer_a, fraction_a = _split(a)
+    integer_b, fraction_b = _split(b)
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, fraction_b)
+    result = _increment_integer(integer_a)
+    if result is None:
+        raise ValueError("Cannot increment any more")
+    if result < b:
+        return result
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def keys_between(a: Optional[str], b: Optional[str], count: int) -> List[str]:
+    """``count`` возрастающих ключей между ``a`` и ``b``.
+
+    Ключи в конце таблицы выдаются последовательно; между двумя границами -
+    делением интервала пополам, чтобы длина ключей росла логарифмически.
+    """
+    if count <= 0:
+        return []
+    if count == 1:
+        return [key_between(a, b)]
+    if b is None:
+        keys = []
+        key = a
+        for _ in range(count):
+            key = key_between(key, None)
+            keys.append(key)
+        return keys
+    if a is None:
+        keys = []
+        key = b
+        for _ in range(count):
+            key = key_between(None, key)
+            keys.append(key)
+        return keys[::-1]
+    middle = count // 2
+    key = key_between(a, b)
+    return [*keys_between(a, key, middle), key, *keys_between(key, b, count - middle - 1)]
+
+
+def key_spacing(count: int) -> Tuple[str, int, int]:
+    """Параметры равномерной раскладки ``count`` ключей: первый символ, число цифр и шаг.
+
+    Ключ строки с номером ``i`` (с единицы) - первый символ и ``i * step``,
+    записанное ``digits`` цифрами.
+    """
+    digits = 1
+    while BASE ** digits < count * 2:
+        digits += 1
+    return chr(ord("a") + digits - 1), digits, BASE ** digits // (count + 1)
+
+
+def evenly_spaced_keys(count: int) -> List[str]:
+    """``count`` ключей одинаковой длины, равномерно распределённых по пространству ключей.
+
+    Используется при перебалансировке: после неё между любыми соседними
+    ключами остаётся место для множества вставок без удлинения ключей.
+    """
+    head, digits, step = key_spacing(count)
+    keys = []
+    for index in range(1, count + 1):
+        value = index * step
+        encoded = []
+        for _ in range(digits):
+            value, digit = divmod(value, BASE)
+            encoded.append(DIGITS[digit])
+        keys.append(head + "".join(reversed(encoded)))
+    return keys
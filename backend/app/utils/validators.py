@@ -0,0 +1,105 @@
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+# Поддерживаемые типы колонок в DataTable.columns_schema.
+# Элемент схемы имеет вид {"name": "price", "type": "number", "required": false};
+# необязательный ключ "options" ограничивает колонку списком допустимых значений.
+# Ключ "reference" делает колонку ссылкой на строки другой таблицы (как ВПР):
+# {"table_id": 7, "column": "customer_id", "display": ["name"]} - значение ячейки
+# ищется в колонке естественного ключа "column" таблицы 7, при чтении строк к ним
+# добавляются колонки "display" найденной строки (см. DataService)
+COLUMN_TYPES = ("string", "integer", "number", "boolean", "date")
+NUMERIC_TYPES = ("integer", "number")
+
+
+def get_schema_columns(columns_schema: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Возвращает отображение имя колонки -> тип колонки"""
+    return {
+        column["name"]: column.get("type", "string")
+        for column in columns_schema or []
+        if "name" in column
+    }
+
+
+def get_reference_columns(columns_schema: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Возвращает отображение имя колонки -> описание ссылки для колонок-ссылок"""
+    return {
+        column["name"]: column["reference"]
+        for column in columns_schema or []
+        if "name" in column and column.get("reference")
+    }
+
+
+def _is_valid_value(value: Any, column_type: str) -> bool:
+    if column_type == "integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if column_type == "number":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if column_type == "boolean":
+        return isinstance(value, bool)
+    if column_type == "date":
+        if isinstance(value, (date, datetime)):
+            return True
+        if not isinstance(value, str):
+            return False
+        try:
+            datetime.fromisoformat(value)
+        except ValueError:
+            return False
+        return True
+    return isinstance(value, str)
+
+
+def validate_row_data(
+        columns_schema: List[Dict[str, Any]],
+        row_data: Dict[str, Any],
+        partial: bool = False,
+) -> List[str]:
+    """Проверяет строку на соответствие схеме таблицы.
+
+    Args:
+        columns_schema: Схема колонок таблицы
+        row_data: Данные строки
+        partial: Частичное обновление - отсутствующие колонки не проверяются
+
+    Returns:
+        Список ошибок; пустой список, если строка валидна.
+    """
+    errors = []
+    columns = get_schema_columns(columns_schema)
+
+    for key in row_data:
+        if key not in columns:
+            errors.append(f"Unknown column '{key}'")
+
+    for column in columns_schema or []:
+        name = column.get("name")
+        value = row_data.get(name)
+        if value is None:
+            if column.get("required") and (name in row_data or not partial):
+                errors.append(f"Column '{name}' is required")
+            continue
+        column_type = column.get("type", "string")
+        if not _is_valid_value(value, column_type):
+            errors.append(f"Column '{name}' expects {column_type}")
+        elif column.get("options") is not None and value not in column["options"]:
+            errors.append(f"Column '{name}' expects one of {column['options']}")
+
+    return errors
+
+
+def drop_invalid_cells(columns_schema: List[Dict[str, Any]], row_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Возвращает строку без неизвестных колонок и значений, не подходящих под тип или список options"""
+    columns = {column["name"]: column for column in columns_schema or [] if "name" in column}
+    cleaned = {}
+    for key, value in row_data.items():
+        column = columns.get(key)
+        if column is None:
+            continue
+        if value is not None:
+            if not _is_valid_value(value, column.get("type", "string")):
+                continue
+            if column.get("options") is not None and value not in column["options"]:
+                continue
+        cleaned[key] = value
+    return cleaned
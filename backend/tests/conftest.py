@@ -0,0 +1,86 @@
+"""Общие фикстуры тестов.
+
+Тесты работают с локальной Postgres с применёнными миграциями (настройки
+подключения - те же переменные окружения, что и у приложения). Если база
+недоступна, тесты пропускаются.
+"""
+import json
+import os
+from datetime import timedelta
+from typing import Any, Dict, List
+
+import pytest
+
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from sqlalchemy import text, update  # noqa: E402
+
+from backend.app.core.database import dispose_engine, get_session_factory  # noqa: E402
+from backend.app.models import ChangeBatch, TableSnapshot  # noqa: E402
+from backend.app.repository import TableRepository  # noqa: E402
+
+TEST_USER_EMAIL = "tests@example.com"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def user_id():
+    """ID тестового пользователя; движок БД закрывается после каждого теста"""
+    try:
+        async with get_session_factory()() as session:
+            user_id = (await session.execute(text("""
+                INSERT INTO users (email, hashed_password, full_name, role, is_active)
+                VALUES (:email, 'tests', 'Test User', 'EDITOR', true)
+                ON CONFLICT (email) DO UPDATE SET full_name = EXCLUDED.full_name
+                RETURNING id
+            """), {"email": TEST_USER_EMAIL})).scalar_one()
+            await session.commit()
+    except (OSError, ConnectionError) as e:
+        await dispose_engine()
+        pytest.skip(f"Database is not available: {e}")
+    yield user_id
+    await dispose_engine()
+
+
+@pytest.fixture
+async def make_table(user_id):
+    """Фабрика таблиц с колонками ``item``/``amount``; таблицы удаляются после теста"""
+    repo = TableRepository()
+    created: List[int] = []
+
+    async def make(rows: List[Dict[str, Any]], name: str = "test table"):
+        schema = [{"name": "item", "type": "string"}, {"name": "amount", "type": "integer"}]
+        table, _ = await repo.create_table(
+            name=name,
+            columns_schema=schema,
+            user_id=user_id,
+            row_batches=[[json.dumps(row) for row in rows]],
+        )
+        created.append(table.id)
+        return table
+
+    yield make
+    for table_id in created:
+        await repo.delete_table(table_id)
+
+
+@pytest.fixture
+def age_history():
+    """Сдвинуть в прошлое журнал изменений и снимки таблицы, как будто они сделаны ``age`` назад"""
+
+    async def age(table_id: int, days: int) -> None:
+        async with get_session_factory()() as session:
+            for model in (ChangeBatch, TableSnapshot):
+                await session.execute(
+                    update(model)
+                    .where(model.table_id == table_id)
+                    .values(created_at=model.created_at - timedelta(days=days))
+                )
+            await session.commit()
+
+    return age
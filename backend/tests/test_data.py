@@ -0,0 +1,41 @@
+import pytest
+
+from backend.app.repository import DataRepository
+from backend.app.utils.validators import validate_row_data
+
+pytestmark = pytest.mark.anyio
+
+# Значения, которые не приводятся к типу сортировки, не должны ломать запрос
+ROWS = [
+    {"item": "a", "amount": 3, "day": "2024-01-03"},
+    {"item": "b", "amount": "3x", "day": "2024-01-01xyz"},
+    {"item": "c", "amount": 1, "day": "2024-01-01"},
+    {"item": "d", "amount": "", "day": "2024-13-45"},
+    {"item": "e", "amount": 2, "day": "2024-01-02T10:00:00"},
+]
+
+
+async def test_sort_by_typed_column_with_invalid_values(make_table, user_id):
+    table = await make_table(ROWS)
+    data_repo = DataRepository()
+
+    by_amount = await data_repo.get_rows_by_table_id(table.id, sort_by="amount", sort_type="integer")
+    assert [row.row_data["item"] for row in by_amount] == ["c", "e", "a", "b", "d"]
+    by_day = await data_repo.get_rows_by_table_id(table.id, sort_by="day", sort_order="desc", sort_type="date")
+    assert [row.row_data["item"] for row in by_day][:3] == ["a", "e", "c"]
+    by_item = await data_repo.get_rows_by_table_id(table.id, sort_by="item", sort_type="boolean")
+    assert len(by_item) == len(ROWS)
+
+
+async def test_aggregate_skips_invalid_values(make_table, user_id):
+    table = await make_table(ROWS)
+    assert await DataRepository().aggregate_rows(table.id, [], [("sum", "amount", "number"), ("count", None, None)]) == [
+        (6, 5),
+    ]
+
+
+def test_date_validation_is_strict():
+    schema = [{"name": "day", "type": "date"}]
+    assert validate_row_data(schema, {"day": "2024-01-01"}) == []
+    assert validate_row_data(schema, {"day": "2024-01-01T10:00:00"}) == []
+    assert validate_row_data(schema, {"day": "2024-01-01xyz"})
@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+
+from backend.app.api.formats import COLUMNAR_JSON, JSON, columnar_rows, negotiate_row_format
+from backend.app.schemas import TableRowResponse
+
+CREATED_AT = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_row(row_id, row_data, lookups=None):
+    return TableRowResponse(
+        id=row_id, table_id=1, row_data=row_data, position=f"a{row_id}", created_at=CREATED_AT, lookups=lookups
+    )
+
+
+def test_columnar_rows():
+    payload = columnar_rows([make_row(1, {"item": "a", "amount": 1}), make_row(2, {"amount": 2, "note": "x"})])
+    assert payload["columns"] == ["item", "amount", "note"]
+    assert payload["rows"] == [["a", 1, None], [None, 2, "x"]]
+    assert "lookups" not in payload
+
+
+def test_columnar_rows_with_lookups():
+    payload = columnar_rows([
+        make_row(1, {"customer": "c1"}, lookups={"customer": {"name": "Acme"}}),
+        make_row(2, {"customer": "c9"}, lookups={"customer": None}),
+        make_row(3, {}),
+    ])
+    assert payload["lookups"] == [{"customer": {"name": "Acme"}}, {"customer": None}, None]
+
+
+def test_negotiate_row_format():
+    assert negotiate_row_format("") == JSON
+    assert negotiate_row_format(f"{COLUMNAR_JSON}, application/json;q=0.5") == COLUMNAR_JSON
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.app.repository import DataRepository, HistoryRepository, SnapshotRepository
+
+pytestmark = pytest.mark.anyio
+
+# Сжимаются пачки старше недели, история хранится дольше, чем живут тесты
+COMPACT_AFTER = timedelta(days=7)
+RETENTION = timedelta(days=3650)
+
+
+async def test_rows_at_after_compaction(make_table, age_history, user_id):
+    table = await make_table([{"item": "a", "amount": 1}])
+    data_repo, history_repo = DataRepository(), HistoryRepository()
+    [row] = await data_repo.get_rows_by_table_id(table.id)
+
+    before_first = datetime.now(timezone.utc)
+    await data_repo.update_row(table.id, row.id, {"amount": 2}, user_id)
+    await age_history(table.id, 5)
+    before_second = datetime.now(timezone.utc)
+    await data_repo.update_row(table.id, row.id, {"amount": 3}, user_id)
+    await age_history(table.id, 5)
+
+    # Первое изменение сжимается в новую пачку с ID больше, чем у второго
+    await history_repo.compact(COMPACT_AFTER, RETENTION)
+
+    at_first = await history_repo.get_rows_at(table.id, before_first - timedelta(days=10))
+    at_second = await history_repo.get_rows_at(table.id, before_second - timedelta(days=5))
+    assert at_first == [(row.id, {"item": "a", "amount": 1})]
+    assert at_second == [(row.id, {"item": "a", "amount": 2})]
+
+
+async def test_undo_added_cell(make_table, user_id):
+    table = await make_table([{"item": "a", "amount": 1}])
+    data_repo, history_repo, snapshot_repo = DataRepository(), HistoryRepository(), SnapshotRepository()
+    [row] = await data_repo.get_rows_by_table_id(table.id)
+
+    before_change = datetime.now(timezone.utc)
+    snapshot = await snapshot_repo.create_snapshot(table.id, user_id, "before note")
+    await data_repo.update_row(table.id, row.id, {"note": "x", "amount": 2}, user_id)
+
+    assert await history_repo.get_rows_at(table.id, before_change) == [(row.id, {"item": "a", "amount": 1})]
+    assert [row.row_data for row in await snapshot_repo.get_rows(snapshot)] == [{"item": "a", "amount": 1}]
+
+    await history_repo.undo(table.id, user_id)
+    assert (await data_repo.get_row(table.id, row.id)).row_data == {"item": "a", "amount": 1}
+    await history_repo.redo(table.id, user_id)
+    assert (await data_repo.get_row(table.id, row.id)).row_data == {"item": "a", "amount": 2, "note": "x"}
+    await history_repo.undo(table.id, user_id)
+    assert (await data_repo.get_row(table.id, row.id)).row_data == {"item": "a", "amount": 1}
+
+
+async def test_compacted_added_cell(make_table, age_history, user_id):
+    table = await make_table([{"item": "a", "amount": 1}])
+    data_repo, history_repo = DataRepository(), HistoryRepository()
+    [row] = await data_repo.get_rows_by_table_id(table.id)
+
+    before_change = datetime.now(timezone.utc)
+    await data_repo.update_row(table.id, row.id, {"note": "x"}, user_id)
+    await data_repo.update_row(table.id, row.id, {"note": "y", "amount": 2}, user_id)
+    await age_history(table.id, 10)
+    await history_repo.compact(COMPACT_AFTER, RETENTION)
+
+    at = before_change - timedelta(days=10)
+    assert await history_repo.get_rows_at(table.id, at) == [(row.id, {"item": "a", "amount": 1})]
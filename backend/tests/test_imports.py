@@ -0,0 +1,75 @@
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import UploadFile
+from openpyxl import Workbook
+
+from backend.app.custom_exceptions import ValidationException
+from backend.app.repository import TableRepository
+from backend.app.services import table as table_service
+from backend.app.services.excel_processor import parse_sheet
+
+pytestmark = pytest.mark.anyio
+
+
+def workbook_upload(*sheet_names: str) -> UploadFile:
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for sheet_name in sheet_names:
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append(["item", "amount"])
+        sheet.append(["a", 1])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return UploadFile(buffer, filename="book.xlsx")
+
+
+@pytest.fixture
+def sheet_parser(monkeypatch):
+    """Разбор листов в потоках: лист ``broken`` падает, лист ``slow`` долго пишет во временный каталог"""
+    finished = []
+
+    def parse(path, sheet_name, options, output_dir):
+        if sheet_name == "broken":
+            raise ValueError("broken sheet")
+        if sheet_name == "slow":
+            time.sleep(0.5)
+            with open(os.path.join(output_dir, "slow.jsonl"), "w") as file:
+                file.write("{}\n")
+            finished.append(sheet_name)
+        return parse_sheet(path, sheet_name, options, output_dir)
+
+    pool = ThreadPoolExecutor(max_workers=4)
+    monkeypatch.setattr(table_service, "get_process_pool", lambda: pool)
+    monkeypatch.setattr(table_service, "parse_sheet", parse)
+    yield finished
+    pool.shutdown()
+
+
+async def test_import_reports_broken_sheets(sheet_parser, user_id):
+    result = await table_service.TableService(None).import_workbook(user_id, workbook_upload("ok", "broken"))
+    try:
+        assert [sheet.sheet_name for sheet in result.tables] == ["ok"]
+        assert [(error.sheet_name, error.error) for error in result.errors] == [("broken", "broken sheet")]
+    finally:
+        for sheet in result.tables:
+            await TableRepository().delete_table(sheet.table.id)
+
+
+async def test_import_of_broken_workbook_fails(sheet_parser, user_id):
+    with pytest.raises(ValidationException):
+        await table_service.TableService(None).import_workbook(user_id, workbook_upload("broken"))
+
+
+async def test_import_waits_for_workers_on_error(sheet_parser, monkeypatch, user_id):
+    async def fail(*args, **kwargs):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(TableRepository, "create_table", fail)
+    with pytest.raises(RuntimeError):
+        await table_service.TableService(None).import_workbook(user_id, workbook_upload("ok", "slow"))
+    assert sheet_parser == ["slow"]
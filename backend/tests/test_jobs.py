@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import delete, func, select
+
+from backend.app.core.database import get_session_factory
+from backend.app.models import DataTable, TableJob
+from backend.app.repository import JobRepository
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def job_repo(user_id):
+    async with get_session_factory()() as session:
+        due = await session.scalar(select(func.count()).select_from(TableJob).where(
+            TableJob.status.in_(("pending", "running")), TableJob.run_after <= func.now()
+        ))
+    if due:
+        pytest.skip("The job queue is not empty")
+    yield JobRepository()
+    async with get_session_factory()() as session:
+        await session.execute(delete(TableJob).where(TableJob.user_id == user_id))
+        await session.commit()
+
+
+async def failing(job: TableJob) -> None:
+    raise RuntimeError("boom")
+
+
+async def test_failed_delete_restores_table(make_table, job_repo, user_id):
+    table = await make_table([{"item": "a", "amount": 1}])
+    job = await job_repo.create_job(table.id, user_id, "delete")
+
+    job = await job_repo.run_next_job(failing, max_attempts=2, retry_delay_seconds=0)
+    assert (job.status, job.attempts, job.error) == ("pending", 1, "boom")
+    job = await job_repo.run_next_job(failing, max_attempts=2, retry_delay_seconds=0)
+    assert (job.status, job.attempts) == ("failed", 2)
+
+    async with get_session_factory()() as session:
+        assert (await session.get(DataTable, table.id)).is_deleted is False
+
+
+async def test_failed_job_is_retried_after_delay(make_table, job_repo, user_id):
+    table = await make_table([{"item": "a", "amount": 1}])
+    job = await job_repo.create_job(table.id, user_id, "scan")
+
+    job = await job_repo.run_next_job(failing, max_attempts=3, retry_delay_seconds=60)
+    assert job.status == "pending"
+    assert await job_repo.run_next_job(failing, max_attempts=3) is None
+
+    async with get_session_factory()() as session:
+        await session.execute(TableJob.__table__.update().where(TableJob.id == job.id).values(run_after=func.now()))
+        await session.commit()
+
+    async def succeed(job: TableJob) -> None:
+        # Задача не заблокирована, пока выполняется
+        async with get_session_factory()() as session:
+            stmt = select(TableJob).where(TableJob.id == job.id).with_for_update(nowait=True)
+            assert (await session.scalars(stmt)).first().status == "running"
+        job.row_count = 1
+
+    job = await job_repo.run_next_job(succeed, max_attempts=3)
+    assert (job.status, job.attempts, job.row_count, job.error) == ("done", 2, 1, None)
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from backend.app.core.database import get_session_factory
+from backend.app.repository import DataRepository, PartitionRepository, TableRepository
+from backend.app.repository.data import natural_key_index_name
+from backend.app.repository.partition import row_partition, table_partition_name
+
+pytestmark = pytest.mark.anyio
+
+ROWS = 2000
+
+
+async def analyze_partition(table_id: int) -> str:
+    async with get_session_factory()() as session:
+        partition = await row_partition(session, table_id)
+        await session.execute(text(f"ANALYZE {partition}"))
+        await session.commit()
+    return partition
+
+
+async def test_promote_table(make_table, user_id):
+    table = await make_table([{"item": f"i{index}", "amount": index} for index in range(ROWS)])
+    table = await TableRepository().set_natural_key(table, ["item"])
+    await analyze_partition(table.id)
+    partition_repo, data_repo = PartitionRepository(), DataRepository()
+
+    assert table.id in await partition_repo.get_tables_to_promote(ROWS)
+    assert table.id not in await partition_repo.get_tables_to_promote(ROWS + 1)
+
+    before = [(row.id, row.row_data) for row in await data_repo.get_rows_by_table_id(table.id, limit=ROWS)]
+    assert await partition_repo.promote_table(table.id) == ROWS
+    assert await partition_repo.promote_table(table.id) == 0
+
+    assert await analyze_partition(table.id) == table_partition_name(table.id)
+    after = [(row.id, row.row_data) for row in await data_repo.get_rows_by_table_id(table.id, limit=ROWS)]
+    assert after == before
+    # Ключевой индекс переехал вместе со строками
+    assert await data_repo.lookup_rows(table.id, "item", ["i5"]) == {"i5": {"item": "i5", "amount": 5}}
+
+
+async def test_promote_table_keeps_concurrent_changes(make_table, user_id):
+    table = await make_table([{"item": f"i{index}", "amount": index} for index in range(ROWS)])
+    source = await analyze_partition(table.id)
+    data_repo = DataRepository()
+    rows = await data_repo.get_rows_by_table_id(table.id, limit=3)
+
+    # Изменения, не зафиксированные к моменту копирования, фиксируются, пока перенос ждёт блокировку
+    async with get_session_factory()() as session:
+        await session.execute(text(
+            f"UPDATE {source} SET row_data = '{{\"item\": \"changed\"}}' WHERE table_id = {table.id} AND id = {rows[0].id}"
+        ))
+        await session.execute(text(f"DELETE FROM {source} WHERE table_id = {table.id} AND id = {rows[1].id}"))
+        await session.execute(text(
+            f"INSERT INTO {source} (table_id, row_data, position) VALUES ({table.id}, '{{\"item\": \"new\"}}', 'zz')"
+        ))
+        promotion = asyncio.create_task(PartitionRepository().promote_table(table.id))
+        await asyncio.sleep(1)
+        assert not promotion.done()
+        await session.commit()
+    assert await promotion == ROWS
+
+    assert (await data_repo.get_row(table.id, rows[0].id)).row_data == {"item": "changed"}
+    assert await data_repo.get_row(table.id, rows[1].id) is None
+    assert await data_repo.count_rows(table.id) == ROWS
+    assert (await data_repo.get_rows_by_table_id(table.id, skip=ROWS - 1))[0].row_data == {"item": "new"}
+
+
+async def test_copy_promoted_table(make_table, user_id):
+    table = await make_table([{"item": f"i{index}", "amount": index} for index in range(ROWS)])
+    table = await TableRepository().set_natural_key(table, ["item"])
+    await PartitionRepository().promote_table(table.id)
+
+    copy, copied = await TableRepository().copy_table(table.id, user_id, "copy")
+    try:
+        assert copied == ROWS
+        assert await analyze_partition(copy.id) == table_partition_name(copy.id)
+        data_repo = DataRepository()
+        assert await data_repo.lookup_rows(copy.id, "item", ["i7"]) == {"i7": {"item": "i7", "amount": 7}}
+    finally:
+        await TableRepository().delete_table(copy.id)
+
+
+async def test_delete_promoted_table_locks_rows_last(make_table, user_id):
+    table = await make_table([{"item": f"i{index}", "amount": index} for index in range(ROWS)])
+    other = await make_table([{"item": "other", "amount": 1}])
+    await PartitionRepository().promote_table(table.id)
+    data_repo = DataRepository()
+    [row] = await data_repo.get_rows_by_table_id(table.id, limit=1)
+    await data_repo.update_row(table.id, row.id, {"amount": -1}, user_id)
+
+    # Удаление ждёт блокировку журнала изменений; строки других таблиц в это время доступны
+    async with get_session_factory()() as session:
+        await session.execute(text(f"SELECT 1 FROM table_change_batches WHERE table_id = {table.id} FOR UPDATE"))
+        deletion = asyncio.create_task(TableRepository().delete_table(table.id))
+        await asyncio.sleep(1)
+        assert not deletion.done()
+        async with get_session_factory()() as reader:
+            await reader.execute(text("SET LOCAL lock_timeout = 200"))
+            assert await reader.scalar(text(f"SELECT count(*) FROM table_rows WHERE table_id = {other.id}")) == 1
+        await session.commit()
+    assert await deletion == ROWS
+
+    async with get_session_factory()() as session:
+        assert await session.scalar(text("SELECT to_regclass(:name)"), {"name": table_partition_name(table.id)}) is None
+
+
+async def test_copy_table_in_default_partition(make_table, user_id):
+    table = await make_table([{"item": f"i{index}", "amount": index} for index in range(10)])
+    table = await TableRepository().set_natural_key(table, ["item"])
+
+    copy, copied = await TableRepository().copy_table(table.id, user_id, "copy")
+    try:
+        assert copied == 10
+        async with get_session_factory()() as session:
+            partition = await row_partition(session, copy.id)
+            assert partition != table_partition_name(copy.id)
+            # Ключевой индекс копии строится на общей хеш-партиции без транзакции и валиден
+            assert await session.scalar(text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name"
+            ), {"name": natural_key_index_name(copy.id, ["item"])})
+        data_repo = DataRepository()
+        assert await data_repo.lookup_rows(copy.id, "item", ["i7"]) == {"i7": {"item": "i7", "amount": 7}}
+    finally:
+        await TableRepository().delete_table(copy.id)
+    async with get_session_factory()() as session:
+        assert await session.scalar(
+            text("SELECT to_regclass(:name)"), {"name": natural_key_index_name(copy.id, ["item"])}
+        ) is None
@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy import text
+
+from backend.app.core.database import get_engine, get_session_factory
+from backend.app.core.profiling import QueryProfile, install_profiler, profile_queries
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_explain_keeps_transaction_usable(user_id):
+    install_profiler(get_engine())
+    async with get_session_factory()() as session:
+        await session.execute(text("CREATE TEMP TABLE profiled (n integer) ON COMMIT DROP"))
+        with profile_queries(QueryProfile(slow_query_threshold=0)) as profile:
+            # Для SHOW план не строится: ошибка EXPLAIN не прерывает транзакцию
+            assert await session.scalar(text("SHOW lock_timeout")) is not None
+            # Изменяющий WITH не выполняется повторно
+            await session.execute(text("WITH added AS (INSERT INTO profiled VALUES (1) RETURNING n) SELECT n FROM added"))
+            assert await session.scalar(text("SELECT count(*) FROM profiled")) == 1
+        await session.rollback()
+
+    plans = [query.plan for query in profile.slow_queries]
+    assert plans[0][0].startswith("EXPLAIN failed")
+    assert not any("actual time" in line for line in plans[1])
+    assert any("actual time" in line for line in plans[2])
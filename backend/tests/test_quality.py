@@ -0,0 +1,33 @@
+import pytest
+
+from backend.app.repository import DataRepository, QualityRepository
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_duplicates_by_key_skip_empty_keys(make_table, user_id):
+    table = await make_table([
+        {"item": "a", "amount": 1},
+        {"item": "a", "amount": 2},
+        {"amount": 3},
+        {"amount": 4},
+        {"item": None, "amount": 5},
+        {"item": "b", "amount": 6},
+    ])
+    quality_repo = QualityRepository()
+
+    report = await quality_repo.find_duplicates(table.id, ["item"])
+    assert (report["groups"], report["rows"]) == (1, 1)
+
+    assert await quality_repo.delete_duplicates(table.id, ["item"], user_id) == 1
+    rows = await DataRepository().get_rows_by_table_id(table.id)
+    assert [row.row_data["amount"] for row in rows] == [1, 3, 4, 5, 6]
+
+
+async def test_exact_duplicates(make_table, user_id):
+    table = await make_table([{"item": "a", "amount": 1}, {"amount": 1, "item": "a"}, {"amount": 3}, {"amount": 3}])
+    quality_repo = QualityRepository()
+
+    report = await quality_repo.find_duplicates(table.id)
+    assert (report["groups"], report["rows"]) == (2, 2)
+    assert await quality_repo.delete_duplicates(table.id, user_id=user_id) == 2
@@ -0,0 +1,31 @@
+import pytest
+
+from backend.app.core import replicas
+from backend.app.core.replicas import STICKY_COOKIE, ReplicaRoutingMiddleware
+
+pytestmark = pytest.mark.anyio
+
+
+async def call(method: str, path: str):
+    routed = []
+
+    async def app(scope, receive, send):
+        routed.append(replicas._read_routing.get() is not None)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": []}
+    await ReplicaRoutingMiddleware(app)(scope, None, send)
+    cookies = [value for name, value in messages[0]["headers"] if name == b"set-cookie"]
+    return routed[0], any(cookie.startswith(STICKY_COOKIE.encode()) for cookie in cookies)
+
+
+async def test_pivot_is_routed_as_read():
+    assert await call("POST", "/data/5/pivot") == (True, False)
+    assert await call("GET", "/data/5/rows") == (True, False)
+    assert await call("POST", "/data/5/rows") == (False, True)
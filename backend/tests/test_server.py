@@ -0,0 +1,38 @@
+import pytest
+
+from backend.app import server
+from backend.app.auth import revocation
+from backend.app.core import app_settings, rate_limit
+
+
+@pytest.fixture(autouse=True)
+def redis_backends(monkeypatch):
+    monkeypatch.setattr(revocation, "revocations", revocation.RedisRevocations(redis=None))
+    monkeypatch.setattr(rate_limit, "limiter", object.__new__(rate_limit.RedisLimiter))
+
+
+def test_several_workers_need_shared_revocations(monkeypatch):
+    monkeypatch.setattr(revocation, "revocations", revocation.MemoryRevocations())
+    monkeypatch.setattr(app_settings.gunicorn, "ALLOW_LOCAL_STATE", False)
+
+    server.check_local_state(1)
+    with pytest.raises(SystemExit):
+        server.check_local_state(2)
+
+    monkeypatch.setattr(app_settings.gunicorn, "ALLOW_LOCAL_STATE", True)
+    server.check_local_state(2)
+
+
+def test_several_workers_need_shared_rate_limits(monkeypatch):
+    monkeypatch.setattr(rate_limit, "limiter", rate_limit.MemoryLimiter())
+    monkeypatch.setattr(app_settings.gunicorn, "ALLOW_LOCAL_STATE", False)
+
+    with pytest.raises(SystemExit):
+        server.check_local_state(2)
+    monkeypatch.setattr(app_settings.rate_limits, "enabled", False)
+    server.check_local_state(2)
+
+
+def test_several_workers_with_redis_backends(monkeypatch):
+    monkeypatch.setattr(app_settings.gunicorn, "ALLOW_LOCAL_STATE", False)
+    server.check_local_state(4)
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import text, update
+
+from backend.app.core.database import get_session_factory
+from backend.app.models import TableRow
+from backend.app.repository import DataRepository, HistoryRepository, SnapshotRepository
+from backend.app.repository.history import bump_table_version, log_changes
+
+pytestmark = pytest.mark.anyio
+
+COMPACT_AFTER = timedelta(days=7)
+RETENTION = timedelta(days=3650)
+
+
+async def test_snapshot_rows_after_changes(make_table, user_id):
+    table = await make_table([{"item": f"i{index}", "amount": index} for index in range(5)])
+    data_repo, snapshot_repo = DataRepository(), SnapshotRepository()
+    rows = await data_repo.get_rows_by_table_id(table.id)
+    before = [(row.id, row.row_data) for row in rows]
+
+    snapshot = await snapshot_repo.create_snapshot(table.id, user_id, "before changes")
+    await data_repo.update_row(table.id, rows[0].id, {"amount": 10}, user_id)
+    await data_repo.update_row(table.id, rows[0].id, {"item": "x", "amount": 20}, user_id)
+    await data_repo.delete_row(table.id, rows[1].id, user_id)
+    await data_repo.create_row(table.id, {"item": "new", "amount": 7}, user_id)
+
+    snapshot_rows = await snapshot_repo.get_rows(snapshot)
+    assert [(row.id, row.row_data) for row in snapshot_rows] == before
+    by_amount = await snapshot_repo.get_rows(snapshot, sort_by="amount", sort_order="desc", sort_type="integer")
+    assert [row.row_data["amount"] for row in by_amount] == [4, 3, 2, 1, 0]
+    assert (await snapshot_repo.get_row(snapshot, rows[1].id)).row_data == rows[1].row_data
+
+
+async def test_snapshot_after_compaction(make_table, age_history, user_id):
+    table = await make_table([{"item": "a", "amount": 1}])
+    data_repo, snapshot_repo = DataRepository(), SnapshotRepository()
+    [row] = await data_repo.get_rows_by_table_id(table.id)
+
+    snapshot = await snapshot_repo.create_snapshot(table.id, user_id, "before changes")
+    await data_repo.update_row(table.id, row.id, {"amount": 2}, user_id)
+    await age_history(table.id, 5)
+    await data_repo.update_row(table.id, row.id, {"amount": 3}, user_id)
+    await age_history(table.id, 5)
+
+    # Первое изменение после снимка сжимается в пачку с ID больше, чем у второго
+    await HistoryRepository().compact(COMPACT_AFTER, RETENTION)
+
+    snapshot = await snapshot_repo.get_snapshot(table.id, snapshot.id)
+    assert [row.row_data for row in await snapshot_repo.get_rows(snapshot)] == [{"item": "a", "amount": 1}]
+
+
+async def test_snapshot_excludes_writer_started_before_it(make_table, user_id):
+    table = await make_table([{"item": "a", "amount": 1}])
+    data_repo, snapshot_repo = DataRepository(), SnapshotRepository()
+    [row] = await data_repo.get_rows_by_table_id(table.id)
+
+    # Транзакция правки началась до снимка, а зафиксирована после него
+    async with get_session_factory()() as session:
+        await session.execute(text("SELECT now()"))
+        snapshot = await snapshot_repo.create_snapshot(table.id, user_id, "during edit")
+        await session.execute(
+            update(TableRow).where(TableRow.id == row.id).values(row_data={"item": "a", "amount": 2})
+        )
+        await log_changes(session, table.id, user_id, "update", [(row.id, {"amount": 1}, {"amount": 2})])
+        await bump_table_version(session, table.id)
+        await session.commit()
+
+    assert [row.row_data for row in await snapshot_repo.get_rows(snapshot)] == [{"item": "a", "amount": 1}]
@@ -0,0 +1,41 @@
+import pytest
+
+from backend.app.services.data import DataService
+
+pytestmark = pytest.mark.anyio
+
+ROWS = 600
+
+
+async def test_viewport_index_survives_edits_of_other_columns(make_table, user_id, monkeypatch):
+    table = await make_table([{"item": f"i{index:04}", "amount": index} for index in range(ROWS)])
+    service = DataService(None)
+    builds = []
+    get_sort_checkpoints = service.data_repo.get_sort_checkpoints
+
+    async def counting(*args, **kwargs):
+        builds.append(args)
+        return await get_sort_checkpoints(*args, **kwargs)
+
+    monkeypatch.setattr(service.data_repo, "get_sort_checkpoints", counting)
+    rows = await service.data_repo.get_rows_by_table_id(table.id, limit=2)
+
+    viewport = await service.get_viewport(table.id, user_id, start=300, count=2, sort_by="amount")
+    assert [row.row_data["amount"] for row in viewport.rows] == [300, 301]
+
+    # Правка другой колонки не перестраивает опорные строки
+    await service.data_repo.update_row(table.id, rows[0].id, {"item": "changed"}, user_id)
+    viewport = await service.get_viewport(table.id, user_id, start=300, count=2, sort_by="amount")
+    assert [row.row_data["amount"] for row in viewport.rows] == [300, 301]
+    assert len(builds) == 1
+
+    # Правка колонки сортировки и добавление строки - перестраивают
+    await service.data_repo.update_row(table.id, rows[0].id, {"amount": ROWS}, user_id)
+    viewport = await service.get_viewport(table.id, user_id, start=299, count=2, sort_by="amount")
+    assert [row.row_data["amount"] for row in viewport.rows] == [300, 301]
+    assert len(builds) == 2
+
+    await service.data_repo.create_row(table.id, {"item": "new", "amount": -1}, user_id)
+    viewport = await service.get_viewport(table.id, user_id, start=300, count=2, sort_by="amount")
+    assert [row.row_data["amount"] for row in viewport.rows] == [300, 301]
+    assert len(builds) == 3
@@ -0,0 +1,117 @@
+"""Бенчмарки API данных.
+
+Запуск (нужна локальная Postgres с применёнными миграциями, настройки берутся
+из тех же переменных окружения, что и у приложения)::
+
+    python -m benchmarks --rows 10000,100000 --columns 5,20 --output bench.json
+    python -m benchmarks --rows 10000 --baseline bench.json --tolerance 0.2
+
+При ``--baseline`` процесс завершается с кодом 1, если p95 какого-либо сценария
+вырос больше чем на ``--tolerance``.
+"""
+import argparse
+import asyncio
+import sys
+from typing import List
+
+from loguru import logger
+
+from .runner import Report, compare, make_meta, measure
+from .scenarios import global_scenarios, make_client, permission_scenarios, statement_scenarios, table_scenarios
+from .seed import connect, ensure_user, seed_grants, seed_table
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Data API benchmarks")
+    parser.add_argument("--rows", type=_int_list, default=[10_000], help="Размеры таблиц, через запятую")
+    parser.add_argument("--columns", type=_int_list, default=[10], help="Количество колонок, через запятую")
+    parser.add_argument("--grants", type=int, default=100_000,
+                        help="Записей прав для сценариев проверки прав; 0 - не запускать их")
+    parser.add_argument("--iterations", type=int, default=50, help="Итераций на сценарий")
+    parser.add_argument("--warmup", type=int, default=3, help="Прогревочных итераций на сценарий")
+    parser.add_argument("--only", type=lambda value: set(value.split(",")), default=None,
+                        help="Запустить только перечисленные сценарии")
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора данных")
+    parser.add_argument("--reseed", action="store_true", help="Пересоздать таблицы даже если они уже заполнены")
+    parser.add_argument("--output", default="bench_report.json", help="Путь к JSON-отчёту")
+    parser.add_argument("--baseline", default=None, help="Базовый отчёт для поиска регрессий")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимый рост p95, доля")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> Report:
+    report = Report(meta=make_meta({key: sorted(value) if isinstance(value, set) else value
+                                    for key, value in vars(args).items()}))
+
+    conn = await connect()
+    try:
+        user_id = await ensure_user(conn)
+        tables = [
+            await seed_table(conn, user_id, rows, columns, seed=args.seed, reseed=args.reseed)
+            for rows in args.rows
+            for columns in args.columns
+        ]
+        grants = await seed_grants(conn, user_id, args.grants) if args.grants else None
+    finally:
+        await conn.close()
+
+    scenarios = global_scenarios(args.iterations)
+    if grants is not None:
+        scenarios += permission_scenarios(grants, args.iterations, args.seed)
+    for scenario in scenarios:
+        if args.only and scenario.name not in args.only:
+            continue
+        result = await measure(
+            scenario.name,
+            scenario.func,
+            iterations=scenario.iterations,
+            warmup=args.warmup,
+            items_per_op=scenario.items_per_op,
+        )
+        logger.info("{}: p50={} ms p95={} ms", result.key, result.p50_ms, result.p95_ms)
+        report.results.append(result)
+
+    async with make_client(user_id) as client:
+        for table in tables:
+            scenarios = table_scenarios(client, table, args.iterations, args.seed)
+            scenarios += statement_scenarios(table, user_id, args.iterations)
+            for scenario in scenarios:
+                if args.only and scenario.name not in args.only:
+                    continue
+                result = await measure(
+                    scenario.name,
+                    scenario.func,
+                    table=table.name,
+                    rows=table.rows,
+                    columns=table.columns,
+                    iterations=scenario.iterations,
+                    warmup=min(args.warmup, scenario.iterations),
+                    items_per_op=scenario.items_per_op,
+                )
+                logger.info("{}: p50={} ms p95={} ms", result.key, result.p50_ms, result.p95_ms)
+                report.results.append(result)
+
+    return report
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    report.save(args.output)
+    logger.info("Report saved to {}", args.output)
+
+    if args.baseline:
+        regressions = compare(report, args.baseline, args.tolerance)
+        for regression in regressions:
+            logger.error("Regression: {}", regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,106 @@
+"""Проверка времени импорта приложения по ``python -X importtime``.
+
+Запуск::
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --budget-ms 1000 --runs 5 --top 15
+
+Приложение импортируется в отдельном процессе без ``SECRET_KEY``/``ALGORITHM``
+и с недоступной базой: импорт не должен читать эти настройки, создавать движки
+БД и загружать тяжёлые пакеты, нужные только при обработке запросов (они
+создаются в lifespan или при первом использовании). Процесс завершается с
+кодом 1, если это нарушено или лучшее из ``--runs`` время импорта превышает
+``--budget-ms``.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from loguru import logger
+
+APP_MODULE = "backend.app.main"
+
+# Пакеты, которые должны импортироваться лениво
+LAZY_MODULES = ("asyncpg", "passlib", "openpyxl", "redis")
+
+_CHECK_SCRIPT = f"""
+import json
+import {APP_MODULE}
+from backend.app.core import database
+from backend.app.core.replicas import replicas
+from backend.app.dao import database as dao_database
+print(json.dumps({{
+    "core": database._engine is not None,
+    "dao": dao_database._engine is not None,
+    "replicas": replicas._replicas is not None,
+}}))
+"""
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.importtime", description="App import time check")
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="Допустимое время импорта приложения")
+    parser.add_argument("--runs", type=int, default=3, help="Количество запусков, учитывается лучший")
+    parser.add_argument("--top", type=int, default=10, help="Сколько самых медленных пакетов показать")
+    return parser.parse_args(argv)
+
+
+def measure_import() -> Tuple[Dict[str, int], Dict[str, bool]]:
+    """Импортирует приложение в отдельном процессе.
+
+    Returns:
+        Собственное время импорта каждого модуля в микросекундах и признаки
+        созданных при импорте движков БД
+    """
+    env = {key: value for key, value in os.environ.items() if key not in ("SECRET_KEY", "ALGORITHM")}
+    # Адрес из документационного диапазона: любое подключение при импорте завершится ошибкой
+    env.update(DB_HOST="192.0.2.1", PYTHONPATH=os.getcwd())
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHECK_SCRIPT],
+        env=env, capture_output=True, text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Import of {APP_MODULE} failed:\n{process.stderr[-2000:]}")
+
+    modules = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            modules[name.strip()] = int(self_us)
+    return modules, json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    try:
+        runs = [measure_import() for _ in range(args.runs)]
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    modules, engines = min(runs, key=lambda run: sum(run[0].values()))
+    total_ms = sum(modules.values()) / 1000
+
+    packages = Counter()
+    for name, self_us in modules.items():
+        packages[name.split(".")[0]] += self_us
+    for package, self_us in packages.most_common(args.top):
+        logger.info("{}: {:.1f} ms", package, self_us / 1000)
+    logger.info("Import of {}: {:.1f} ms (budget {:.0f} ms)", APP_MODULE, total_ms, args.budget_ms)
+
+    errors = [f"{name} is imported eagerly" for name in LAZY_MODULES if name in modules]
+    errors += [f"{name} engine is created at import" for name, created in engines.items() if created]
+    if total_ms > args.budget_ms:
+        errors.append(f"Import takes {total_ms:.1f} ms, budget is {args.budget_ms:.0f} ms")
+    for error in errors:
+        logger.error(error)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,133 @@
+"""Замер сценариев, формирование отчёта и сравнение с базовым отчётом."""
+import json
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+ScenarioFunc = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class Result:
+    scenario: str
+    table: str
+    rows: int
+    columns: int
+    iterations: int
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    min_ms: float
+    max_ms: float
+    ops_per_sec: float
+    items_per_op: int = 1
+
+    @property
+    def key(self) -> str:
+        return f"{self.scenario}@{self.table}"
+
+
+@dataclass
+class Report:
+    meta: Dict[str, Any]
+    results: List[Result] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"meta": self.meta, "results": [asdict(result) for result in self.results]}
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, ensure_ascii=False, indent=2)
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_meta(args: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": args,
+    }
+
+
+async def measure(
+        name: str,
+        func: ScenarioFunc,
+        *,
+        table: str = "-",
+        rows: int = 0,
+        columns: int = 0,
+        iterations: int = 50,
+        warmup: int = 3,
+        items_per_op: int = 1,
+) -> Result:
+    """Выполняет сценарий ``iterations`` раз после прогрева и считает перцентили."""
+    for _ in range(warmup):
+        await func()
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    total = time.perf_counter() - started
+
+    return Result(
+        scenario=name,
+        table=table,
+        rows=rows,
+        columns=columns,
+        iterations=iterations,
+        mean_ms=round(statistics.fmean(samples), 3),
+        p50_ms=round(_percentile(samples, 50), 3),
+        p95_ms=round(_percentile(samples, 95), 3),
+        p99_ms=round(_percentile(samples, 99), 3),
+        min_ms=round(min(samples), 3),
+        max_ms=round(max(samples), 3),
+        ops_per_sec=round(iterations / total, 2) if total else 0.0,
+        items_per_op=items_per_op,
+    )
+
+
+def compare(report: Report, baseline_path: str, tolerance: float) -> List[str]:
+    """Сравнивает p95 с базовым отчётом.
+
+    Returns:
+        Описания регрессий: сценарии, у которых p95 вырос больше чем на ``tolerance``
+    """
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {
+            f"{result['scenario']}@{result['table']}": result
+            for result in json.load(file)["results"]
+        }
+
+    regressions = []
+    for result in report.results:
+        previous = baseline.get(result.key)
+        if previous is None or not previous["p95_ms"]:
+            continue
+        ratio = result.p95_ms / previous["p95_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"{result.key}: p95 {previous['p95_ms']:.2f} ms -> {result.p95_ms:.2f} ms (x{ratio:.2f})"
+            )
+    return regressions
@@ -0,0 +1,294 @@
+"""Сценарии нагрузки на горячие пути API данных.
+
+HTTP-сценарии выполняются в процессе через ``httpx.ASGITransport``: измеряется
+полный стек FastAPI -> сервис -> репозиторий -> Postgres без сетевого шума.
+Аутентификация в них подменяется фиксированным пользователем, а её стоимость
+измеряется отдельным сценарием ``login_verify``.
+"""
+import random
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, List
+
+import httpx
+from sqlalchemy import delete, insert, select, text
+
+from backend.app.auth.utils import create_tokens, get_password_hash, verify_password
+from backend.app.core import app_settings
+from backend.app.core.database import get_session_factory
+from backend.app.dependencies.auth_dep import get_current_user
+from backend.app.main import app
+from backend.app.models import DataTable, TableRow
+from backend.app.repository import DataRepository, TableRepository
+from backend.app.repository.data import RowOrder, page_statement
+from backend.app.repository.table import _TABLE_WITH_PERMISSION, _with_grant, effective_permissions
+from backend.app.services.data import pivot_cache
+from backend.app.utils.ordering import INITIAL_KEY
+from .seed import BenchGrants, BenchTable, make_row
+
+BULK_SIZE = 1000
+PAGE_SIZE = 100
+
+
+@dataclass
+class Scenario:
+    name: str
+    func: Callable[[], Awaitable[Any]]
+    iterations: int
+    items_per_op: int = 1
+
+
+def make_client(user_id: int) -> httpx.AsyncClient:
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=user_id)
+    # Бенчмарк измеряет пропускную способность, ограничения частоты запросов ему мешают
+    app_settings.rate_limits.enabled = False
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+def _check(response: httpx.Response) -> httpx.Response:
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url}: {response.status_code} {response.text}")
+    return response
+
+
+def table_scenarios(client: httpx.AsyncClient, table: BenchTable, iterations: int, seed: int) -> List[Scenario]:
+    rng = random.Random(seed)
+    base = f"/data/{table.id}"
+    deep_offset = max(0, table.rows - 2 * PAGE_SIZE)
+    created_ids: List[int] = []
+    string_column = table.columns_schema[0]["name"]
+    numeric_column = next(
+        (column["name"] for column in table.columns_schema if column["type"] in ("integer", "number")),
+        None,
+    )
+
+    def random_row_id() -> int:
+        return rng.randint(table.min_row_id, table.max_row_id)
+
+    async def rows_first_page():
+        _check(await client.get(f"{base}/rows", params={"limit": PAGE_SIZE}))
+
+    async def rows_deep_offset():
+        _check(await client.get(f"{base}/rows", params={"skip": deep_offset, "limit": PAGE_SIZE}))
+
+    async def rows_sorted():
+        sort_by = numeric_column or string_column
+        _check(await client.get(f"{base}/rows", params={"limit": PAGE_SIZE, "sort_by": sort_by, "sort_order": "desc"}))
+
+    async def row_get():
+        response = await client.get(f"{base}/rows/{random_row_id()}")
+        if response.status_code not in (200, 404):
+            _check(response)
+
+    async def row_create():
+        response = _check(await client.post(f"{base}/rows", json={"row_data": make_row(rng, table.columns_schema)}))
+        created_ids.append(response.json()["id"])
+
+    async def row_update():
+        row_data = make_row(rng, table.columns_schema[:1])
+        response = await client.put(f"{base}/rows/{random_row_id()}", json={"row_data": row_data})
+        if response.status_code not in (200, 404):
+            _check(response)
+
+    async def row_delete():
+        if created_ids:
+            _check(await client.delete(f"{base}/rows/{created_ids.pop()}"))
+
+    async def pivot_cold():
+        pivot_cache.clear()
+        await pivot_cached()
+
+    async def pivot_cached():
+        aggregates = [{"function": "count"}]
+        if numeric_column:
+            aggregates.append({"function": "sum", "column": numeric_column})
+        _check(await client.post(f"{base}/pivot", json={"group_by": [string_column], "aggregates": aggregates}))
+
+    async def sql_offset_deep():
+        async with get_session_factory()() as session:
+            stmt = (
+                select(TableRow.id, TableRow.row_data)
+                .where(TableRow.table_id == table.id)
+                .order_by(TableRow.id)
+                .offset(deep_offset)
+                .limit(PAGE_SIZE)
+            )
+            (await session.execute(stmt)).all()
+
+    async def sql_keyset_deep():
+        # Та же страница, что и sql_offset_deep, но по ключу вместо OFFSET
+        async with get_session_factory()() as session:
+            stmt = (
+                select(TableRow.id, TableRow.row_data)
+                .where(TableRow.table_id == table.id, TableRow.id > table.min_row_id + deep_offset - 1)
+                .order_by(TableRow.id)
+                .limit(PAGE_SIZE)
+            )
+            (await session.execute(stmt)).all()
+
+    async def sql_filtered():
+        async with get_session_factory()() as session:
+            stmt = (
+                select(TableRow.id, TableRow.row_data)
+                .where(TableRow.table_id == table.id, TableRow.row_data[string_column].as_string() == "alpha1")
+                .order_by(TableRow.id)
+                .limit(PAGE_SIZE)
+            )
+            (await session.execute(stmt)).all()
+
+    async def bulk_insert():
+        # Вставка откатывается, чтобы размер таблицы не менялся между итерациями
+        async with get_session_factory()() as session:
+            values = [
+                {"table_id": table.id, "row_data": make_row(rng, table.columns_schema), "position": INITIAL_KEY}
+                for _ in range(BULK_SIZE)
+            ]
+            await session.execute(insert(TableRow), values)
+            await session.rollback()
+
+    async def bulk_delete():
+        async with get_session_factory()() as session:
+            await session.execute(
+                delete(TableRow).where(
+                    TableRow.table_id == table.id,
+                    TableRow.id < table.min_row_id + BULK_SIZE,
+                )
+            )
+            await session.rollback()
+
+    async def export_full_scan():
+        async with get_session_factory()() as session:
+            result = await session.stream(
+                select(TableRow.row_data)
+                .where(TableRow.table_id == table.id)
+                .execution_options(yield_per=10_000)
+            )
+            async for _ in result:
+                pass
+
+    scan_iterations = max(1, min(iterations, 1_000_000 // max(table.rows, 1)))
+    return [
+        Scenario("rows_first_page", rows_first_page, iterations, PAGE_SIZE),
+        Scenario("rows_deep_offset", rows_deep_offset, iterations, PAGE_SIZE),
+        Scenario("rows_sorted", rows_sorted, iterations, PAGE_SIZE),
+        Scenario("row_get", row_get, iterations),
+        Scenario("row_create", row_create, iterations),
+        Scenario("row_update", row_update, iterations),
+        Scenario("row_delete", row_delete, iterations),
+        Scenario("pivot_cold", pivot_cold, scan_iterations),
+        Scenario("pivot_cached", pivot_cached, iterations),
+        Scenario("sql_offset_deep", sql_offset_deep, iterations, PAGE_SIZE),
+        Scenario("sql_keyset_deep", sql_keyset_deep, iterations, PAGE_SIZE),
+        Scenario("sql_filtered", sql_filtered, iterations, PAGE_SIZE),
+        Scenario("bulk_insert", bulk_insert, max(1, iterations // 5), BULK_SIZE),
+        Scenario("bulk_delete", bulk_delete, max(1, iterations // 5), BULK_SIZE),
+        Scenario("export_full_scan", export_full_scan, scan_iterations, table.rows),
+    ]
+
+
+def global_scenarios(iterations: int) -> List[Scenario]:
+    password = "benchmark-password"
+    hashed_password = get_password_hash(password)
+
+    async def login_verify():
+        # CPU-часть логина: проверка bcrypt-хеша и выпуск пары токенов
+        verify_password(password, hashed_password)
+        create_tokens({"sub": "1"})
+
+    async def db_ping():
+        async with get_session_factory()() as session:
+            await session.execute(text("SELECT 1"))
+
+    return [
+        Scenario("login_verify", login_verify, max(1, iterations // 5)),
+        Scenario("db_ping", db_ping, iterations),
+    ]
+
+
+
+def permission_scenarios(grants: BenchGrants, iterations: int, seed: int) -> List[Scenario]:
+    """Проверка прав на таблицу и список таблиц пользователя при большом количестве записей прав"""
+    rng = random.Random(seed)
+    table_repo = TableRepository()
+
+    async def permission_check():
+        table = await table_repo.get_table_with_access(rng.choice(grants.table_ids), rng.choice(grants.user_ids))
+        if table is None:
+            raise RuntimeError("Read access expected")
+
+    async def permission_denied():
+        # Права на управление выданы только владельцу
+        table = await table_repo.get_table_with_manage_access(rng.choice(grants.table_ids), rng.choice(grants.user_ids))
+        if table is not None:
+            raise RuntimeError("Manage access not expected")
+
+    async def tables_list():
+        await table_repo.get_accessible_tables(rng.choice(grants.user_ids))
+
+    return [
+        Scenario("permission_check", permission_check, iterations),
+        Scenario("permission_denied", permission_denied, iterations),
+        Scenario("tables_list", tables_list, iterations, len(grants.table_ids)),
+    ]
+
+
+def statement_scenarios(table: BenchTable, user_id: int, iterations: int) -> List[Scenario]:
+    """Подготовка запросов проверки прав и первой страницы строк (в ручном порядке): сборка на каждый вызов
+    против собранных один раз.
+
+    ``*_prepare`` - только то, что SQLAlchemy делает до кэша скомпилированных
+    запросов (сборка конструкции и вычисление её ключа кэша), ``*_query`` - то же
+    с выполнением в базе.
+    """
+    data_repo = DataRepository()
+    table_repo = TableRepository()
+
+    def build_permission_check():
+        can_read, _, _ = effective_permissions(user_id)
+        return _with_grant(select(DataTable), user_id).where(
+            DataTable.id == table.id, DataTable.is_deleted.is_(False), can_read
+        )
+
+    def build_rows_page():
+        order = RowOrder.create(None, "asc")
+        return (
+            select(TableRow).where(TableRow.table_id == table.id).order_by(*order.clauses).offset(0).limit(PAGE_SIZE)
+        )
+
+    async def permission_built_prepare():
+        build_permission_check()._generate_cache_key()
+
+    async def permission_cached_prepare():
+        _TABLE_WITH_PERMISSION["read"]._generate_cache_key()
+
+    async def rows_page_built_prepare():
+        build_rows_page()._generate_cache_key()
+
+    async def rows_page_cached_prepare():
+        page_statement(None, "asc", "string")._generate_cache_key()
+
+    async def permission_built_query():
+        async with get_session_factory()() as session:
+            (await session.scalars(build_permission_check())).first()
+
+    async def permission_cached_query():
+        await table_repo.get_table_with_access(table.id, user_id)
+
+    async def rows_page_built_query():
+        async with get_session_factory()() as session:
+            (await session.scalars(build_rows_page())).all()
+
+    async def rows_page_cached_query():
+        await data_repo.get_rows_by_table_id(table.id, 0, PAGE_SIZE)
+
+    prepare_iterations = iterations * 20
+    return [
+        Scenario("stmt_permission_built_prepare", permission_built_prepare, prepare_iterations),
+        Scenario("stmt_permission_cached_prepare", permission_cached_prepare, prepare_iterations),
+        Scenario("stmt_rows_page_built_prepare", rows_page_built_prepare, prepare_iterations),
+        Scenario("stmt_rows_page_cached_prepare", rows_page_cached_prepare, prepare_iterations),
+        Scenario("stmt_permission_built_query", permission_built_query, iterations),
+        Scenario("stmt_permission_cached_query", permission_cached_query, iterations),
+        Scenario("stmt_rows_page_built_query", rows_page_built_query, iterations, PAGE_SIZE),
+        Scenario("stmt_rows_page_cached_query", rows_page_cached_query, iterations, PAGE_SIZE),
+    ]
@@ -0,0 +1,220 @@
+"""Наполнение локальной базы синтетическими таблицами для бенчмарков.
+
+Данные генерируются детерминированно (фиксированный seed), строки загружаются
+через COPY пачками, поэтому даже таблицы на миллионы строк не держатся в памяти.
+"""
+import json
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Tuple
+
+import asyncpg
+from loguru import logger
+
+from backend.app.core import app_settings
+from backend.app.utils.ordering import evenly_spaced_keys
+
+COLUMN_TYPES = ("string", "integer", "number", "boolean", "date")
+COPY_BATCH_SIZE = 50_000
+BENCH_USER_EMAIL = "benchmark@example.com"
+
+# Небольшой словарь, чтобы у строковых колонок была реалистичная кардинальность
+_WORDS = [f"{prefix}{index}" for prefix in ("alpha", "beta", "gamma", "delta", "omega") for index in range(20)]
+
+
+@dataclass
+class BenchTable:
+    id: int
+    name: str
+    rows: int
+    columns: int
+    columns_schema: List[Dict[str, Any]]
+    min_row_id: int
+    max_row_id: int
+
+
+def make_columns_schema(columns: int) -> List[Dict[str, Any]]:
+    return [
+        {"name": f"col_{index}", "type": COLUMN_TYPES[index % len(COLUMN_TYPES)]}
+        for index in range(columns)
+    ]
+
+
+def make_row(rng: random.Random, columns_schema: List[Dict[str, Any]]) -> Dict[str, Any]:
+    row = {}
+    for column in columns_schema:
+        column_type = column["type"]
+        if column_type == "integer":
+            value = rng.randint(0, 1_000_000)
+        elif column_type == "number":
+            value = round(rng.uniform(0, 10_000), 2)
+        elif column_type == "boolean":
+            value = rng.random() < 0.5
+        elif column_type == "date":
+            value = (date(2020, 1, 1) + timedelta(days=rng.randint(0, 2000))).isoformat()
+        else:
+            value = rng.choice(_WORDS)
+        row[column["name"]] = value
+    return row
+
+
+def _row_batches(
+        table_id: int,
+        rows: int,
+        columns_schema: List[Dict[str, Any]],
+        seed: int,
+) -> Iterator[List[Tuple[int, str, str]]]:
+    rng = random.Random(seed)
+    positions = evenly_spaced_keys(rows)
+    for start in range(0, rows, COPY_BATCH_SIZE):
+        size = min(COPY_BATCH_SIZE, rows - start)
+        yield [
+            (table_id, json.dumps(make_row(rng, columns_schema)), positions[start + offset])
+            for offset in range(size)
+        ]
+
+
+async def connect() -> asyncpg.Connection:
+    return await asyncpg.connect(
+        host=app_settings.DB_HOST,
+        port=app_settings.DB_PORT,
+        user=app_settings.DB_USER,
+        password=app_settings.DB_PASSWORD,
+        database=app_settings.DB_NAME,
+    )
+
+
+async def ensure_user(conn: asyncpg.Connection) -> int:
+    return await conn.fetchval(
+        """
+        INSERT INTO users (email, hashed_password, full_name, role, is_active)
+        VALUES ($1, 'benchmark', 'Benchmark User', 'EDITOR', true)
+        ON CONFLICT (email) DO UPDATE SET full_name = EXCLUDED.full_name
+        RETURNING id
+        """,
+        BENCH_USER_EMAIL,
+    )
+
+
+async def seed_table(
+        conn: asyncpg.Connection,
+        user_id: int,
+        rows: int,
+        columns: int,
+        seed: int = 42,
+        reseed: bool = False,
+) -> BenchTable:
+    """Создаёт таблицу ``bench_<rows>x<columns>`` или переиспользует уже заполненную."""
+    name = f"bench_{rows}x{columns}"
+    columns_schema = make_columns_schema(columns)
+
+    table_id = await conn.fetchval(
+        "SELECT id FROM data_tables WHERE name = $1 AND created_by_id = $2", name, user_id
+    )
+    existing_rows = 0
+    if table_id is not None:
+        existing_rows = await conn.fetchval("SELECT count(*) FROM table_rows WHERE table_id = $1", table_id)
+
+    if table_id is None or reseed or existing_rows != rows:
+        async with conn.transaction():
+            if table_id is not None:
+                await conn.execute("DELETE FROM table_rows WHERE table_id = $1", table_id)
+                await conn.execute("DELETE FROM table_permissions WHERE table_id = $1", table_id)
+                await conn.execute("DELETE FROM data_tables WHERE id = $1", table_id)
+            table_id = await conn.fetchval(
+                """
+                INSERT INTO data_tables (name, description, columns_schema, created_by_id, is_public)
+                VALUES ($1, 'Synthetic benchmark table', $2, $3, false)
+                RETURNING id
+                """,
+                name,
+                json.dumps(columns_schema),
+                user_id,
+            )
+            await conn.execute(
+                """
+                INSERT INTO table_permissions (user_id, table_id, can_read, can_write, can_manage)
+                VALUES ($1, $2, true, true, true)
+                """,
+                user_id,
+                table_id,
+            )
+            logger.info("Seeding {} ({} rows, {} columns)", name, rows, columns)
+            for batch in _row_batches(table_id, rows, columns_schema, seed):
+                await conn.copy_records_to_table(
+                    "table_rows", records=batch, columns=["table_id", "row_data", "position"]
+                )
+        await conn.execute("ANALYZE table_rows")
+
+    min_row_id, max_row_id = await conn.fetchrow(
+        "SELECT min(id), max(id) FROM table_rows WHERE table_id = $1", table_id
+    )
+    return BenchTable(
+        id=table_id,
+        name=name,
+        rows=rows,
+        columns=columns,
+        columns_schema=columns_schema,
+        min_row_id=min_row_id or 0,
+        max_row_id=max_row_id or 0,
+    )
+
+
+@dataclass
+class BenchGrants:
+    table_ids: List[int]
+    user_ids: List[int]
+
+
+async def seed_grants(conn: asyncpg.Connection, owner_id: int, grants: int, tables: int = 100) -> BenchGrants:
+    """Создаёт пустые таблицы ``bench_acl_<i>`` и пользователей, каждому из которых
+    выданы права на чтение и запись всех этих таблиц, - всего ``grants`` записей прав."""
+    users = max(1, grants // tables)
+    async with conn.transaction():
+        await conn.execute(
+            """
+            INSERT INTO users (email, hashed_password, full_name, role, is_active)
+            SELECT 'bench-acl-' || i || '@example.com', 'benchmark', 'Benchmark Reader', 'VIEWER', true
+            FROM generate_series(1, $1) AS i
+            ON CONFLICT (email) DO NOTHING
+            """,
+            users,
+        )
+        user_ids = [row["id"] for row in await conn.fetch(
+            "SELECT id FROM users WHERE email LIKE 'bench-acl-%' ORDER BY id LIMIT $1", users
+        )]
+
+        table_ids = [row["id"] for row in await conn.fetch(
+            "SELECT id FROM data_tables WHERE name LIKE 'bench_acl_%' AND created_by_id = $1 ORDER BY id LIMIT $2",
+            owner_id,
+            tables,
+        )]
+        for index in range(len(table_ids), tables):
+            table_id = await conn.fetchval(
+                """
+                INSERT INTO data_tables (name, description, columns_schema, created_by_id, is_public)
+                VALUES ($1, 'Synthetic permission benchmark table', $2, $3, false)
+                RETURNING id
+                """,
+                f"bench_acl_{index}",
+                json.dumps(make_columns_schema(1)),
+                owner_id,
+            )
+            table_ids.append(table_id)
+
+        logger.info("Seeding {} grants ({} users x {} tables)", len(user_ids) * len(table_ids), len(user_ids), len(table_ids))
+        await conn.execute(
+            """
+            INSERT INTO table_permissions (user_id, table_id, can_read, can_write, can_manage)
+            SELECT u, t, true, true, false FROM unnest($1::int[]) AS u, unnest($2::int[]) AS t
+            UNION ALL
+            SELECT $3, t, true, true, true FROM unnest($2::int[]) AS t
+            ON CONFLICT (user_id, table_id) DO NOTHING
+            """,
+            user_ids,
+            table_ids,
+            owner_id,
+        )
+    await conn.execute("ANALYZE table_permissions")
+    return BenchGrants(table_ids=table_ids, user_ids=user_ids)